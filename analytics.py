@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+
+from database import DB
+
+STARS = range(1, 6)
+
+# period column and rollup table
+ROLLUPS = {"day": "rating_daily", "week": "rating_weekly"}
+
+
+class Window(NamedTuple):
+    """
+    Ratings of a day or week: the number of 1 to 5 star ratings.
+    """
+
+    start: str
+    stars: tuple[int, ...]
+
+    @property
+    def count(self) -> int:
+        return sum(self.stars)
+
+    @property
+    def average(self) -> Optional[float]:
+        if not self.count:
+            return None
+        return sum(star * count for star, count in zip(STARS, self.stars)) / self.count
+
+
+class Trends(NamedTuple):
+    days: int
+    daily: list[Window]
+    weekly: list[Window]
+    current: Window
+    previous: Window
+
+
+def total(start: str, windows: list[Window]) -> Window:
+    return Window(
+        start, tuple(sum(w.stars[i] for w in windows) for i in range(len(STARS)))
+    )
+
+
+async def rollup(period: str, since: date) -> dict[str, Window]:
+    """
+    Windows of a rollup starting on or after ``since``, read from the
+    primary keys of the rollup table only.
+    """
+    rows = await DB.read(
+        f"SELECT {period}, stars, count FROM {ROLLUPS[period]} "
+        f"WHERE {period} >= ? ORDER BY {period}",
+        (since.isoformat(),),
+    )
+    counts: dict[str, list[int]] = {}
+    for start, stars, count in rows:
+        if stars in STARS:
+            counts.setdefault(start, [0] * len(STARS))[stars - 1] += count
+    return {start: Window(start, tuple(stars)) for start, stars in counts.items()}
+
+
+async def rating_trends(days: int, today: Optional[date] = None) -> Trends:
+    """
+    Daily and weekly ratings of the last ``days`` days, plus the totals of
+    those days and of the same number of days before them. Reads at most
+    2 * days * 5 rollup rows, whatever the number of ratings.
+    """
+    today = today or date.today()
+    since = today - timedelta(days=days - 1)
+    previous_since = since - timedelta(days=days)
+
+    by_day = await rollup("day", previous_since)
+    empty = (0,) * len(STARS)
+    daily = [
+        by_day.get(day.isoformat(), Window(day.isoformat(), empty))
+        for day in (since + timedelta(days=i) for i in range(days))
+    ]
+    previous = [window for key, window in by_day.items() if key < since.isoformat()]
+
+    # weeks start on Monday, the first one may begin before ``since``
+    by_week = await rollup("week", since - timedelta(days=since.weekday()))
+
+    return Trends(
+        days=days,
+        daily=daily,
+        weekly=list(by_week.values()),
+        current=total(since.isoformat(), daily),
+        previous=total(previous_since.isoformat(), previous),
+    )
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from database import DB
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS audit(ts DATETIME, kind TEXT, client_id INTEGER, "
+    "model_version TEXT, features TEXT, price REAL, rows INTEGER, latency REAL)",
+    "CREATE INDEX IF NOT EXISTS audit_ts ON audit(ts)",
+)
+
+INSERT = "INSERT INTO audit VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class AuditLog:
+    """
+    Record of the inputs, model version, price and latency of every single
+    prediction, price curve and batch job, kept in the audit table of the
+    bot database.
+
+    ``record`` only appends to a bounded in-memory buffer, the prediction
+    path never waits on disk. A background task writes the buffer with one
+    executemany every ``flush_interval`` seconds, or as soon as ``batch_size``
+    records are waiting. If the buffer is full the oldest records are dropped.
+    Once per ``compact_interval`` rows older than ``retention_days`` and the
+    oldest rows beyond ``max_rows`` are deleted.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 1.0,
+        batch_size: int = 500,
+        max_buffer: int = 100_000,
+        retention_days: int = 90,
+        max_rows: int = 1_000_000,
+        compact_interval: float = 3600.0,
+    ):
+        self.configure(
+            flush_interval=flush_interval,
+            batch_size=batch_size,
+            max_buffer=max_buffer,
+            retention_days=retention_days,
+            max_rows=max_rows,
+        )
+        self.compact_interval = compact_interval
+        self._buffer: deque[tuple] = deque()
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._compacted_at = 0.0
+
+    def configure(
+        self,
+        *,
+        flush_interval: float,
+        batch_size: int,
+        max_buffer: int,
+        retention_days: int,
+        max_rows: int,
+    ) -> None:
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        for statement in SCHEMA:
+            await DB.execute(statement)
+        self._full = asyncio.Event()
+        self._compacted_at = time.monotonic()
+        self._task = asyncio.create_task(self._run(), name="audit")
+
+    async def stop(self) -> None:
+        """
+        Stop the background task and write what is buffered.
+        """
+        if not self.is_running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+
+    def record(
+        self,
+        kind: str,
+        features: dict[str, Any],
+        model_version: str,
+        latency: float,
+        price: Optional[float] = None,
+        client_id: Optional[int] = None,
+        rows: Optional[int] = None,
+    ) -> None:
+        """
+        Buffer a prediction record, ignored while the audit log is not running.
+        """
+        if not self.is_running:
+            return
+        if len(self._buffer) >= self.max_buffer:
+            self._buffer.popleft()
+            METRICS.inc("audit.dropped")
+        self._buffer.append(
+            (
+                datetime.now().strftime(TS_FORMAT),
+                kind,
+                client_id,
+                model_version,
+                features,
+                price,
+                rows,
+                latency,
+            )
+        )
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    async def flush(self) -> int:
+        """
+        Write the buffered records, returns their number.
+        """
+        if not self._buffer or not DB.is_connected:
+            return 0
+        records = list(self._buffer)
+        self._buffer.clear()
+        values = [
+            (*record[:4], json.dumps(record[4], separators=(",", ":")), *record[5:])
+            for record in records
+        ]
+        try:
+            await DB.executemany(INSERT, values)
+        except Exception:
+            METRICS.inc("audit.failed", len(values))
+            # back in front of the records buffered meanwhile, for the next flush
+            self._buffer.extendleft(reversed(records))
+            while len(self._buffer) > self.max_buffer:
+                self._buffer.popleft()
+                METRICS.inc("audit.dropped")
+            raise
+        METRICS.inc("audit.written", len(values))
+        return len(values)
+
+    async def compact(self) -> int:
+        """
+        Apply the retention policy, returns the number of deleted rows.
+        """
+        if not DB.is_connected:
+            return 0
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        # rowids grow with inserts, the oldest rows have the smallest ones
+        last_kept = (
+            await DB.execute(
+                "SELECT coalesce(max(rowid), 0) - ? FROM audit",
+                (self.max_rows,),
+                fetch="one",
+            )
+        )[0]
+        condition = "ts < ? OR rowid <= ?"
+        values = (cutoff.strftime(TS_FORMAT), last_kept)
+        deleted = (
+            await DB.execute(
+                f"SELECT count(*) FROM audit WHERE {condition}", values, fetch="one"
+            )
+        )[0]
+        if deleted:
+            await DB.execute(f"DELETE FROM audit WHERE {condition}", values)
+        METRICS.inc("audit.deleted", deleted)
+        return deleted
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+                if time.monotonic() - self._compacted_at >= self.compact_interval:
+                    self._compacted_at = time.monotonic()
+                    deleted = await self.compact()
+                    if deleted:
+                        logger.info("Deleted %d expired audit records", deleted)
+            except Exception:
+                logger.exception("Writing the audit log failed")
+
+
+audit = AuditLog()
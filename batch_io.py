@@ -0,0 +1,274 @@
+import gzip
+from typing import BinaryIO, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from pydantic import BaseModel
+
+# mirrors handlers.Item, integer columns are nullable so that missing values
+# survive parsing and are filled by the imputer
+ITEM_DTYPES = {
+    "name": str,
+    "year": "Int64",
+    "km_driven": "Int64",
+    "fuel": str,
+    "seller_type": str,
+    "transmission": str,
+    "owner": str,
+    "mileage": str,
+    "engine": str,
+    "max_power": str,
+    "torque": str,
+    "seats": "float64",
+}
+REQUIRED_COLUMNS = [column for column in ITEM_DTYPES if column != "torque"]
+
+_ARROW_TYPES = {str: pa.string(), "Int64": pa.int64(), "float64": pa.float64()}
+CSV_BLOCK_SIZE = 1 << 20
+
+OUTPUT_FORMATS = {
+    "csv": "result.csv",
+    "csv.gz": "result.csv.gz",
+    "parquet": "result.parquet",
+}
+DEFAULT_OUTPUT_FORMAT = "csv"
+EXPLAIN_KEYWORD = "explain"
+
+
+class BatchLimits(BaseModel):
+    spill_threshold: int = 8 * 1024 * 1024
+    max_file_size: int = 20 * 1024 * 1024
+    max_rows: int = 1_000_000
+    tmp_dir: Optional[str] = None
+
+
+limits = BatchLimits()
+
+
+class BatchLimitError(ValueError):
+    pass
+
+
+_MAGIC = (
+    (b"PAR1", "parquet"),
+    (b"\x1f\x8b", "gzip"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+
+
+def detect_input_format(buffer: BinaryIO, filename: Optional[str] = None) -> str:
+    """
+    Detect the upload format by its magic bytes, falling back to the file name.
+    :return: one of "parquet", "gzip", "zstd" or "csv"
+    """
+    position = buffer.tell()
+    head = buffer.read(4)
+    buffer.seek(position)
+
+    for magic, input_format in _MAGIC:
+        if head.startswith(magic):
+            return input_format
+
+    name = filename.lower() if isinstance(filename, str) else ""
+    if name.endswith(".parquet"):
+        return "parquet"
+    if name.endswith(".gz"):
+        return "gzip"
+    if name.endswith(".zst"):
+        return "zstd"
+    return "csv"
+
+
+def _apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    for column, dtype in ITEM_DTYPES.items():
+        if column not in df.columns:
+            continue
+        if dtype is str:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def check_columns(df: pd.DataFrame) -> None:
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+
+def _rechunk(batches: Iterator[pa.RecordBatch], chunk_rows: int) -> Iterator[pa.Table]:
+    # CSV blocks are sized in bytes, regroup them into chunk_rows rows
+    pending, pending_rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_rows:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunk_rows)
+            rest = table.slice(chunk_rows)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        yield pa.Table.from_batches(pending)
+
+
+def iter_batch(
+    source: BinaryIO,
+    filename: Optional[str] = None,
+    chunk_rows: int = 1000,
+    max_rows: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream an uploaded batch chunk by chunk with the Item schema, so that
+    only one chunk of a large file is held in memory at a time.
+    Raises ValueError when the file can't be parsed, lacks required columns
+    or has more than max_rows rows.
+    """
+    input_format = detect_input_format(source, filename)
+
+    try:
+        if input_format == "parquet":
+            batches = pq.ParquetFile(source).iter_batches(batch_size=chunk_rows)
+        else:
+            batches = pa_csv.open_csv(
+                pa.input_stream(
+                    source, compression=None if input_format == "csv" else input_format
+                ),
+                read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={
+                        column: _ARROW_TYPES[dtype]
+                        for column, dtype in ITEM_DTYPES.items()
+                    }
+                ),
+            )
+
+        rows = 0
+        for i, table in enumerate(_rechunk(batches, chunk_rows)):
+            df = _apply_schema(
+                table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+            )
+            if i == 0:
+                check_columns(df)
+            rows += len(df)
+            if max_rows is not None and rows > max_rows:
+                raise BatchLimitError(f"The file has more than {max_rows} rows")
+            yield df
+    except (OSError, EOFError, pa.ArrowException) as e:
+        # corrupt compressed streams surface as OSError, not as parse errors
+        raise ValueError(f"the file is damaged or not in a supported format ({e})")
+
+
+def _caption_words(caption: Optional[str]) -> list[str]:
+    if not isinstance(caption, str):
+        return []
+    return [word.lstrip(".") for word in caption.lower().split()]
+
+
+def parse_output_format(caption: Optional[str]) -> str:
+    """
+    Pick the result format from the document caption, e.g. "parquet".
+    """
+    for word in _caption_words(caption):
+        if word in OUTPUT_FORMATS:
+            return word
+    return DEFAULT_OUTPUT_FORMAT
+
+
+def parse_explain(caption: Optional[str]) -> bool:
+    """
+    Whether the document caption asks for the top_features column, e.g.
+    "parquet explain".
+    """
+    return EXPLAIN_KEYWORD in _caption_words(caption)
+
+
+class BatchWriter:
+    """
+    Writes scored chunks one by one into a binary file object.
+    ``columns`` is the header of an empty file, scored items by default.
+    """
+
+    def __init__(
+        self,
+        destination: BinaryIO,
+        output_format: str,
+        columns: Optional[list[str]] = None,
+    ):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}")
+        self.destination = destination
+        self.output_format = output_format
+        self.filename = OUTPUT_FORMATS[output_format]
+        self.columns = columns or [*ITEM_DTYPES, "predicted_price"]
+        self.rows = 0
+        self._stream: Optional[BinaryIO] = None
+        self._parquet: Optional[pq.ParquetWriter] = None
+        self._closed = False
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.output_format == "parquet":
+            if self._parquet is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                # columns that are empty in the first chunk hold strings later
+                schema = pa.schema(
+                    (
+                        field.with_type(pa.string())
+                        if pa.types.is_null(field.type)
+                        else field
+                    )
+                    for field in table.schema
+                )
+                table = table.cast(schema)
+                self._parquet = pq.ParquetWriter(
+                    self.destination, schema, compression="zstd"
+                )
+            else:
+                table = pa.Table.from_pandas(
+                    df, schema=self._parquet.schema, preserve_index=False
+                )
+            self._parquet.write_table(table)
+        else:
+            header = self._stream is None
+            if header:
+                self._stream = (
+                    gzip.GzipFile(fileobj=self.destination, mode="wb", mtime=0)
+                    if self.output_format == "csv.gz"
+                    else self.destination
+                )
+            csv = df.to_csv(header=header, index=False, lineterminator="\r\n")
+            self._stream.write(csv.encode("utf-8"))
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._stream is None and self._parquet is None:
+            # keep the header in an empty result
+            self.write(pd.DataFrame(columns=self.columns))
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._stream is not None and self._stream is not self.destination:
+            self._stream.close()
+        self.destination.flush()
+        self._closed = True
+
+    def abort(self) -> None:
+        """
+        Release the Parquet writer and gzip stream of an unfinished result,
+        the destination is left incomplete. Does nothing once closed.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._stream is not None and self._stream is not self.destination:
+            self._stream.close()
+
+
+def read_batch(buffer: BinaryIO, filename: Optional[str] = None) -> pd.DataFrame:
+    """
+    Read a whole uploaded batch into one frame, see iter_batch.
+    """
+    return pd.concat(iter_batch(buffer, filename), ignore_index=True)
@@ -0,0 +1,366 @@
+"""
+Offline load test: simulated users drive handlers.router through a real
+Dispatcher while a fake Bot session answers every API call locally.
+
+    python benchmarks/loadtest.py --users 2000 --concurrency 200
+
+Every user opens the menu, walks the single item (EntryCar) flow and taps a
+rating, every ``--batch-every``-th user uploads a batch file instead.
+Reports throughput, per-handler and per-update latency percentiles and the
+event loop lag. With ``--max-p99`` / ``--max-loop-lag`` the exit code is 1
+when a limit is exceeded, so releases can be gated on it.
+"""
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import pathlib
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import AnswerCallbackQuery, GetFile, TelegramMethod
+from aiogram.types import (
+    CallbackQuery,
+    Chat,
+    Document,
+    InputFile,
+    Message,
+    TelegramObject,
+    Update,
+    User,
+)
+
+import database
+import handlers
+from metrics import Metrics
+from scheduler import scheduler
+
+BATCH_ROW = (
+    b"Maruti Swift Dzire VDI,2014,145500,Diesel,Individual,Manual,First Owner,"
+    b"23.4 kmpl,1248 CC,74 bhp,190Nm@ 2000rpm,5.0\n"
+)
+BATCH_HEADER = (
+    b"name,year,km_driven,fuel,seller_type,transmission,owner,"
+    b"mileage,engine,max_power,torque,seats\n"
+)
+
+SINGLE_ITEM_FLOW = [
+    "Single item prediction 🚗",
+    str(handlers.available_brands.index("Toyota") + 1),
+    "2015",
+    "60000",
+    "Diesel",
+    "Individual",
+    "Manual",
+    "First Owner",
+    "17.5",
+    "1248",
+    "74",
+    "5",
+]
+
+
+class FakeSession(BaseSession):
+    """
+    Bot session that never touches the network: requests are serialized
+    like AiohttpSession does, counted and answered with minimal results.
+    Uploaded files are read completely, downloads come from ``files``.
+    """
+
+    def __init__(self, files: dict[str, bytes]):
+        super().__init__()
+        self.files = files
+        self.calls: dict[str, int] = {}
+        self._message_ids = itertools.count(1)
+
+    async def close(self) -> None:
+        pass
+
+    def _result(self, method: TelegramMethod) -> Any:
+        if isinstance(method, AnswerCallbackQuery):
+            return True
+        if isinstance(method, GetFile):
+            return {
+                "file_id": method.file_id,
+                "file_unique_id": method.file_id,
+                "file_path": method.file_id,
+            }
+        chat_id = getattr(method, "chat_id", 0)
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": getattr(method, "text", None) or "",
+        }
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None
+    ) -> Any:
+        name = type(method).__name__
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+        files: dict[str, InputFile] = {}
+        for value in method.model_dump(warnings=False).values():
+            self.prepare_value(value, bot=bot, files=files)
+        for file in files.values():
+            async for _ in file.read(bot):
+                pass
+
+        content = json.dumps({"ok": True, "result": self._result(method)})
+        return self.check_response(bot, method, 200, content).result
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[dict[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        data = self.files[url.rsplit("/", 1)[-1]]
+        for start in range(0, len(data), chunk_size):
+            yield data[start : start + chunk_size]
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """
+    Inner middleware timing every handler call by handler name
+    into the ``timings`` passed to feed_update.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        started_at = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            name = data["handler"].callback.__name__
+            data["timings"].observe(f"handler.{name}", time.perf_counter() - started_at)
+
+
+async def monitor_loop_lag(timings: Metrics, interval: float) -> None:
+    """
+    Sleep for ``interval`` in a loop, recording how late every wake-up is.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        timings.observe("loop_lag", max(0.0, loop.time() - expected))
+
+
+class SimulatedUser:
+    _update_ids = itertools.count(1)
+
+    def __init__(self, user_id: int, dp: Dispatcher, bot: Bot, timings: Metrics):
+        self.user = User(id=user_id, is_bot=False, first_name=f"user{user_id}")
+        self.chat = Chat(id=user_id, type="private")
+        self.dp = dp
+        self.bot = bot
+        self.timings = timings
+        self._message_ids = itertools.count(1)
+
+    async def feed(self, **event: TelegramObject) -> None:
+        update = Update(update_id=next(self._update_ids), **event)
+        started_at = time.perf_counter()
+        await self.dp.feed_update(self.bot, update, timings=self.timings)
+        self.timings.observe("update", time.perf_counter() - started_at)
+
+    def _message(self, **fields: Any) -> Message:
+        return Message(
+            message_id=next(self._message_ids),
+            date=datetime.now(),
+            chat=self.chat,
+            from_user=self.user,
+            **fields,
+        )
+
+    async def send(self, text: str) -> None:
+        await self.feed(message=self._message(text=text))
+
+    async def upload(self, file_id: str, size: int) -> None:
+        document = Document(
+            file_id=file_id,
+            file_unique_id=file_id,
+            file_name="cars.csv",
+            file_size=size,
+        )
+        await self.feed(message=self._message(document=document))
+
+    async def rate(self, stars: int) -> None:
+        callback = CallbackQuery(
+            id=str(next(self._message_ids)),
+            from_user=self.user,
+            chat_instance=str(self.chat.id),
+            data=str(stars),
+        )
+        await self.feed(callback_query=callback)
+
+    async def single_item(self) -> None:
+        await self.send("/start")
+        for text in SINGLE_ITEM_FLOW:
+            await self.send(text)
+        await self.rate(5)
+
+    async def batch(self, file_id: str, size: int) -> None:
+        await self.send("/start")
+        await self.send("Batch prediction 🛻🚚")
+        await self.upload(file_id, size)
+
+
+@functools.cache
+def build_dispatcher() -> Dispatcher:
+    # a router can only be attached to one parent, so all runs of the
+    # process share this dispatcher (and its FSM storage)
+    dp = Dispatcher(storage=MemoryStorage())
+    dp["started_at"] = datetime.now().strftime("%Y-%m-%d %H:%M")
+    dp.message.middleware(HandlerTimingMiddleware())
+    dp.callback_query.middleware(HandlerTimingMiddleware())
+    dp.include_router(handlers.router)
+    return dp
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    # every update and handler sample is kept, not just a recent window
+    timings = Metrics(window=args.users * (len(SINGLE_ITEM_FLOW) + 2) * 2)
+
+    batch_file = BATCH_HEADER + BATCH_ROW * args.batch_rows
+    session = FakeSession({"batch": batch_file})
+    bot = Bot(token="42:LOADTEST", session=session)
+    dp = build_dispatcher()
+
+    scheduler.configure(
+        workers=args.workers,
+        background_policy=scheduler.background_policy,
+        batch_cpu_share=scheduler.batch_cpu_share,
+        chunk_size=scheduler.chunk_size,
+    )
+    scheduler.start()
+
+    db_path = database.db_path
+    with tempfile.TemporaryDirectory() as tmp:
+        database.db_path = pathlib.Path(tmp) / "rating.db"
+        await database.init_db()
+
+        limit = asyncio.Semaphore(args.concurrency)
+
+        async def simulate(user_id: int) -> None:
+            async with limit:
+                user = SimulatedUser(user_id, dp, bot, timings)
+                if args.batch_every and user_id % args.batch_every == 0:
+                    await user.batch("batch", len(batch_file))
+                else:
+                    await user.single_item()
+
+        monitor = asyncio.create_task(monitor_loop_lag(timings, args.lag_interval))
+        started_at = time.perf_counter()
+        try:
+            await asyncio.gather(*(simulate(i) for i in range(1, args.users + 1)))
+        finally:
+            elapsed = time.perf_counter() - started_at
+            monitor.cancel()
+            await scheduler.stop()
+            await database.DB.close()
+            database.db_path = db_path
+
+    snapshot = timings.snapshot()["timings"]
+    updates = snapshot["update"]["count"]
+    return {
+        "users": args.users,
+        "updates": updates,
+        "elapsed": elapsed,
+        "updates_per_second": updates / elapsed,
+        "update": snapshot.pop("update"),
+        "loop_lag": snapshot.pop("loop_lag", {"count": 0}),
+        "handlers": {
+            name.removeprefix("handler."): summary
+            for name, summary in sorted(snapshot.items())
+        },
+        "api_calls": dict(sorted(session.calls.items())),
+    }
+
+
+def _ms(summary: dict[str, float], key: str) -> str:
+    return f"{summary[key] * 1000:9.2f}" if key in summary else f"{'-':>9}"
+
+
+def print_report(report: dict[str, Any]) -> None:
+    print(
+        f"{report['users']} users, {report['updates']} updates "
+        f"in {report['elapsed']:.2f}s: {report['updates_per_second']:.0f} updates/s\n"
+    )
+    print(f"{'ms':<36}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    rows = [("update", report["update"]), ("loop lag", report["loop_lag"])]
+    rows += list(report["handlers"].items())
+    for name, summary in rows:
+        print(
+            f"{name:<36}{summary['count']:>7}"
+            + "".join(_ms(summary, key) for key in ("p50", "p95", "p99", "max"))
+        )
+    print(
+        "\nAPI calls: " + ", ".join(f"{k} {v}" for k, v in report["api_calls"].items())
+    )
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python benchmarks/loadtest.py")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument(
+        "--concurrency", type=int, default=100, help="users active at the same time"
+    )
+    parser.add_argument(
+        "--batch-every",
+        type=int,
+        default=50,
+        help="every n-th user uploads a batch file, 0 disables batches",
+    )
+    parser.add_argument("--batch-rows", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1, help="scheduler workers")
+    parser.add_argument("--lag-interval", type=float, default=0.01)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-p99", type=float, help="update p99 limit, seconds")
+    parser.add_argument(
+        "--max-loop-lag", type=float, help="loop lag p99 limit, seconds"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    failed = False
+    if args.max_p99 is not None and report["update"]["p99"] > args.max_p99:
+        print(f"update p99 exceeds {args.max_p99}s", file=sys.stderr)
+        failed = True
+    if (
+        args.max_loop_lag is not None
+        and report["loop_lag"].get("p99", 0) > args.max_loop_lag
+    ):
+        print(f"loop lag p99 exceeds {args.max_loop_lag}s", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
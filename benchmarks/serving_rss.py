@@ -0,0 +1,102 @@
+"""
+Memory of N inference processes: pickled models per process vs. the
+memory-mapped serving artifact.
+
+    python benchmarks/serving_rss.py --processes 4
+
+Every worker is a fresh interpreter (spawn) that loads the model, scores one
+row and reports its RSS and PSS while all workers are alive. PSS splits
+shared pages between the processes, so its sum is the real footprint.
+Linux only (reads /proc/self/smaps_rollup).
+"""
+
+import argparse
+import multiprocessing
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+ROW = {
+    "name": "Maruti Swift Dzire VDI",
+    "year": 2014,
+    "km_driven": 145500,
+    "fuel": "Diesel",
+    "seller_type": "Individual",
+    "transmission": "Manual",
+    "owner": "First Owner",
+    "mileage": "23.4 kmpl",
+    "engine": "1248 CC",
+    "max_power": "74 bhp",
+    "torque": "190Nm@ 2000rpm",
+    "seats": 5.0,
+}
+
+
+def _memory_kb() -> dict[str, int]:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss"):
+                fields[name.lower()] = int(value.split()[0])
+    return fields
+
+
+def _worker(mode: str, barrier, results) -> None:
+    sys.path.insert(0, str(ROOT))
+    import warnings
+
+    import pandas as pd
+
+    warnings.filterwarnings("ignore")
+    if mode == "pickle":
+        from preprocessing import CarPricePredictorPreprocessor
+
+        model = CarPricePredictorPreprocessor(ROOT / "models")
+    else:
+        from serving import ServingModel
+
+        model = ServingModel.load(ROOT / "models" / "serving")
+
+    model.predict(pd.DataFrame([ROW]))
+    barrier.wait()
+    results.put(_memory_kb())
+    barrier.wait()
+
+
+def measure(mode: str, processes: int) -> dict[str, int]:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_worker, args=(mode, barrier, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    samples = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return {
+        "rss": sum(sample["rss"] for sample in samples),
+        "pss": sum(sample["pss"] for sample in samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'processes':>10}{'RSS, MB':>12}{'PSS, MB':>12}")
+    for mode in ("pickle", "serving"):
+        totals = measure(mode, args.processes)
+        print(
+            f"{mode:<10}{args.processes:>10}"
+            f"{totals['rss'] / 1024:>12.1f}{totals['pss'] / 1024:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
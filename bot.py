@@ -1,30 +1,145 @@
 import asyncio
-import logging
+import pathlib
 
 from datetime import datetime
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 
+import batch_io
 import handlers
 
 from config_reader import config
-from database import init_db
+from audit import audit
+from circuit import circuit, recent_prices
+from database import DB, init_db
+from export import table_export
+from history import history
+from health import health, warm_up
+from lifecycle import lifecycle
+from logging_setup import setup_logging
+from middlewares import DEFAULT_LIMITS, LogContextMiddleware, debouncer, throttling
+from outbox import PooledAiohttpSession, outbox
+from scheduler import scheduler
+from result_cache import result_cache
+from price_cache import price_cache
+from serving import ServingModel
+from shadow import shadow
 
 
-logging.basicConfig(level=logging.DEBUG)
+def load_model():
+    """
+    The serving artifact if one is configured, the pickled models otherwise,
+    so sklearn is only imported when they are used.
+    """
+    if config.serving_artifact:
+        return ServingModel.load(
+            pathlib.Path(config.serving_artifact), config.serving_precision
+        )
+    from preprocessing import CarPricePredictorPreprocessor
+
+    return CarPricePredictorPreprocessor(handlers.models_folder)
 
 
 async def main():
+    setup_logging(
+        level=config.log_level,
+        levels=config.log_levels,
+        json_format=config.log_format == "json",
+        debug_sample_rate=config.log_debug_sample_rate,
+    )
+
+    DB.configure(config.db_read_connections)
     await init_db()
-    bot = Bot(token=config.bot_token.get_secret_value())
+    history.configure(
+        max_entries=config.history_max_entries, page_size=config.history_page_size
+    )
+    table_export.configure(config.export_page_size)
+    scheduler.configure(
+        workers=config.scheduler_workers,
+        background_policy=config.scheduler_background_policy,
+        batch_cpu_share=config.scheduler_batch_cpu_share,
+        chunk_size=config.scheduler_chunk_size,
+    )
+    scheduler.start()
+
+    batch_io.limits = batch_io.BatchLimits(
+        spill_threshold=config.batch_spill_threshold,
+        max_file_size=config.batch_max_file_size,
+        max_rows=config.batch_max_rows,
+        tmp_dir=config.batch_tmp_dir,
+    )
+    result_cache.configure(config.result_cache_dir, config.result_cache_max_bytes)
+    circuit.configure(
+        timeout=config.prediction_timeout,
+        slow_call=config.circuit_slow_call,
+        failure_rate=config.circuit_failure_rate,
+        window=config.circuit_window,
+        min_calls=config.circuit_min_calls,
+        open_duration=config.circuit_open_duration,
+    )
+    recent_prices.configure(config.fallback_prices)
+
+    if config.audit_enabled:
+        audit.configure(
+            flush_interval=config.audit_flush_interval,
+            batch_size=config.audit_batch_size,
+            max_buffer=config.audit_max_buffer,
+            retention_days=config.audit_retention_days,
+            max_rows=config.audit_max_rows,
+        )
+        await audit.start()
+        lifecycle.on_flush(audit.stop)
+
+    handlers.preprocessor = load_model()
+
+    if config.shadow_models:
+        from preprocessing import CarPricePredictorPreprocessor
+
+        shadow.configure(
+            CarPricePredictorPreprocessor(pathlib.Path(config.shadow_models)),
+            sample_rate=config.shadow_sample_rate,
+            max_pending=config.shadow_max_pending,
+        )
+        lifecycle.on_flush(shadow.stop)
+
+    health.configure(config.health_host, config.health_port, config.health_file)
+    await health.start()
+    health.set_ready(await warm_up(config.warm_up_rows))
+
+    session = PooledAiohttpSession(
+        connections=config.telegram_connections, api_url=config.telegram_api_url
+    )
+    bot = Bot(token=config.bot_token.get_secret_value(), session=session)
     dp = Dispatcher(storage=MemoryStorage())
 
     dp["started_at"] = datetime.now().strftime("%Y-%m-%d %H:%M")
 
+    LogContextMiddleware().setup(dp)
+    throttling.configure({**DEFAULT_LIMITS, **config.throttle_limits})
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+    debouncer.configure(config.inline_debounce)
+    price_cache.configure(config.inline_cache_ttl, config.inline_cache_size)
+
+    handlers.admin_ids = frozenset(config.admin_ids)
     dp.include_router(handlers.router)
 
+    lifecycle.configure(config.shutdown_timeout, config.fsm_snapshot)
+    lifecycle.setup(dp)
+
+    outbox.configure(
+        per_chat_rate=config.outbox_per_chat_rate,
+        per_chat_burst=config.outbox_per_chat_burst,
+        global_rate=config.outbox_global_rate,
+        global_burst=config.outbox_global_burst,
+        max_pending=config.outbox_max_pending,
+    )
+    outbox.start(bot)
+
     await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    # on SIGTERM/SIGINT aiogram stops polling and runs lifecycle.shutdown,
+    # which closes the session once the outbox has sent what is queued
+    await dp.start_polling(bot, close_bot_session=False)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+"""
+Offline batch scoring without Telegram.
+
+    python -m car_price_predict catalog.csv.gz prices.parquet --workers 8
+
+Chunks of the input are scored on a process pool and written in input order.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import pathlib
+import sys
+import time
+from collections import deque
+from typing import Optional, Union
+
+import pandas as pd
+
+import batch_io
+
+from preprocessing import CarPricePredictorPreprocessor
+from serving import ServingModel
+
+logger = logging.getLogger("car_price_predict")
+
+models_folder = pathlib.Path(__file__).resolve().parent / "models"
+
+_preprocessor: Optional[Union[CarPricePredictorPreprocessor, ServingModel]] = None
+
+
+def load_model(
+    folder: pathlib.Path,
+    serving_artifact: Optional[pathlib.Path] = None,
+    precision: str = "float64",
+) -> Union[CarPricePredictorPreprocessor, ServingModel]:
+    if serving_artifact is not None:
+        return ServingModel.load(serving_artifact, precision)
+    return CarPricePredictorPreprocessor(folder)
+
+
+def _init_worker(
+    folder: pathlib.Path,
+    serving_artifact: Optional[pathlib.Path] = None,
+    precision: str = "float64",
+) -> None:
+    # with the fork start method workers inherit the parent's models
+    # copy-on-write, so they are only loaded here for spawn
+    global _preprocessor
+    if _preprocessor is None:
+        _preprocessor = load_model(folder, serving_artifact, precision)
+
+
+def score_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    return chunk.assign(predicted_price=_preprocessor.predict(chunk))
+
+
+def output_format_for(path: pathlib.Path) -> str:
+    name = path.name.lower()
+    if name.endswith(".parquet"):
+        return "parquet"
+    if name.endswith(".gz"):
+        return "csv.gz"
+    return "csv"
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m car_price_predict",
+        description="Predict car prices for a CSV (optionally gzip/zstd) or Parquet file",
+    )
+    parser.add_argument("input", type=pathlib.Path)
+    parser.add_argument("output", type=pathlib.Path)
+    parser.add_argument(
+        "--format",
+        choices=list(batch_io.OUTPUT_FORMATS),
+        help="output format, by default guessed from the output file name",
+    )
+    parser.add_argument("--models", type=pathlib.Path, default=models_folder)
+    parser.add_argument(
+        "--serving-artifact",
+        type=pathlib.Path,
+        help="use the memory-mapped serving artifact (see serving.py) "
+        "instead of the pickled models",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=["float64", "float32"],
+        default="float64",
+        help="compute precision of the serving artifact, "
+        "see `python -m serving report` for the error it costs",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument(
+        "--progress-every",
+        type=float,
+        default=5.0,
+        help="seconds between progress reports",
+    )
+    args = parser.parse_args(argv)
+    if args.precision != "float64" and args.serving_artifact is None:
+        parser.error("--precision requires --serving-artifact")
+    return args
+
+
+def run(args: argparse.Namespace) -> int:
+    """
+    Score the input file and return the number of rows written.
+    """
+    global _preprocessor
+    _preprocessor = load_model(args.models, args.serving_artifact, args.precision)
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    started_at = last_report = time.monotonic()
+    output_format = args.format or output_format_for(args.output)
+
+    with open(args.input, "rb") as source, open(args.output, "wb") as destination:
+        chunks = batch_io.iter_batch(
+            source, args.input.name, chunk_rows=args.chunk_size
+        )
+        writer = batch_io.BatchWriter(destination, output_format)
+
+        try:
+            with context.Pool(
+                args.workers,
+                initializer=_init_worker,
+                initargs=(args.models, args.serving_artifact, args.precision),
+            ) as pool:
+                # a bounded window of chunks in flight keeps memory flat
+                # while results are still written in input order
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.apply_async(score_chunk, (chunk,)))
+                    if len(pending) < 2 * args.workers:
+                        continue
+                    writer.write(pending.popleft().get())
+
+                    now = time.monotonic()
+                    if now - last_report >= args.progress_every:
+                        last_report = now
+                        logger.info(
+                            "%d rows, %.0f rows/s",
+                            writer.rows,
+                            writer.rows / (now - started_at),
+                        )
+
+                while pending:
+                    writer.write(pending.popleft().get())
+
+            writer.close()
+        finally:
+            writer.abort()
+
+    elapsed = time.monotonic() - started_at
+    logger.info(
+        "Done: %d rows in %.1fs, %.0f rows/s",
+        writer.rows,
+        elapsed,
+        writer.rows / elapsed if elapsed else 0,
+    )
+    return writer.rows
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr
+    )
+    args = parse_args(argv)
+    try:
+        run(args)
+    except ValueError as e:
+        # unreadable, too large or incomplete input files (BatchLimitError too)
+        sys.exit(f"{args.input}: {e}")
+
+
+if __name__ == "__main__":
+    main()
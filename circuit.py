@@ -0,0 +1,213 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Optional
+
+from metrics import METRICS
+from scheduler import scheduler
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# exported as the circuit.state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """
+    The circuit is open, the prediction was not attempted.
+    """
+
+
+class CircuitBreaker:
+    """
+    Deadline for interactive predictions and a circuit breaker around them.
+
+    Every call gets ``timeout`` seconds including the wait in the scheduler
+    queue. A call failing, timing out or taking longer than ``slow_call``
+    seconds counts as bad. Once at least ``min_calls`` of the last
+    ``window`` calls are known and ``failure_rate`` of them were bad the
+    circuit opens: calls fail immediately with CircuitOpenError for
+    ``open_duration`` seconds, then a single probe call is let through and
+    closes the circuit again if it succeeds.
+
+    A job that timed out while queued is skipped by the scheduler, one
+    already running finishes in its worker thread, only the caller stops
+    waiting for it.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        slow_call: float = 2.0,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 5,
+        open_duration: float = 30.0,
+    ):
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self.configure(
+            timeout=timeout,
+            slow_call=slow_call,
+            failure_rate=failure_rate,
+            window=window,
+            min_calls=min_calls,
+            open_duration=open_duration,
+        )
+        self._set_state(CLOSED)
+
+    def configure(
+        self,
+        *,
+        timeout: float,
+        slow_call: float,
+        failure_rate: float,
+        window: int,
+        min_calls: int,
+        open_duration: float,
+    ) -> None:
+        if not 0 < failure_rate <= 1:
+            raise ValueError("failure_rate must be in (0, 1]")
+        if timeout <= 0 or window < 1 or not 1 <= min_calls <= window:
+            raise ValueError("timeout, window and min_calls must be positive")
+        self.timeout = timeout
+        self.slow_call = slow_call
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self._outcomes = deque(self._outcomes, maxlen=window)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self.opened_at = time.monotonic()
+        self._probing = False
+        METRICS.set_gauge("circuit.state", STATE_VALUES[state])
+
+    def _allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_duration:
+                return False
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def _record(self, bad: bool) -> None:
+        if self.state == HALF_OPEN:
+            self._outcomes.clear()
+            self._set_state(OPEN if bad else CLOSED)
+            return
+
+        self._outcomes.append(bad)
+        bad_calls = sum(self._outcomes)
+        METRICS.set_gauge("circuit.bad_calls", bad_calls)
+        if (
+            self.state == CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and bad_calls >= self.failure_rate * len(self._outcomes)
+        ):
+            self._outcomes.clear()
+            self._set_state(OPEN)
+            METRICS.inc("circuit.opened")
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """
+        Run an interactive prediction job within the deadline.
+        Raises CircuitOpenError, TimeoutError or the error of the job.
+        """
+        if not self._allow():
+            METRICS.inc("circuit.rejected")
+            raise CircuitOpenError("Prediction is temporarily unavailable")
+
+        started_at = time.monotonic()
+        try:
+            result = await asyncio.wait_for(
+                scheduler.run_interactive(func, *args), self.timeout
+            )
+        except asyncio.TimeoutError:
+            METRICS.inc("circuit.timeouts")
+            self._record(bad=True)
+            raise
+        except Exception:
+            METRICS.inc("circuit.failures")
+            self._record(bad=True)
+            raise
+        except asyncio.CancelledError:
+            # the caller went away, this says nothing about the model
+            if self.state == HALF_OPEN:
+                self._probing = False
+            raise
+        self._record(bad=time.monotonic() - started_at > self.slow_call)
+        return result
+
+
+circuit = CircuitBreaker()
+
+
+class RecentPrices:
+    """
+    The last ``max_size`` predicted cars, to answer with the price of the
+    most similar one while predictions are unavailable.
+
+    Only cars of the same brand, fuel and transmission are similar, the
+    distance adds up years, 20 000 km and differing owner or seller type.
+    """
+
+    KEY_FIELDS = ("fuel", "transmission")
+
+    def __init__(self, max_size: int = 1000, max_distance: float = 3.0):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self._prices: OrderedDict[tuple, tuple[dict[str, Any], float]] = OrderedDict()
+
+    def configure(self, max_size: int) -> None:
+        self.max_size = max_size
+        while len(self._prices) > max_size:
+            self._prices.popitem(last=False)
+
+    @staticmethod
+    def _brand(item: dict[str, Any]) -> str:
+        return str(item["name"]).split(" ")[0].lower()
+
+    def add(self, item: dict[str, Any], price: float) -> None:
+        if self.max_size <= 0:
+            return
+        key = tuple(sorted(item.items()))
+        self._prices[key] = (item, price)
+        self._prices.move_to_end(key)
+        while len(self._prices) > self.max_size:
+            self._prices.popitem(last=False)
+
+    @staticmethod
+    def distance(a: dict[str, Any], b: dict[str, Any]) -> float:
+        return (
+            abs(int(a["year"]) - int(b["year"]))
+            + abs(int(a["km_driven"]) - int(b["km_driven"])) / 20000
+            + (a["owner"] != b["owner"])
+            + (a["seller_type"] != b["seller_type"])
+        )
+
+    def nearest(self, item: dict[str, Any]) -> Optional[tuple[dict[str, Any], float]]:
+        """
+        The most similar predicted car and its price, None if there is none
+        within ``max_distance``.
+        """
+        brand = self._brand(item)
+        best, best_distance = None, self.max_distance
+        for other, price in reversed(self._prices.values()):
+            if self._brand(other) != brand or any(
+                other[field] != item[field] for field in self.KEY_FIELDS
+            ):
+                continue
+            distance = self.distance(item, other)
+            if distance <= best_distance:
+                best, best_distance = (other, price), distance
+                if distance == 0:
+                    break
+        return best
+
+
+recent_prices = RecentPrices()
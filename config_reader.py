@@ -1,9 +1,84 @@
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import SecretStr
 
+from middlewares import ThrottleLimit
+
 
 class Settings(BaseSettings):
     bot_token: SecretStr
+
+    scheduler_workers: int = 1
+    scheduler_background_policy: Literal["strict", "weighted"] = "strict"
+    scheduler_batch_cpu_share: float = 0.8
+    scheduler_chunk_size: int = 1000
+
+    batch_spill_threshold: int = 8 * 1024 * 1024
+    batch_max_file_size: int = 20 * 1024 * 1024
+    batch_max_rows: int = 1_000_000
+    batch_tmp_dir: Optional[str] = None
+
+    result_cache_dir: Optional[str] = "cache"
+    result_cache_max_bytes: int = 512 * 1024 * 1024
+
+    serving_artifact: Optional[str] = None
+    serving_precision: Literal["float64", "float32"] = "float64"
+
+    warm_up_rows: int = 1000
+    health_host: str = "127.0.0.1"
+    health_port: Optional[int] = None
+    health_file: Optional[str] = None
+
+    throttle_limits: dict[str, ThrottleLimit] = {}
+
+    inline_debounce: float = 0.3
+    inline_cache_ttl: float = 300.0
+    inline_cache_size: int = 10000
+
+    outbox_per_chat_rate: float = 1.0
+    outbox_per_chat_burst: int = 3
+    outbox_global_rate: float = 30.0
+    outbox_global_burst: int = 30
+    outbox_max_pending: int = 10000
+
+    telegram_api_url: Optional[str] = None
+    telegram_connections: int = 100
+
+    log_level: str = "INFO"
+    log_levels: dict[str, str] = {}
+    log_format: Literal["json", "text"] = "json"
+    log_debug_sample_rate: float = 0.1
+
+    shutdown_timeout: float = 25.0
+    fsm_snapshot: Optional[str] = None
+
+    admin_ids: list[int] = []
+
+    db_read_connections: int = 2
+    export_page_size: int = 5000
+    history_max_entries: int = 100
+    history_page_size: int = 5
+
+    audit_enabled: bool = True
+    audit_flush_interval: float = 1.0
+    audit_batch_size: int = 500
+    audit_max_buffer: int = 100_000
+    audit_retention_days: int = 90
+    audit_max_rows: int = 1_000_000
+
+    prediction_timeout: float = 5.0
+    circuit_slow_call: float = 2.0
+    circuit_failure_rate: float = 0.5
+    circuit_window: int = 20
+    circuit_min_calls: int = 5
+    circuit_open_duration: float = 30.0
+    fallback_prices: int = 1000
+
+    shadow_models: Optional[str] = None
+    shadow_sample_rate: float = 0.1
+    shadow_max_pending: int = 100
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
@@ -1,6 +1,6 @@
 import pathlib
 import sqlite3
-from typing import Tuple, Any, Optional
+from typing import AsyncIterator, Iterable, Tuple, Any, Optional
 
 import aiosqlite
 
@@ -8,15 +8,51 @@ db_path = pathlib.Path(__file__).resolve().parent / "rating.db"
 
 
 class Database:
-    def __init__(self):
+    """
+    Connection to the bot database. Writes and their commits go through
+    ``conn``, queries sent with ``read`` are spread over ``read_connections``
+    read-only connections, so they run next to writes instead of queueing
+    behind them (the database is switched to WAL mode for that).
+    """
+
+    def __init__(self, read_connections: int = 2):
         self.conn: Optional[aiosqlite.Connection] = None
+        self.read_connections = read_connections
+        self._readers: list[aiosqlite.Connection] = []
+        self._next_reader = 0
+
+    def configure(self, read_connections: int) -> None:
+        self.read_connections = read_connections
 
     async def connect(self):
+        await self._close_readers()
+        if self.conn is not None:
+            # every write is committed by execute, only the thread is left
+            await self.conn.close()
+            self.conn = None
         try:
             self.conn = await aiosqlite.connect(db_path)
+            cursor = await self.conn.execute("PRAGMA journal_mode=WAL")
+            await cursor.close()
+            for _ in range(self.read_connections):
+                self._readers.append(
+                    await aiosqlite.connect(f"{db_path.as_uri()}?mode=ro", uri=True)
+                )
         except aiosqlite.Error:
             pass
 
+    async def _close_readers(self):
+        readers, self._readers = self._readers, []
+        for reader in readers:
+            await reader.close()
+
+    async def close(self):
+        await self._close_readers()
+        if self.conn is not None:
+            await self.conn.commit()
+            await self.conn.close()
+            self.conn = None
+
     @property
     def is_connected(self) -> bool:
         return self.conn is not None
@@ -44,10 +80,82 @@ class Database:
         await cursor.close()
         return data
 
+    async def read(
+        self, query: str, values: Tuple = (), *, fetch: str = "all"
+    ) -> Optional[Any]:
+        """
+        Run a query on the read pool, on ``conn`` if the pool is not open.
+        """
+        if not self._readers:
+            return await self.execute(query, values, fetch=fetch)
+
+        cursor = await self._reader().execute(query, values)
+        data = await self._fetch(cursor, fetch)
+        await cursor.close()
+        return data
+
+    async def stream(
+        self, query: str, values: Tuple = (), *, page_size: int = 1000
+    ) -> AsyncIterator[list]:
+        """
+        Rows of a query in pages of ``page_size``, read from one snapshot
+        of the database on the read pool (on ``conn`` if the pool is not open).
+        """
+        connection = self._reader() if self._readers else self.conn
+        cursor = await connection.execute(query, values)
+        cursor.arraysize = page_size
+        try:
+            while rows := await self._fetch(cursor, "many"):
+                yield rows
+        finally:
+            await cursor.close()
+
+    def _reader(self) -> aiosqlite.Connection:
+        reader = self._readers[self._next_reader % len(self._readers)]
+        self._next_reader += 1
+        return reader
+
+    async def executemany(self, query: str, values: Iterable[Tuple]) -> None:
+        cursor = await self.conn.cursor()
+
+        await cursor.executemany(query, values)
+        await self.conn.commit()
+
+        await cursor.close()
+
 
 DB = Database()
 
 
+# rating rollups: star counts per day and per week (starting on Monday),
+# kept up to date by a trigger and filled from existing ratings once
+RATING_SCHEMA = (
+    "CREATE INDEX IF NOT EXISTS rating_ts ON rating(ts)",
+    "CREATE TABLE IF NOT EXISTS rating_daily(day TEXT, stars INTEGER, "
+    "count INTEGER, PRIMARY KEY (day, stars)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS rating_weekly(week TEXT, stars INTEGER, "
+    "count INTEGER, PRIMARY KEY (week, stars)) WITHOUT ROWID",
+    "INSERT INTO rating_daily SELECT date(ts), rating, count(*) FROM rating "
+    "WHERE NOT EXISTS (SELECT 1 FROM rating_daily) GROUP BY 1, 2",
+    "INSERT INTO rating_weekly SELECT date(ts, 'weekday 0', '-6 days'), rating, "
+    "count(*) FROM rating WHERE NOT EXISTS (SELECT 1 FROM rating_weekly) "
+    "GROUP BY 1, 2",
+    "CREATE TRIGGER IF NOT EXISTS rating_rollup AFTER INSERT ON rating BEGIN "
+    "INSERT INTO rating_daily VALUES (date(NEW.ts), NEW.rating, 1) "
+    "ON CONFLICT (day, stars) DO UPDATE SET count = count + 1; "
+    "INSERT INTO rating_weekly "
+    "VALUES (date(NEW.ts, 'weekday 0', '-6 days'), NEW.rating, 1) "
+    "ON CONFLICT (week, stars) DO UPDATE SET count = count + 1; END",
+)
+
+# single item predictions, read page by page per user (see history.py)
+HISTORY_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS history(client_id INTEGER, ts DATETIME, "
+    "features TEXT, price REAL)",
+    "CREATE INDEX IF NOT EXISTS history_client_ts ON history(client_id, ts)",
+)
+
+
 async def init_db():
     await DB.connect()
     connection = sqlite3.connect(db_path)
@@ -55,11 +163,12 @@ async def init_db():
     cursor.execute(
         "select name from sqlite_schema where type='table' and name='rating'"
     )
-    if cursor.fetchone():
-        return
-    cursor.execute(
-        "CREATE TABLE rating(client_id INTEGER primary key unique , rating INTEGER, ts DATETIME)"
-    )
+    if not cursor.fetchone():
+        cursor.execute(
+            "CREATE TABLE rating(client_id INTEGER primary key unique , rating INTEGER, ts DATETIME)"
+        )
+    for statement in RATING_SCHEMA + HISTORY_SCHEMA:
+        cursor.execute(statement)
     connection.commit()
     cursor.close()
     connection.close()
@@ -0,0 +1,71 @@
+"""
+Per-feature contributions of the linear price model.
+
+The price is the intercept plus coefficient x transformed value summed over
+the model features, so the contribution of an input feature is that product
+summed over the model features derived from it: the standardized numeric
+value, the three year polynomial terms, or the one-hot column of its
+category. Numeric contributions are relative to the average car of the
+training data, categorical ones to the first (dropped) category.
+"""
+
+import numpy as np
+import pandas as pd
+
+# model features derived from the same input feature
+FEATURE_GROUPS = {"0": "year", "1": "year", "2": "year"}
+
+LABELS = {
+    "km_driven": "km driven",
+    "max_power": "max power",
+    "seller_type": "seller type",
+    "Brand": "brand",
+}
+
+
+def group_matrix(
+    feature_names: list[str], categorical_features: list[str]
+) -> tuple[list[str], np.ndarray]:
+    """
+    Map model features to the input features they come from.
+    Returns:
+        tuple[list[str], np.ndarray]: Labels of the input features and a
+        (model features, input features) matrix of ones and zeros.
+    """
+    groups = []
+    for name in feature_names:
+        group = FEATURE_GROUPS.get(name, name)
+        for feature in categorical_features:
+            if name.startswith(f"{feature}_"):
+                group = feature
+                break
+        groups.append(LABELS.get(group, group))
+
+    labels = list(dict.fromkeys(groups))
+    matrix = np.zeros((len(groups), len(labels)))
+    matrix[np.arange(len(groups)), [labels.index(group) for group in groups]] = 1
+    return labels, matrix
+
+
+def top_contributions(
+    contributions: pd.DataFrame, k: int = 3
+) -> list[list[tuple[str, float]]]:
+    """
+    The k largest contributions by magnitude of every row.
+    """
+    values = contributions.to_numpy()
+    order = np.argsort(-np.abs(values), axis=1, kind="stable")[:, :k]
+    labels = np.asarray(contributions.columns)
+    return [
+        list(zip(labels[row].tolist(), values[i, row].tolist()))
+        for i, row in enumerate(order)
+    ]
+
+
+def describe(top: list[tuple[str, float]], separator: str = "; ") -> str:
+    """
+    Format contributions as "year +123 456; brand -45 000".
+    """
+    return separator.join(
+        f"{label} {value:+,.0f}".replace(",", " ") for label, value in top
+    )
@@ -0,0 +1,88 @@
+from typing import BinaryIO
+
+import pandas as pd
+
+import batch_io
+from database import DB
+from scheduler import scheduler
+
+# exportable tables of the bot database and the types of their columns
+EXPORT_TABLES = {
+    "rating": {"client_id": "Int64", "rating": "Int64", "ts": "string"},
+    "history": {
+        "client_id": "Int64",
+        "ts": "string",
+        "features": "string",
+        "price": "float64",
+    },
+    "audit": {
+        "ts": "string",
+        "kind": "string",
+        "client_id": "Int64",
+        "model_version": "string",
+        "features": "string",
+        "price": "float64",
+        "rows": "Int64",
+        "latency": "float64",
+    },
+}
+
+EXPORT_FORMATS = ("csv.gz", "parquet")
+DEFAULT_EXPORT_FORMAT = "csv.gz"
+
+
+class TableExport:
+    """
+    Streams tables of the bot database into gzipped CSV or Parquet files.
+
+    Rows are fetched ``page_size`` at a time from the read pool of DB, a
+    read-only connection reading one snapshot in WAL mode, so ratings and
+    predictions are written meanwhile and memory use does not depend on the
+    size of the table. Every page is converted and written by the background
+    queue of the scheduler, after single item predictions and batch files.
+    """
+
+    def __init__(self, page_size: int = 5000):
+        self.page_size = page_size
+
+    def configure(self, page_size: int) -> None:
+        self.page_size = page_size
+
+    @staticmethod
+    async def tables() -> list[str]:
+        """
+        Exportable tables present in the database, e.g. audit only once
+        the audit log has been enabled.
+        """
+        rows = await DB.read("SELECT name FROM sqlite_schema WHERE type = 'table'")
+        present = {name for (name,) in rows}
+        return [table for table in EXPORT_TABLES if table in present]
+
+    @staticmethod
+    def _write(
+        writer: batch_io.BatchWriter, rows: list[tuple], dtypes: dict[str, str]
+    ) -> None:
+        writer.write(
+            pd.DataFrame.from_records(rows, columns=list(dtypes)).astype(dtypes)
+        )
+
+    async def export(
+        self, table: str, destination: BinaryIO, output_format: str
+    ) -> int:
+        """
+        Write a whole table, returns the number of rows.
+        """
+        dtypes = EXPORT_TABLES[table]
+        writer = batch_io.BatchWriter(destination, output_format, columns=list(dtypes))
+        try:
+            async for rows in DB.stream(
+                f"SELECT {', '.join(dtypes)} FROM {table}", page_size=self.page_size
+            ):
+                await scheduler.run_background(self._write, writer, rows, dtypes)
+            await scheduler.run_background(writer.close)
+        finally:
+            writer.abort()
+        return writer.rows
+
+
+table_export = TableExport()
@@ -1,16 +1,23 @@
+import asyncio
+import csv
+import html
+import logging
 import pathlib
-import aiosqlite
+import re
+import tempfile
 import time
+import aiosqlite
 
 import pandas as pd
 
 from datetime import datetime
-from typing import Optional
+from typing import Any, AsyncGenerator, BinaryIO, Callable, Iterator, Optional, Union
 from pydantic import BaseModel
 
 from aiogram import Router, F, Bot
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject, Filter
 from aiogram.enums import ParseMode
+from aiogram.dispatcher.event.handler import HandlerObject
 from aiogram.utils.keyboard import (
     ReplyKeyboardBuilder,
     InlineKeyboardBuilder,
@@ -20,18 +27,42 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import (
     Message,
+    InlineKeyboardMarkup,
     ReplyKeyboardMarkup,
     KeyboardButton,
     ReplyKeyboardRemove,
     CallbackQuery,
-    BufferedInputFile,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InlineQueryResultsButton,
+    InputTextMessageContent,
+    InputFile,
+    FSInputFile,
 )
 
-from preprocessing import CarPricePredictorPreprocessor
+import analytics
+import batch_io
+import explain
+
+from audit import audit
+from circuit import CircuitOpenError, circuit, recent_prices
 from database import DB
+from export import DEFAULT_EXPORT_FORMAT, EXPORT_FORMATS, table_export
+from history import NEWER, OLDER, HistoryEntry, history
+from middlewares import debouncer
+from outbox import outbox
+from scheduler import scheduler
+from result_cache import result_cache
+from price_cache import price_cache
+from shadow import shadow
 
 models_folder = pathlib.Path(__file__).resolve().parent / "models"
-preprocessor = CarPricePredictorPreprocessor(models_folder)
+
+# set by bot.main to the serving artifact or the pickled models, the latter
+# are loaded on first use when nothing was set (only they import sklearn)
+preprocessor: Optional[Any] = None
+
+logger = logging.getLogger(__name__)
 
 
 class Item(BaseModel):
@@ -65,6 +96,18 @@ class EntryCar(StatesGroup):
     batch = State()
 
 
+def get_preprocessor() -> Any:
+    """
+    The model used for predictions, by default the pickled models.
+    """
+    global preprocessor
+    if preprocessor is None:
+        from preprocessing import CarPricePredictorPreprocessor
+
+        preprocessor = CarPricePredictorPreprocessor(models_folder)
+    return preprocessor
+
+
 def predict_price(item: Item) -> float:  # pragma: no cover
     """
     Predict the price for a single item.
@@ -73,8 +116,75 @@ def predict_price(item: Item) -> float:  # pragma: no cover
     Returns:
         float: The predicted price.
     """
-    processed_df = preprocessor.preprocess_data(pd.DataFrame([item.model_dump()]))
-    return preprocessor.ridge_regressor.predict(processed_df)[0]
+    return get_preprocessor().predict(pd.DataFrame([item.model_dump()]))[0]
+
+
+def predict_batch(df: pd.DataFrame) -> list[float]:
+    """
+    Predict prices for a chunk of rows without modifying the input frame.
+    Args:
+        df (pd.DataFrame): Rows with the same columns as Item.
+    Returns:
+        list[float]: The predicted prices in row order.
+    """
+    return get_preprocessor().predict(df).tolist()
+
+
+def predict_price_explained(
+    item: Item, k: int = 3
+) -> tuple[float, list[tuple[str, float]]]:
+    """
+    Predict the price for a single item with its largest feature contributions.
+    Args:
+        item (Item): The input item.
+        k (int): Number of contributions.
+    Returns:
+        tuple: The predicted price and (feature, contribution) pairs.
+    """
+    prices, contributions = get_preprocessor().predict_with_contributions(
+        pd.DataFrame([item.model_dump()])
+    )
+    return prices[0], explain.top_contributions(contributions, k)[0]
+
+
+def score_next_chunk(
+    chunks: Iterator[pd.DataFrame],
+    writer: batch_io.BatchWriter,
+    explained: bool = False,
+) -> bool:
+    """
+    Read, score and write the next chunk of a batch, optionally with the
+    top_features column of the largest contributions.
+    Returns:
+        bool: False when there are no chunks left.
+    """
+    chunk = next(chunks, None)
+    if chunk is None:
+        return False
+    if not explained:
+        writer.write(chunk.assign(predicted_price=predict_batch(chunk)))
+        return True
+    prices, contributions = get_preprocessor().predict_with_contributions(chunk)
+    top_features = [
+        explain.describe(top) for top in explain.top_contributions(contributions)
+    ]
+    writer.write(chunk.assign(predicted_price=prices, top_features=top_features))
+    return True
+
+
+class SpooledInputFile(InputFile):
+    """
+    Uploads a temporary file (in memory or spilled to disk) chunk by chunk
+    """
+
+    def __init__(self, file: BinaryIO, filename: str, chunk_size: int = 64 * 1024):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        self.file.seek(0)
+        while chunk := await asyncio.to_thread(self.file.read, self.chunk_size):
+            yield chunk
 
 
 def make_row_keyboard(items: list[str]) -> ReplyKeyboardMarkup:
@@ -87,6 +197,71 @@ def make_row_keyboard(items: list[str]) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard=[row], resize_keyboard=True)
 
 
+# trailing emoji and punctuation of button texts
+_MENU_SUFFIX = re.compile(r"[\W_]+$")
+
+
+def menu_keys(text: str) -> tuple[str, str]:
+    """
+    Normalizes message text once for the menu lookup
+    :param text: message text
+    :return: lowercase text without trailing emoji and its first word,
+        with the bot mention of a command removed
+    """
+    text = _MENU_SUFFIX.sub("", text.strip().lower())
+    first = text.split(maxsplit=1)[0] if text else ""
+    if first.startswith("/"):
+        first = first.split("@", 1)[0]
+    return text, first
+
+
+# menu buttons and commands by normalized text, filled with @menu_route
+menu_routes: dict[str, HandlerObject] = {}
+
+
+def menu_route(*names: str, flags: Optional[dict[str, Any]] = None) -> Callable:
+    """
+    Registers a handler for menu buttons or commands in menu_routes
+    :param names: normalized full texts or first words
+    :param flags: handler flags, as for router.message
+    """
+
+    def register(callback: Callable) -> Callable:
+        route = HandlerObject(callback=callback, flags=dict(flags or {}))
+        for name in names:
+            menu_routes[name] = route
+        return callback
+
+    return register
+
+
+class MenuFilter(Filter):
+    """
+    Matches a message to menu_routes with two dictionary lookups, the full
+    text and then its first word, however many menu items there are.
+    The route is passed on as ``handler``, so middlewares see its flags.
+    """
+
+    async def __call__(self, message: Message) -> Union[bool, dict[str, Any]]:
+        text, first = menu_keys(message.text)
+        route = menu_routes.get(text) or menu_routes.get(first)
+        if route is None:
+            return False
+        return {"handler": route}
+
+
+class AdminFilter(Filter):
+    """
+    Passes messages of the users in admin_ids.
+    """
+
+    async def __call__(self, message: Message) -> bool:
+        return message.from_user is not None and message.from_user.id in admin_ids
+
+
+# users allowed to run admin commands, set from the config by bot.main
+admin_ids: frozenset[int] = frozenset()
+
 router = Router()
 
 available_brands = list(
@@ -140,38 +315,129 @@ available_owner = [
     "Test Drive Car",
 ]
 
+# days of rating trends shown by default and at most
+TRENDS_DAYS = 14
+MAX_TRENDS_DAYS = 60
 
-@router.message(Command("start"))
-async def cmd_start(message: Message, state: FSMContext):
-    await state.set_data({})
-    await state.clear()
+# Telegram bots upload documents of at most 50 MB
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+# lower prices are shown as this one
+MIN_PRICE = 50000
+
+# validation rules shared by the prediction steps and quick entry
+YEAR_PATTERN = r"^(19|20)\d{2}$"
+KM_DRIVEN_PATTERN = r"^\d{1,6}$"
+MILEAGE_PATTERN = r"^\d{1,2}([,\.]\d{1,5})?$"
+ENGINE_PATTERN = r"^\d{1,6}$"
+MAX_POWER_PATTERN = r"^\d{1,3}([,\.]\d{1,5})?$"
+
+# static replies and keyboards, built once
+BRANDS_TEXT = "\n".join(f"{i + 1}. {j}" for i, j in enumerate(available_brands))
+BRAND_NUMBERS = frozenset(str(i + 1) for i in range(len(available_brands)))
+SEAT_NUMBERS = frozenset(str(i) for i in range(1, 21))
+RATINGS = frozenset(str(i) for i in range(1, 6))
+
+FUEL_KEYBOARD = make_row_keyboard(available_fuels)
+SELLER_TYPE_KEYBOARD = make_row_keyboard(available_seller_type)
+TRANSMISSION_KEYBOARD = make_row_keyboard(available_transmission)
+OWNER_KEYBOARD = make_row_keyboard(available_owner)
 
+
+def _main_menu_keyboard() -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
     builder.row(
         KeyboardButton(text="Single item prediction 🚗"),
         KeyboardButton(text="Batch prediction 🛻🚚"),
     )
-    builder.row(KeyboardButton(text="Rating 📊")),
+    builder.row(
+        KeyboardButton(text="My predictions 🗂"), KeyboardButton(text="Rating 📊")
+    )
     builder.row(KeyboardButton(text="Help 🆘"), KeyboardButton(text="Info ℹ️"))
+    return builder.as_markup(resize_keyboard=True)
+
+
+def _rating_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for i in range(1, 6):
+        builder.add(InlineKeyboardButton(text=i * "⭐️", callback_data=str(i)))
+    builder.adjust(3)
+    return builder.as_markup()
+
+
+MAIN_MENU_KEYBOARD = _main_menu_keyboard()
+RATING_KEYBOARD = _rating_keyboard()
+
+
+def _year_grid(year: int) -> list[int]:
+    # eleven years around the car, none in the future
+    last = min(year + 5, datetime.now().year)
+    return list(range(last - 10, last + 1))
+
+
+def _km_driven_grid(km_driven: int) -> list[int]:
+    grid = {0, 10000, 25000, 50000, 75000, 100000, 150000, 200000, 300000}
+    return sorted(grid | {km_driven})
+
+
+# features of the what-if price curves: button text and grid of values
+CURVES = {
+    "year": ("Year", _year_grid),
+    "km_driven": ("Kilometres", _km_driven_grid),
+    "owner": ("Owner", lambda value: available_owner),
+    "fuel": ("Fuel", lambda value: available_fuels),
+    "transmission": ("Transmission", lambda value: available_transmission),
+    "seller_type": ("Seller", lambda value: available_seller_type),
+}
+
+
+def _curve_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for feature, (label, _) in CURVES.items():
+        builder.add(
+            InlineKeyboardButton(text=f"📈 {label}", callback_data=f"curve:{feature}")
+        )
+    builder.adjust(3)
+    return builder.as_markup()
+
+
+CURVE_KEYBOARD = _curve_keyboard()
+
+
+# menu buttons and commands take precedence over the prediction steps
+@router.message(F.text, MenuFilter())
+async def menu(message: Message, handler: HandlerObject, **kwargs: Any):
+    return await handler.call(message, **kwargs)
+
+
+@menu_route("/start")
+async def cmd_start(message: Message, state: FSMContext):
+    await state.set_data({})
+    await state.clear()
 
-    await message.answer(
+    await outbox.answer(
+        message,
         "Welcome to Car Price Prediction Bot!\n\n"
         "You can control me simply using keys below:",
-        reply_markup=builder.as_markup(resize_keyboard=True),
+        reply_markup=MAIN_MENU_KEYBOARD,
     )
 
 
-@router.message(Command("help"))
+@menu_route("/help")
 async def cmd_help(message: Message):
-    await message.answer(
+    await outbox.answer(
+        message,
         "🤖 **Car Price Prediction Bot Help**\n\n"
         "This bot is designed to predict car prices based on various parameters. "
         "Here are some commands you can use:\n\n"
         "/start - show welcome message and menu and restart bot\n"
-        "/help - show help message and list of commands\n\n"
+        "/help - show help message and list of commands\n"
+        "/quick - predict a price from one message with all car parameters\n"
+        "/history - list your past predictions\n\n"
         "You can control me simply using keys below:\n\n"
         "Single item prediction - Initiate the car price prediction process.\n"
         "Batch prediction - Initiate the car prices prediction process for batch of objects.\n"
+        "My predictions - Browse the prices the bot predicted for you.\n"
         "Rating - View statistics including the average rating and usage statistics.\n"
         "Info - Get information about the bot.\n"
         "Help - Display this help message.\n\n"
@@ -181,9 +447,10 @@ async def cmd_help(message: Message):
     )
 
 
-@router.message(F.text.lower().split()[0] == "info")
+@menu_route("info")
 async def info(message: Message, started_at: str):
-    await message.answer(
+    await outbox.answer(
+        message,
         "🤖 **Car Price prediction Bot**\n\n"
         "This bot designed for ML model inference as part of the Homework Project "
         "for the Applied Python course in Higher School of Economics\n\n"
@@ -195,18 +462,22 @@ async def info(message: Message, started_at: str):
     )
 
 
-@router.message(F.text.lower().split()[0] == "help")
+@menu_route("help")
 async def help_message(message: Message):
-    await message.answer(
+    await outbox.answer(
+        message,
         "🤖 **Car Price Prediction Bot Help**\n\n"
         "This bot is designed to predict car prices based on various parameters. "
         "Here are some commands you can use:\n\n"
         "/start - show welcome message and menu and restart bot\n"
-        "/help - show help message and list of commands\n\n"
+        "/help - show help message and list of commands\n"
+        "/quick - predict a price from one message with all car parameters\n"
+        "/history - list your past predictions\n\n"
         "You can control me simply using keys below:\n\n"
         "Single item prediction - Initiate the car price prediction process. "
         "After price prediction, you will be prompted to leave a review\n"
         "Batch prediction - Initiate the car prices prediction process for batch of objects.\n"
+        "My predictions - Browse the prices the bot predicted for you.\n"
         "Rating - View statistics including the average rating and usage statistics.\n"
         "Info - Get information about the bot.\n"
         "Help - Display this help message.\n\n"
@@ -217,7 +488,7 @@ async def help_message(message: Message):
     )
 
 
-@router.message(F.text.lower().split()[0] == "rating")
+@menu_route("rating", flags={"throttle": "stats"})
 async def rating(message: Message):
     """
     Display statistics including average rating and usage statistics.
@@ -236,48 +507,482 @@ async def rating(message: Message):
         f"📈 <b>Number of Reviews:</b> {number_reviews} \n"
         f"⏰ <b>Last Review:</b> {max_ts} \n"
     )
-    await message.answer(stats_message, parse_mode=ParseMode.HTML)
+    await outbox.answer(message, stats_message, parse_mode=ParseMode.HTML)
+
+
+def format_history(entries: list[HistoryEntry]) -> str:
+    """
+    Lists past predictions, newest first
+    :param entries: a page of the history of a user
+    :return: HTML text
+    """
+    rows = [
+        f"<b>{entry.ts}</b>\n{html.escape(entry.features['name'])} "
+        f"{entry.features['year']}, {entry.features['km_driven']} km, "
+        f"{entry.features['fuel']}, {entry.features['transmission']}: "
+        f"<b>{format_price(entry.price)}</b> RUB"
+        for entry in entries
+    ]
+    return "🗂 <b>My predictions</b>\n\n" + "\n\n".join(rows)
+
+
+def history_keyboard(
+    entries: list[HistoryEntry], newer: bool, older: bool
+) -> Optional[InlineKeyboardMarkup]:
+    """
+    Buttons to the pages before and after the shown one, None if there are none
+    """
+    builder = InlineKeyboardBuilder()
+    if newer:
+        builder.button(
+            text="◀ Newer", callback_data=f"history:{NEWER}:{entries[0].cursor}"
+        )
+    if older:
+        builder.button(
+            text="Older ▶", callback_data=f"history:{OLDER}:{entries[-1].cursor}"
+        )
+    return builder.as_markup() if newer or older else None
+
+
+@menu_route("my predictions", "/history", flags={"throttle": "stats"})
+async def my_predictions(message: Message):
+    entries, more = await history.page(message.chat.id)
+    if not entries:
+        await outbox.answer(
+            message,
+            "You have no predictions yet. Make a single item prediction first 🚗",
+        )
+        return
+    await outbox.answer(
+        message,
+        format_history(entries),
+        parse_mode=ParseMode.HTML,
+        reply_markup=history_keyboard(entries, newer=False, older=more),
+    )
+
+
+@router.callback_query(F.data.startswith("history:"), flags={"throttle": "stats"})
+async def history_page(callback: CallbackQuery):
+    _, direction, cursor = callback.data.split(":", 2)
+    entries, more = await history.page(callback.message.chat.id, cursor, direction)
+    await callback.answer()
+    if not entries:
+        return
+    # the page we came from lies in the other direction
+    if direction == OLDER:
+        keyboard = history_keyboard(entries, newer=True, older=more)
+    else:
+        keyboard = history_keyboard(entries, newer=more, older=True)
+    await callback.message.edit_text(
+        format_history(entries), parse_mode=ParseMode.HTML, reply_markup=keyboard
+    )
+
+
+def _window_row(label: str, window: analytics.Window) -> str:
+    average = "-" if window.average is None else f"{window.average:.2f}"
+    stars = " ".join(f"{count:>3}" for count in window.stars)
+    return f"{label:<10} {window.count:>4} {average:>5} {stars}"
+
+
+def format_trends(trends: analytics.Trends) -> str:
+    """
+    Rating trends for admins: totals compared with the previous period and
+    the star distribution of every day and week
+    :param trends: rollups of the period
+    :return: HTML text
+    """
+    current, previous = trends.current, trends.previous
+    average = "-" if current.average is None else f"{current.average:.2f}"
+    if current.average is not None and previous.average is not None:
+        average += f" ({current.average - previous.average:+.2f})"
+    header = f"{'':<10} {'n':>4} {'avg':>5} " + " ".join(
+        f"{star:>2}★" for star in analytics.STARS
+    )
+    rows = [header]
+    rows += [_window_row(window.start[5:], window) for window in trends.daily]
+    rows += ["", "Week of"]
+    rows += [_window_row(window.start, window) for window in trends.weekly]
+    return (
+        f"📈 <b>Ratings of the last {trends.days} days</b>\n\n"
+        f"Reviews: <b>{current.count}</b> (previous {trends.days} days: "
+        f"{previous.count})\n"
+        f"Average: <b>{average}</b>\n\n"
+        f"<pre>{html.escape(chr(10).join(rows))}</pre>"
+    )
+
+
+@router.message(Command("trends"), AdminFilter(), flags={"throttle": "stats"})
+async def trends(message: Message, command: CommandObject):
+    """
+    Admin view of rating trends, /trends [days]
+    """
+    days = TRENDS_DAYS
+    if command.args:
+        if not command.args.strip().isdigit():
+            await outbox.answer(
+                message, f"Usage: /trends [days], at most {MAX_TRENDS_DAYS}"
+            )
+            return
+        days = min(max(int(command.args), 1), MAX_TRENDS_DAYS)
+    await outbox.answer(
+        message,
+        format_trends(await analytics.rating_trends(days)),
+        parse_mode=ParseMode.HTML,
+    )
+
+
+@router.message(Command("export"), AdminFilter(), flags={"throttle": "batch"})
+async def export_tables(message: Message, command: CommandObject):
+    """
+    Admin export of the bot database, /export [tables] [csv.gz|parquet]
+    """
+    available = await table_export.tables()
+    words = (command.args or "").lower().split()
+    if any(word not in available and word not in EXPORT_FORMATS for word in words):
+        await outbox.answer(
+            message,
+            f"Usage: /export [{' '.join(available)}] [{'|'.join(EXPORT_FORMATS)}]",
+        )
+        return
+    output_format = next(
+        (word for word in words if word in EXPORT_FORMATS), DEFAULT_EXPORT_FORMAT
+    )
+    tables = [word for word in words if word in available] or available
+
+    with tempfile.TemporaryDirectory(dir=batch_io.limits.tmp_dir) as folder:
+        for table in tables:
+            path = pathlib.Path(folder) / f"{table}.{output_format}"
+            with open(path, "wb") as destination:
+                rows = await table_export.export(table, destination, output_format)
+            if path.stat().st_size > MAX_UPLOAD_SIZE:
+                await outbox.answer(
+                    message,
+                    f"{path.name} with {rows} rows is larger than "
+                    f"{MAX_UPLOAD_SIZE // (1024 * 1024)} MB and can't be uploaded",
+                )
+                continue
+            await outbox.answer_document(
+                message, FSInputFile(path), caption=f"{table}: {rows} rows"
+            )
+            path.unlink()
 
 
 # entry point for single item prediction
-@router.message(F.text.lower()[:-2] == "single item prediction")
+@menu_route("single item prediction")
 async def single_item_prediction(message: Message, state: FSMContext):
-    await message.answer(
-        text="Choose Brand:\n\n"
-        + "\n".join([f"{i + 1}. {j}" for i, j in enumerate(available_brands)]),
+    await outbox.answer(
+        message,
+        text="Choose Brand:\n\n" + BRANDS_TEXT,
         reply_markup=ReplyKeyboardRemove(),
     )
     await state.set_state(EntryCar.name)
 
 
-# handle correct brand
-@router.message(
-    EntryCar.name, F.text.in_([str(i + 1) for i in range(len(available_brands))])
+QUICK_ENTRY_FIELDS = (
+    "name",
+    "year",
+    "km_driven",
+    "fuel",
+    "seller_type",
+    "transmission",
+    "owner",
+    "mileage",
+    "engine",
+    "max_power",
+    "seats",
 )
+
+QUICK_ENTRY_HELP = (
+    "Send all car parameters in one message as key=value pairs:\n\n"
+    "<code>/quick name=Toyota, year=2015, km_driven=60000, fuel=Diesel, "
+    "seller_type=Individual, transmission=Manual, owner=First Owner, "
+    "mileage=17.5, engine=1248, max_power=74, seats=5</code>\n\n"
+    "or as a line of comma separated values in this order:\n\n"
+    "<code>Toyota,2015,60000,Diesel,Individual,Manual,First Owner,17.5,1248,74,5</code>"
+    "\n\nThe /quick command is optional for these two. After it the values "
+    "can also be separated by spaces, as in inline queries:\n\n"
+    "<code>@bot Toyota 2015 60000 Diesel Individual Manual First Owner "
+    "17.5 1248 74 5</code>"
+)
+
+_QUICK_ENTRY_PAIRS = re.compile(r"^\s*\w+\s*=")
+# separators of key=value pairs, a comma inside a decimal number is not one
+_PAIR_SEPARATOR = re.compile(r"\s*[,;\n]\s*(?=\w+\s*=)")
+
+_CHOICES = {
+    "name": {brand.lower(): brand for brand in available_brands}
+    | {str(i + 1): brand for i, brand in enumerate(available_brands)},
+    "fuel": {fuel.lower(): fuel for fuel in available_fuels},
+    "seller_type": {seller.lower(): seller for seller in available_seller_type},
+    "transmission": {kind.lower(): kind for kind in available_transmission},
+    "owner": {owner.lower(): owner for owner in available_owner},
+    "seats": {seats: int(seats) for seats in SEAT_NUMBERS},
+}
+
+
+def _decimal(value: str) -> str:
+    return value.replace(",", ".")
+
+
+# mileage, engine and max power stay strings, Item accepts them with units
+_PATTERNS = {
+    "year": (re.compile(YEAR_PATTERN), int),
+    "km_driven": (re.compile(KM_DRIVEN_PATTERN), int),
+    "mileage": (re.compile(MILEAGE_PATTERN), _decimal),
+    "engine": (re.compile(ENGINE_PATTERN), str),
+    "max_power": (re.compile(MAX_POWER_PATTERN), _decimal),
+}
+
+
+def is_quick_entry(text: str) -> bool:
+    """
+    Tells if a message looks like a full car spec
+    :param text: message text
+    :return: True for key=value pairs or a line with enough commas
+    """
+    if _QUICK_ENTRY_PAIRS.match(text):
+        return True
+    return "\n" not in text and text.count(",") >= len(QUICK_ENTRY_FIELDS) - 1
+
+
+def _parse_field(field: str, value: str) -> Any:
+    if field in _CHOICES:
+        if field == "name":
+            # the model only uses the brand, the first word of a full name
+            value = value.split()[0]
+        return _CHOICES[field].get(value.lower())
+    pattern, convert = _PATTERNS[field]
+    if not pattern.match(value):
+        return None
+    return convert(value)
+
+
+def _split_words(words: list[str]) -> tuple[dict[str, str], list[str]]:
+    """
+    Assigns space separated words to the fields in order, choices made of
+    several words and full car names (up to the year) take several words
+    :param words: words of the spec
+    :return: values of the fields and the words left over
+    """
+    year = re.compile(YEAR_PATTERN)
+    values = {}
+    for field in QUICK_ENTRY_FIELDS:
+        if not words:
+            break
+        taken = 1
+        if field == "name":
+            while taken < len(words) and not year.match(words[taken]):
+                taken += 1
+        elif field in _CHOICES:
+            for option in _CHOICES[field]:
+                size = len(option.split())
+                if size > taken and " ".join(words[:size]).lower() == option:
+                    taken = size
+        values[field] = " ".join(words[:taken])
+        words = words[taken:]
+    return values, words
+
+
+def parse_quick_entry(text: str) -> dict[str, Any]:
+    """
+    Parses a full car spec from key=value pairs, a CSV line or space
+    separated values and validates all fields at once with the rules of
+    the prediction steps
+    :param text: message text
+    :return: typed fields of Item
+    :raises ValueError: listing every missing or incorrect field
+    """
+    errors = []
+    text = text.strip()
+    if _QUICK_ENTRY_PAIRS.match(text):
+        values = {}
+        for pair in _PAIR_SEPARATOR.split(text):
+            key, _, value = pair.partition("=")
+            values[key.strip().lower()] = value.strip()
+        errors.extend(
+            f"unknown parameter {key}"
+            for key in values
+            if key not in QUICK_ENTRY_FIELDS
+        )
+    elif text.count(",") >= len(QUICK_ENTRY_FIELDS) - 1:
+        row = [
+            value.strip()
+            for value in next(csv.reader([text], skipinitialspace=True), [])
+        ]
+        if len(row) != len(QUICK_ENTRY_FIELDS):
+            errors.append(
+                f"expected {len(QUICK_ENTRY_FIELDS)} comma separated values, "
+                f"got {len(row)}"
+            )
+        values = dict(zip(QUICK_ENTRY_FIELDS, row))
+    else:
+        values, rest = _split_words(text.split())
+        if rest:
+            errors.append(f"unexpected {' '.join(rest)!r}")
+
+    fields = {}
+    for field in QUICK_ENTRY_FIELDS:
+        value = values.get(field)
+        if not value:
+            errors.append(f"{field} is missing")
+            continue
+        parsed = _parse_field(field, value)
+        if parsed is None:
+            errors.append(f"{field} {value!r} is incorrect")
+        else:
+            fields[field] = parsed
+
+    if errors:
+        raise ValueError("\n".join(errors))
+    return fields
+
+
+# a full car spec in one message, in any step of the prediction
+@router.message(F.text.func(is_quick_entry), flags={"throttle": "single"})
+@menu_route("/quick", flags={"throttle": "single"})
+async def quick_entry(message: Message, state: FSMContext):
+    text = message.text
+    if text.startswith("/"):
+        text = text.partition(" ")[2]
+    if not text.strip():
+        await outbox.answer(message, QUICK_ENTRY_HELP, parse_mode=ParseMode.HTML)
+        return
+
+    try:
+        data = parse_quick_entry(text)
+    except ValueError as e:
+        await outbox.answer(
+            message,
+            f"Please check the car parameters:\n{e}\n\n"
+            "Send /quick to see the format.",
+        )
+        return
+
+    if await state.get_state() is not None:
+        await state.clear()
+    await send_prediction(message, data, state)
+
+
+def _inline_button(text: str) -> InlineQueryResultsButton:
+    # opens the private chat with the bot on /start quick (see cmd_start_quick),
+    # button texts are up to 64 characters
+    return InlineQueryResultsButton(text=text[:64], start_parameter="quick")
+
+
+@menu_route("/start quick")
+async def cmd_start_quick(message: Message, state: FSMContext):
+    await state.set_data({})
+    await state.clear()
+
+    await outbox.answer(
+        message,
+        QUICK_ENTRY_HELP,
+        parse_mode=ParseMode.HTML,
+        reply_markup=MAIN_MENU_KEYBOARD,
+    )
+
+
+@router.inline_query()
+async def inline_price(inline_query: InlineQuery):
+    # queries arrive on every keystroke, only the last one of a pause is answered
+    if not await debouncer.settle(inline_query.from_user.id):
+        return
+    # the answer depends only on the query, Telegram may share it between users
+    cache_time = int(price_cache.ttl)
+
+    text = inline_query.query.strip()
+    if not text:
+        await inline_query.answer(
+            [],
+            cache_time=cache_time,
+            button=_inline_button("Type the car parameters separated by spaces"),
+        )
+        return
+
+    try:
+        data = parse_quick_entry(text)
+    except ValueError as e:
+        await inline_query.answer(
+            [],
+            cache_time=cache_time,
+            button=_inline_button(f"Keep typing: {str(e).splitlines()[0]}"),
+        )
+        return
+
+    key = price_cache.key(data, get_preprocessor().model_version)
+    price = price_cache.get(key)
+    predicted = price is None
+    if predicted:
+        item = Item(**data)
+        started_at = time.perf_counter()
+        try:
+            price = round(await circuit.run(predict_price, item), 2)
+        except (CircuitOpenError, TimeoutError):
+            nearest = recent_prices.nearest(item.model_dump())
+            text = "Busy, please try again in a minute"
+            if nearest is not None:
+                text = f"Busy, a similar car: {format_price(nearest[1])} RUB"
+            await inline_query.answer([], cache_time=0, button=_inline_button(text))
+            return
+        except Exception:
+            await inline_query.answer(
+                [], cache_time=0, button=_inline_button("Could not predict the price")
+            )
+            raise
+        price_cache.put(key, price)
+        recent_prices.add(item.model_dump(), price)
+        audit.record(
+            "inline",
+            data,
+            get_preprocessor().model_version,
+            time.perf_counter() - started_at,
+            price=price,
+            client_id=inline_query.from_user.id,
+        )
+
+    description = ", ".join(str(data[field]) for field in QUICK_ENTRY_FIELDS)
+    article = InlineQueryResultArticle(
+        id="price",
+        title=f"{format_price(price)} RUB",
+        description=description,
+        input_message_content=InputTextMessageContent(
+            message_text=f"{html.escape(description)}\n\n"
+            f"Predicted price is <b>{format_price(price)}</b> RUB",
+            parse_mode=ParseMode.HTML,
+        ),
+    )
+    await inline_query.answer([article], cache_time=cache_time)
+    if predicted:
+        shadow.submit(pd.DataFrame([item.model_dump()]), [price])
+
+
+# handle correct brand
+@router.message(EntryCar.name, F.text.in_(BRAND_NUMBERS))
 async def single_item_prediction_1_correct(message: Message, state: FSMContext):
     index = int(message.text)
     await state.update_data(name=available_brands[index - 1])
-    await message.answer(text="Enter car production year, " "for example: 2019")
+    await outbox.answer(message, text="Enter car production year, " "for example: 2019")
     await state.set_state(EntryCar.year)
 
 
 # handle incorrect brand
 @router.message(EntryCar.name)
 async def single_item_prediction_1_incorrect(message: Message):
-    await message.answer(
+    await outbox.answer(
+        message,
         text="You have entered incorrect brand number. Please try again.\n\n"
-        "Choose Brand:\n\n"
-        + "\n".join([f"{i + 1}. {j}" for i, j in enumerate(available_brands)])
+        "Choose Brand:\n\n" + BRANDS_TEXT,
     )
 
 
 # handle correct year
-@router.message(EntryCar.year, F.text.regexp(r"^(19|20)\d{2}$"))
+@router.message(EntryCar.year, F.text.regexp(YEAR_PATTERN))
 async def single_item_prediction_2_correct(message: Message, state: FSMContext):
     await state.update_data(year=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Type total number of integer kilometres the car travelled in its life, "
-        "for example: 10000"
+        "for example: 10000",
     )
     await state.set_state(EntryCar.km_driven)
 
@@ -286,19 +991,21 @@ async def single_item_prediction_2_correct(message: Message, state: FSMContext):
 @router.message(EntryCar.year)
 async def single_item_prediction_2_incorrect(message: Message, state: FSMContext):
     await state.update_data(year=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Entered year is incorrect. Please try again and enter year in correct format, "
-        "for example: 2019"
+        "for example: 2019",
     )
 
 
 # handle correct km driven
-@router.message(EntryCar.km_driven, F.text.regexp(r"^\d{1,6}$"))
+@router.message(EntryCar.km_driven, F.text.regexp(KM_DRIVEN_PATTERN))
 async def single_item_prediction_3_correct(message: Message, state: FSMContext):
     await state.update_data(km_driven=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Choose fuel type from options below:",
-        reply_markup=make_row_keyboard(available_fuels),
+        reply_markup=FUEL_KEYBOARD,
     )
     await state.set_state(EntryCar.fuel)
 
@@ -307,9 +1014,10 @@ async def single_item_prediction_3_correct(message: Message, state: FSMContext):
 @router.message(EntryCar.km_driven)
 async def single_item_prediction_3_incorrect(message: Message, state: FSMContext):
     await state.update_data(km_driven=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Entered km driven is incorrect.\n\n"
-        "Please try again and enter km driven in range from 0 to 999999:"
+        "Please try again and enter km driven in range from 0 to 999999:",
     )
 
 
@@ -317,9 +1025,10 @@ async def single_item_prediction_3_incorrect(message: Message, state: FSMContext
 @router.message(EntryCar.fuel, F.text.in_(available_fuels))
 async def single_item_prediction_4_correct(message: Message, state: FSMContext):
     await state.update_data(fuel=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Choose seller type from the options below:",
-        reply_markup=make_row_keyboard(available_seller_type),
+        reply_markup=SELLER_TYPE_KEYBOARD,
     )
     await state.set_state(EntryCar.seller_type)
 
@@ -328,9 +1037,10 @@ async def single_item_prediction_4_correct(message: Message, state: FSMContext):
 @router.message(EntryCar.seller_type, F.text.in_(available_seller_type))
 async def single_item_prediction_5_correct(message: Message, state: FSMContext):
     await state.update_data(seller_type=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Choose transmission type from the options below:",
-        reply_markup=make_row_keyboard(available_transmission),
+        reply_markup=TRANSMISSION_KEYBOARD,
     )
     await state.set_state(EntryCar.transmission)
 
@@ -339,9 +1049,10 @@ async def single_item_prediction_5_correct(message: Message, state: FSMContext):
 @router.message(EntryCar.transmission, F.text.in_(available_transmission))
 async def single_item_prediction_6_correct(message: Message, state: FSMContext):
     await state.update_data(transmission=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Choose what ownership counts from the options below:",
-        reply_markup=make_row_keyboard(available_owner),
+        reply_markup=OWNER_KEYBOARD,
     )
     await state.set_state(EntryCar.owner)
 
@@ -350,7 +1061,8 @@ async def single_item_prediction_6_correct(message: Message, state: FSMContext):
 @router.message(EntryCar.owner, F.text.in_(available_owner))
 async def single_item_prediction_8_correct(message: Message, state: FSMContext):
     await state.update_data(owner=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Enter mileage (kilometers covered by car in 1 litre of fuel), "
         "for example: 7.9",
         reply_markup=ReplyKeyboardRemove(),
@@ -359,14 +1071,15 @@ async def single_item_prediction_8_correct(message: Message, state: FSMContext):
 
 
 # handle correct mileage
-@router.message(EntryCar.mileage, F.text.regexp(r"^\d{1,2}([,\.]\d{1,5})?$"))
+@router.message(EntryCar.mileage, F.text.regexp(MILEAGE_PATTERN))
 async def single_item_prediction_9_correct(message: Message, state: FSMContext):
     await state.update_data(mileage=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Enter engine CC as integer "
         "(the size – or cubic capacity – of a car’s engine is measured in cubic centimetres (cc))"
         ", for example: 1598\n\n"
-        "(1598cc engine is translated as a 1.6L engine)"
+        "(1598cc engine is translated as a 1.6L engine)",
     )
     await state.set_state(EntryCar.engine)
 
@@ -375,18 +1088,21 @@ async def single_item_prediction_9_correct(message: Message, state: FSMContext):
 @router.message(EntryCar.mileage)
 async def single_item_prediction_9_incorrect(message: Message, state: FSMContext):
     await state.update_data(mileage=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Entered mileage is incorrect.\n"
         "Try again (enter kilometers covered by Car in 1 litre of fuel), "
-        "for example: 7.9"
+        "for example: 7.9",
     )
 
 
 # handle correct engine CC
-@router.message(EntryCar.engine, F.text.regexp(r"^\d{1,6}$"))
+@router.message(EntryCar.engine, F.text.regexp(ENGINE_PATTERN))
 async def single_item_prediction_10_correct(message: Message, state: FSMContext):
     await state.update_data(engine=message.text)
-    await message.answer(text="Enter horsepower of an engine, " "for example: 132.2")
+    await outbox.answer(
+        message, text="Enter horsepower of an engine, " "for example: 132.2"
+    )
     await state.set_state(EntryCar.max_power)
 
 
@@ -394,19 +1110,20 @@ async def single_item_prediction_10_correct(message: Message, state: FSMContext)
 @router.message(EntryCar.engine)
 async def single_item_prediction_10_incorrect(message: Message, state: FSMContext):
     await state.update_data(engine=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Entered engine CC is incorrect.\n"
         "Retype engine CC "
         "(the size – or cubic capacity – of a car’s engine is measured in cubic centimetres (cc))"
-        ", for example: 1598\n\n"
+        ", for example: 1598\n\n",
     )
 
 
 # handle correct engine max_power
-@router.message(EntryCar.max_power, F.text.regexp(r"^\d{1,3}([,\.]\d{1,5})?$"))
+@router.message(EntryCar.max_power, F.text.regexp(MAX_POWER_PATTERN))
 async def single_item_prediction_11_correct(message: Message, state: FSMContext):
     await state.update_data(max_power=message.text)
-    await message.answer(text="Enter seats number, " "for example: 5")
+    await outbox.answer(message, text="Enter seats number, " "for example: 5")
     await state.set_state(EntryCar.seats)
 
 
@@ -414,53 +1131,191 @@ async def single_item_prediction_11_correct(message: Message, state: FSMContext)
 @router.message(EntryCar.max_power)
 async def single_item_prediction_11_incorrect(message: Message, state: FSMContext):
     await state.update_data(max_power=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Entered engine max power is incorrect. "
         "Retype engine max power, "
-        "for example:  32.2"
+        "for example:  32.2",
     )
 
 
 # handle correct seats number
-@router.message(EntryCar.seats, F.text.in_([str(i) for i in range(1, 21)]))
+@router.message(
+    EntryCar.seats,
+    F.text.in_(SEAT_NUMBERS),
+    flags={"throttle": "single"},
+)
 async def final_correct(message: Message, state: FSMContext):
     await state.update_data(seats=message.text)
-    await message.answer(text="All data gathered. Please wait for the prediction... ⏳")
-
-    time.sleep(1)
+    await outbox.answer(
+        message, text="All data gathered. Please wait for the prediction... ⏳"
+    )
 
     data = await state.get_data()
 
     await state.set_data({})
     await state.clear()
 
-    try:
-        price = round(predict_price(Item(**data)), 2)
+    await send_prediction(message, data, state)
+
+
+def format_price(price: float) -> str:
+    """
+    Formats a rounded price for replies, raising it to MIN_PRICE
+    :param price: predicted price
+    :return: price with spaces between thousands
+    """
+    return "{:,}".format(max(price, MIN_PRICE)).replace(",", " ")
+
+
+def unavailable_text(item: dict[str, Any]) -> str:
+    """
+    Reply while predictions time out or the circuit is open, with the price
+    of the most similar recently predicted car if there is one
+    :param item: fields of Item
+    :return: HTML text
+    """
+    text = "The price model is too busy right now 🐢 Please try again in a minute."
+    nearest = recent_prices.nearest(item)
+    if nearest is None:
+        return text
+    other, price = nearest
+    return (
+        f"{text}\n\nA similar car ({other['year']}, {other['km_driven']} km, "
+        f"{other['owner'].lower()}) was recently priced at "
+        f"<b>{format_price(price)}</b> RUB."
+    )
 
-        if price < 50000:
-            price = 50000
 
-        price_formatted = "{:,}".format(price).replace(",", " ")
-        await message.answer(
-            text=f"Predicted price is <b>{price_formatted}</b> RUB",
+async def send_prediction(
+    message: Message, data: dict[str, Any], state: FSMContext
+) -> None:
+    """
+    Predicts the price of a car and replies with it, its main factors and the
+    rating keyboard, the car is kept as last_item for price curves
+    :param message: message to answer
+    :param data: fields of Item
+    :param state: conversation of the user
+    """
+    try:
+        item = Item(**data)
+        started_at = time.perf_counter()
+        price, top = await circuit.run(predict_price_explained, item)
+        price = round(price, 2)
+        recent_prices.add(item.model_dump(), price)
+        audit.record(
+            "single",
+            item.model_dump(),
+            get_preprocessor().model_version,
+            time.perf_counter() - started_at,
+            price=price,
+            client_id=message.chat.id,
+        )
+
+        await state.update_data(last_item=item.model_dump())
+        await outbox.answer(
+            message,
+            text=f"Predicted price is <b>{format_price(price)}</b> RUB\n\n"
+            f"Main price factors, RUB:\n{explain.describe(top, separator=chr(10))}",
             parse_mode=ParseMode.HTML,
+            reply_markup=CURVE_KEYBOARD,
         )
 
-        builder = InlineKeyboardBuilder()
+        await outbox.answer(
+            message, "Please, rate this Bot 🌝", reply_markup=RATING_KEYBOARD
+        )
+        await history.add(message.chat.id, item.model_dump(), price)
+        # after the reply, the candidate model never delays it
+        shadow.submit(pd.DataFrame([item.model_dump()]), [price])
 
-        for i in range(1, 6):
-            builder.add(InlineKeyboardButton(text=i * "⭐️", callback_data=str(i)))
-        builder.adjust(3)
-        await message.answer(
-            "Please, rate this Bot 🌝", reply_markup=builder.as_markup()
+    except (CircuitOpenError, TimeoutError):
+        await outbox.answer(
+            message, unavailable_text(item.model_dump()), parse_mode=ParseMode.HTML
         )
 
-    except Exception as e:
-        await message.answer(str(e))
-        await message.answer("Consider restart bot using /start command")
+    except Exception:
+        logger.exception("Single item prediction failed")
+        await outbox.answer(message, "Could not predict the price of this car 😔")
+        await outbox.answer(message, "Consider restart bot using /start command")
 
 
-@router.callback_query(F.data.in_([str(i) for i in range(1, 6)]))
+def price_curve_frame(item: dict[str, Any], feature: str) -> pd.DataFrame:
+    """
+    Repeats a car once per grid value of a feature
+    :param item: fields of Item
+    :param feature: key of CURVES
+    :return: frame with the feature varied across its grid
+    """
+    grid = CURVES[feature][1](item[feature])
+    return pd.DataFrame([item] * len(grid)).assign(**{feature: grid})
+
+
+def format_price_curve(
+    feature: str, values: list[Any], prices: list[float], current: Any
+) -> str:
+    """
+    Formats a price curve as a compact monospace table
+    :param feature: key of CURVES
+    :param values: grid of the feature
+    :param prices: predicted prices in grid order
+    :param current: value of the predicted car, marked in the table
+    :return: HTML text
+    """
+    width = max(len(str(value)) for value in values)
+    rows = [
+        f"{str(value):<{width}}  {format_price(round(price)):>11}"
+        + (" ◀" if value == current else "")
+        for value, price in zip(values, prices)
+    ]
+    return (
+        f"📈 <b>Price by {CURVES[feature][0].lower()}</b>, RUB\n\n"
+        f"<pre>{html.escape(chr(10).join(rows))}</pre>"
+    )
+
+
+@router.callback_query(F.data.startswith("curve:"), flags={"throttle": "single"})
+async def price_curve(callback: CallbackQuery, state: FSMContext):
+    feature = callback.data.partition(":")[2]
+    item = (await state.get_data()).get("last_item")
+    if feature not in CURVES or item is None:
+        await callback.answer(
+            "Please make a single item prediction first", show_alert=True
+        )
+        return
+    await callback.answer()
+
+    started_at = time.perf_counter()
+    # the whole grid is scored in one vectorized pass
+    df = price_curve_frame(item, feature)
+    try:
+        prices = await circuit.run(predict_batch, df)
+    except (CircuitOpenError, TimeoutError):
+        await outbox.answer(
+            callback.message,
+            "Price curves are unavailable right now 🐢 Please try again in a minute.",
+        )
+        return
+    except Exception:
+        await outbox.answer(
+            callback.message, "Consider restart bot using /start command"
+        )
+        raise
+    await outbox.answer(
+        callback.message,
+        format_price_curve(feature, df[feature].tolist(), prices, item[feature]),
+        parse_mode=ParseMode.HTML,
+    )
+    audit.record(
+        "curve",
+        {**item, "curve": feature},
+        get_preprocessor().model_version,
+        time.perf_counter() - started_at,
+        client_id=callback.message.chat.id,
+        rows=len(df),
+    )
+
+
+@router.callback_query(F.data.in_(RATINGS), flags={"throttle": "rating"})
 async def send_thanks(callback: CallbackQuery):
     try:
         user_id = int(callback.from_user.id)
@@ -501,51 +1356,140 @@ async def send_thanks(callback: CallbackQuery):
 @router.message(EntryCar.seats)
 async def final_incorrect(message: Message, state: FSMContext):
     await state.update_data(seats=message.text)
-    await message.answer(
+    await outbox.answer(
+        message,
         text="Entered seats number incorrect."
-        "Retype seats number in range from 1 to 20"
+        "Retype seats number in range from 1 to 20",
     )
 
 
 # entry point for batch
-@router.message(F.text.lower()[:-3] == "batch prediction")
+@menu_route("batch prediction")
 async def batch_prediction(message: Message, state: FSMContext):
-    await message.answer(
-        text="Please attach .csv file with car entities",
+    await outbox.answer(
+        message,
+        text="Please attach .csv file with car entities "
+        "(gzip or zstd compressed .csv and .parquet files are accepted too).\n\n"
+        "Add caption csv, csv.gz or parquet to choose the result format, "
+        "and explain to add the main price factors of every car.",
         reply_markup=ReplyKeyboardRemove(),
     )
     await state.set_state(EntryCar.batch)
 
 
-@router.message(EntryCar.batch, F.content_type == "document")
+@router.message(
+    EntryCar.batch, F.content_type == "document", flags={"throttle": "batch"}
+)
 async def batch_prediction_1(message: Message, state: FSMContext, bot: Bot):
-    buffer = await bot.download(message.document)
-    df = pd.read_csv(buffer)
-
-    processed_df = preprocessor.preprocess_data(df)
-    predictions = preprocessor.ridge_regressor.predict(processed_df).tolist()
-
-    result = []
-    for _, row in df.iterrows():
-        result.append(
-            {"input_data": row.to_dict(), "predicted_price": predictions.pop(0)}
+    started_at = time.perf_counter()
+    limits = batch_io.limits
+    file_size = message.document.file_size
+    if file_size is not None and file_size > limits.max_file_size:
+        await outbox.answer(
+            message,
+            f"The file is too large, maximum size is "
+            f"{limits.max_file_size // (1024 * 1024)} MB. Please attach a smaller file",
         )
+        return
+
+    output_format = batch_io.parse_output_format(message.caption)
+    explained = batch_io.parse_explain(message.caption)
+    job = {
+        "file_name": message.document.file_name,
+        "file_unique_id": message.document.file_unique_id,
+        "output_format": output_format,
+        "explained": explained,
+    }
+
+    # small files stay in memory, large ones spill to temporary files
+    with tempfile.SpooledTemporaryFile(
+        max_size=limits.spill_threshold, dir=limits.tmp_dir
+    ) as download, tempfile.SpooledTemporaryFile(
+        max_size=limits.spill_threshold, dir=limits.tmp_dir
+    ) as result:
+        source = await bot.download(message.document, destination=download)
+
+        cache_key = None
+        if result_cache.enabled:
+            cache_key = await scheduler.run_batch(
+                result_cache.key,
+                source,
+                message.document.file_unique_id,
+                get_preprocessor().model_version,
+                output_format,
+                batch_io.EXPLAIN_KEYWORD if explained else "",
+            )
+            cached = await scheduler.run_batch(result_cache.get, cache_key)
+            if cached is not None:
+                with cached:
+                    await outbox.reply_document(
+                        message,
+                        SpooledInputFile(
+                            cached, filename=batch_io.OUTPUT_FORMATS[output_format]
+                        ),
+                    )
+                audit.record(
+                    "batch",
+                    {**job, "cached": True},
+                    get_preprocessor().model_version,
+                    time.perf_counter() - started_at,
+                    client_id=message.chat.id,
+                )
+                await state.clear()
+                return
 
-    result_df = pd.DataFrame(result)
-    result_bytes = bytes(
-        result_df.to_csv(lineterminator="\r\n", index=False), encoding="utf-8"
-    )
+        writer = batch_io.BatchWriter(result, output_format)
 
-    await message.reply_document(BufferedInputFile(result_bytes, filename="result.csv"))
+        try:
+            chunks = batch_io.iter_batch(
+                source,
+                message.document.file_name,
+                chunk_rows=scheduler.chunk_size,
+                max_rows=limits.max_rows,
+            )
+            # one chunk at a time goes through the batch queue, so single item
+            # predictions of other users are served in between them
+            with scheduler.batch_job():
+                while await scheduler.run_batch(
+                    score_next_chunk, chunks, writer, explained
+                ):
+                    pass
+                await scheduler.run_batch(writer.close)
+        except ValueError as e:
+            await outbox.answer(
+                message,
+                f"Could not read the file: {e}\n\n"
+                "Please attach .csv, .csv.gz, .csv.zst or .parquet file with car entities",
+            )
+            return
+        finally:
+            writer.abort()
+
+        await outbox.reply_document(
+            message, SpooledInputFile(result, filename=writer.filename)
+        )
+        audit.record(
+            "batch",
+            job,
+            get_preprocessor().model_version,
+            time.perf_counter() - started_at,
+            client_id=message.chat.id,
+            rows=writer.rows,
+        )
+        if cache_key is not None:
+            await scheduler.run_batch(result_cache.put, cache_key, result)
     await state.clear()
 
 
 @router.message(F.text)
 async def my_text_handler(message: Message):
-    await message.answer(
+    await outbox.answer(
+        message,
         "Unknown command or message\n"
         "Available commands:\n"
         "/start - show welcome message and menu and restart bot\n"
-        "/help - show help message and list of commands\n\n"
-        "You can control me simply using keys below"
+        "/help - show help message and list of commands\n"
+        "/quick - predict a price from one message with all car parameters\n"
+        "/history - list your past predictions\n\n"
+        "You can control me simply using keys below",
     )
@@ -0,0 +1,194 @@
+import io
+import json
+import logging
+import math
+import os
+import pathlib
+import tempfile
+import time
+from typing import Any, Optional
+
+from aiohttp import web
+
+import batch_io
+import handlers
+from metrics import METRICS
+from scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_ITEM = handlers.Item(
+    name="Maruti",
+    year=2015,
+    km_driven=60000,
+    fuel="Diesel",
+    seller_type="Individual",
+    transmission="Manual",
+    owner="First Owner",
+    mileage="17.5",
+    engine="1248",
+    max_power="74",
+    seats=5,
+)
+
+# the same car as WARM_UP_ITEM followed by rows with units and missing values
+WARM_UP_CSV = (
+    b"name,year,km_driven,fuel,seller_type,transmission,owner,"
+    b"mileage,engine,max_power,torque,seats\n"
+    b"Maruti,2015,60000,Diesel,Individual,Manual,First Owner,17.5,1248,74,,5\n"
+    b"Skoda Rapid 1.5 TDI Ambition,2014,120000,Diesel,Individual,Manual,"
+    b"Second Owner,21.14 kmpl,1498 CC,103.52 bhp,250Nm@ 1500-2500rpm,5.0\n"
+    b"Hyundai i20 Sportz Diesel,,127000,Petrol,Dealer,Automatic,Test Drive Car,,,,,\n"
+)
+
+MAX_SANE_PRICE = 1e9
+
+
+class WarmUpError(RuntimeError):
+    pass
+
+
+def _check_price(price: float) -> None:
+    if not (math.isfinite(price) and 0 < price < MAX_SANE_PRICE):
+        raise WarmUpError(f"Warm-up prediction {price!r} is out of range")
+
+
+async def warm_up(batch_rows: int = 1000) -> dict[str, float]:
+    """
+    Run a single and a batch prediction through the scheduler before serving,
+    so lazy initialization in pandas, pyarrow and sklearn and regex compilation
+    don't land on the first users. Raises WarmUpError on implausible output.
+    Returns:
+        dict[str, float]: Durations of the stages in seconds.
+    """
+    timings = {}
+
+    started_at = time.monotonic()
+    price = await scheduler.run_interactive(handlers.predict_price, WARM_UP_ITEM)
+    timings["single"] = time.monotonic() - started_at
+    _check_price(price)
+
+    header, *rows = WARM_UP_CSV.splitlines(keepends=True)
+    data = header + b"".join(rows[i % len(rows)] for i in range(batch_rows))
+
+    started_at = time.monotonic()
+    chunks = batch_io.iter_batch(io.BytesIO(data), chunk_rows=scheduler.chunk_size)
+    writer = batch_io.BatchWriter(io.BytesIO(), batch_io.DEFAULT_OUTPUT_FORMAT)
+    prices = []
+    try:
+        while (chunk := await scheduler.run_batch(next, chunks, None)) is not None:
+            chunk_prices = await scheduler.run_batch(handlers.predict_batch, chunk)
+            writer.write(chunk.assign(predicted_price=chunk_prices))
+            prices.extend(chunk_prices)
+        writer.close()
+    finally:
+        writer.abort()
+    timings["batch"] = time.monotonic() - started_at
+
+    if len(prices) != batch_rows:
+        raise WarmUpError(f"Warm-up batch returned {len(prices)} of {batch_rows} rows")
+    for batch_price in prices:
+        _check_price(batch_price)
+    if not math.isclose(prices[0], price, rel_tol=1e-4):
+        raise WarmUpError(
+            f"Single ({price!r}) and batch ({prices[0]!r}) predictions differ"
+        )
+
+    timings["total"] = timings["single"] + timings["batch"]
+    return timings
+
+
+class HealthProbe:
+    """
+    Liveness and readiness of the bot for orchestrators.
+
+    Served over HTTP when a port is configured: ``/health`` answers while the
+    process runs, ``/ready`` answers 200 only after warm-up (503 before and
+    during shutdown) and ``/metrics`` dumps the metrics registry. When a file
+    is configured it is written on readiness and removed when not ready.
+    """
+
+    def __init__(self):
+        self.host = "127.0.0.1"
+        self.port: Optional[int] = None
+        self.file: Optional[pathlib.Path] = None
+        self.ready = False
+        self.reason = "starting"
+        self.warm_up: dict[str, float] = {}
+        self.started_at = time.time()
+        self._runner: Optional[web.AppRunner] = None
+
+    def configure(
+        self, host: str, port: Optional[int], file: Optional[str] = None
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.file = pathlib.Path(file) if file else None
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "reason": self.reason,
+            "uptime": time.time() - self.started_at,
+            "warm_up": self.warm_up,
+        }
+
+    def set_ready(self, warm_up: dict[str, float]) -> None:
+        self.ready = True
+        self.reason = "ready"
+        self.warm_up = warm_up
+        for stage, duration in warm_up.items():
+            METRICS.set_gauge(f"warm_up.{stage}", duration)
+        self._write_file()
+        logger.info(
+            "Ready, warm-up took %s",
+            ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in warm_up.items()),
+        )
+
+    def set_not_ready(self, reason: str) -> None:
+        self.ready = False
+        self.reason = reason
+        self._write_file()
+
+    def _write_file(self) -> None:
+        if self.file is None:
+            return
+        if not self.ready:
+            self.file.unlink(missing_ok=True)
+            return
+        # atomic replace, a probe never reads a half written file
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.file.parent, prefix=".tmp-", delete=False
+        ) as tmp:
+            json.dump(self.status(), tmp)
+        os.replace(tmp.name, self.file)
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.json_response({"alive": True, "uptime": self.status()["uptime"]})
+
+    async def _ready(self, request: web.Request) -> web.Response:
+        return web.json_response(self.status(), status=200 if self.ready else 503)
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.json_response(METRICS.snapshot())
+
+    async def start(self) -> None:
+        if self.port is None or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/health", self._health)
+        app.router.add_get("/ready", self._ready)
+        app.router.add_get("/metrics", self._metrics)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self) -> None:
+        self.set_not_ready("stopped")
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+health = HealthProbe()
@@ -0,0 +1,117 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, NamedTuple, Optional
+
+import aiosqlite
+
+from database import DB
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# compact form of a page boundary in callback data: ts and rowid
+CURSOR_TS_FORMAT = "%Y%m%d%H%M%S"
+
+OLDER = "older"
+NEWER = "newer"
+
+
+class HistoryEntry(NamedTuple):
+    rowid: int
+    ts: str
+    features: dict[str, Any]
+    price: float
+
+    @property
+    def cursor(self) -> str:
+        ts = datetime.strptime(self.ts, TS_FORMAT).strftime(CURSOR_TS_FORMAT)
+        return f"{ts}:{self.rowid}"
+
+
+class PredictionHistory:
+    """
+    Past single item predictions of every user in the history table.
+
+    Pages are read with keyset pagination on the (client_id, ts) index: a
+    page starts after the (ts, rowid) of the last entry shown, so every page
+    costs the same however long the history is. Only the newest
+    ``max_entries`` of a user are kept, older ones are deleted when a
+    prediction is added. Pages are read from the read pool of DB.
+    """
+
+    def __init__(self, max_entries: int = 100, page_size: int = 5):
+        self.configure(max_entries=max_entries, page_size=page_size)
+
+    def configure(self, *, max_entries: int, page_size: int) -> None:
+        self.max_entries = max_entries
+        self.page_size = page_size
+
+    async def add(self, client_id: int, features: dict[str, Any], price: float) -> None:
+        """
+        Store a prediction, a failed write is logged and otherwise ignored.
+        """
+        if not DB.is_connected or self.max_entries <= 0:
+            return
+        try:
+            await DB.execute(
+                "INSERT INTO history VALUES (?, ?, ?, ?)",
+                (
+                    client_id,
+                    datetime.now().strftime(TS_FORMAT),
+                    json.dumps(features, separators=(",", ":")),
+                    price,
+                ),
+            )
+            await DB.execute(
+                "DELETE FROM history WHERE client_id = ? AND rowid IN ("
+                "SELECT rowid FROM history WHERE client_id = ? "
+                "ORDER BY ts DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (client_id, client_id, self.max_entries),
+            )
+        except aiosqlite.Error:
+            METRICS.inc("history.failed")
+            logger.exception("Saving the prediction history failed")
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> tuple[str, int]:
+        ts, _, rowid = cursor.partition(":")
+        return (
+            datetime.strptime(ts, CURSOR_TS_FORMAT).strftime(TS_FORMAT),
+            int(rowid),
+        )
+
+    async def page(
+        self,
+        client_id: int,
+        cursor: Optional[str] = None,
+        direction: str = OLDER,
+    ) -> tuple[list[HistoryEntry], bool]:
+        """
+        Entries of a user, newest first, older or newer than the cursor
+        entry. Returns the page and whether there are more in that direction.
+        """
+        older = direction == OLDER
+        condition, values = "client_id = ?", [client_id]
+        if cursor is not None:
+            condition += f" AND (ts, rowid) {'<' if older else '>'} (?, ?)"
+            values.extend(self.parse_cursor(cursor))
+        order = "DESC" if older else "ASC"
+        rows = await DB.read(
+            f"SELECT rowid, ts, features, price FROM history WHERE {condition} "
+            f"ORDER BY ts {order}, rowid {order} LIMIT ?",
+            (*values, self.page_size + 1),
+        )
+        more = len(rows) > self.page_size
+        entries = [
+            HistoryEntry(rowid, ts, json.loads(features), price)
+            for rowid, ts, features, price in rows[: self.page_size]
+        ]
+        if not older:
+            entries.reverse()
+        return entries, more
+
+
+history = PredictionHistory()
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import TelegramObject, Update
+
+from database import DB
+from health import health
+from outbox import outbox
+from scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def save_fsm(storage: BaseStorage, path: pathlib.Path) -> int:
+    """
+    Write the conversations of a MemoryStorage to a JSON file,
+    returns the number of saved records.
+    """
+    if not isinstance(storage, MemoryStorage):
+        return 0
+    records = [
+        {"key": vars(key), "state": record.state, "data": record.data}
+        for key, record in storage.storage.items()
+        if record.state is not None or record.data
+    ]
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=".tmp-", delete=False
+    ) as tmp:
+        json.dump(records, tmp)
+    os.replace(tmp.name, path)
+    return len(records)
+
+
+def restore_fsm(storage: BaseStorage, path: pathlib.Path) -> int:
+    """
+    Load conversations saved by save_fsm into a MemoryStorage once,
+    returns the number of restored records.
+    """
+    if not isinstance(storage, MemoryStorage) or not path.exists():
+        return 0
+    records = json.loads(path.read_text())
+    for record in records:
+        stored = storage.storage[StorageKey(**record["key"])]
+        stored.state = record["state"]
+        stored.data = record["data"]
+    path.unlink()
+    return len(records)
+
+
+class Lifecycle:
+    """
+    Ordered graceful shutdown of the bot, registered as a dispatcher
+    shutdown handler. By the time it runs aiogram has stopped polling.
+
+    1. stop accepting updates: report not ready, confirm the offset of
+       the updates already received
+    2. drain: wait until ``drain_timeout`` for in-flight handlers (and the
+       prediction jobs they await), then stop the scheduler and the outbox
+    3. flush: run flush hooks, commit the database, save FSM conversations
+    4. close: database, bot session and health endpoint
+
+    Every step is logged with its duration.
+    """
+
+    def __init__(self, drain_timeout: float = 25.0):
+        self.drain_timeout = drain_timeout
+        self.fsm_snapshot: Optional[pathlib.Path] = None
+        self.last_update_id: Optional[int] = None
+        self._flush_hooks: list[Callable[[], Awaitable[None]]] = []
+
+    def configure(
+        self, drain_timeout: float, fsm_snapshot: Optional[str] = None
+    ) -> None:
+        self.drain_timeout = drain_timeout
+        self.fsm_snapshot = pathlib.Path(fsm_snapshot) if fsm_snapshot else None
+
+    def on_flush(
+        self, hook: Callable[[], Awaitable[None]]
+    ) -> Callable[[], Awaitable[None]]:
+        """
+        Register a coroutine function run in the flush step, e.g. to write
+        buffered records. Usable as a decorator.
+        """
+        self._flush_hooks.append(hook)
+        return hook
+
+    def setup(self, dp: Dispatcher) -> None:
+        dp.update.outer_middleware(self._track_update)
+        dp.shutdown.register(self.shutdown)
+        if self.fsm_snapshot is not None:
+            restored = restore_fsm(dp.storage, self.fsm_snapshot)
+            if restored:
+                logger.info("Restored %d conversations", restored)
+
+    async def _track_update(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        if self.last_update_id is None or event.update_id > self.last_update_id:
+            self.last_update_id = event.update_id
+        return await handler(event, data)
+
+    @asynccontextmanager
+    async def _step(self, name: str) -> AsyncIterator[None]:
+        started_at = time.monotonic()
+        try:
+            yield
+        except Exception:
+            logger.exception("Shutdown step %r failed", name)
+        finally:
+            logger.info(
+                "Shutdown step %r took %.3f s", name, time.monotonic() - started_at
+            )
+
+    async def shutdown(self, dispatcher: Dispatcher, bot: Bot) -> None:
+        started_at = time.monotonic()
+        deadline = started_at + self.drain_timeout
+
+        async with self._step("stop updates"):
+            health.set_not_ready("shutting down")
+            if self.last_update_id is not None:
+                # updates count as received only with the next getUpdates
+                # offset, without it they would be handled again after restart
+                await bot.get_updates(
+                    offset=self.last_update_id + 1, limit=1, timeout=0
+                )
+
+        async with self._step("drain"):
+            tasks = set(getattr(dispatcher, "_handle_update_tasks", ()))
+            if tasks:
+                logger.info("Waiting for %d in-flight updates", len(tasks))
+                _, pending = await asyncio.wait(
+                    tasks, timeout=max(0.0, deadline - time.monotonic())
+                )
+                if pending:
+                    logger.warning(
+                        "Cancelling %d updates still running after %.1f s",
+                        len(pending),
+                        self.drain_timeout,
+                    )
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+            await scheduler.stop()
+            await outbox.stop(timeout=max(0.0, deadline - time.monotonic()))
+
+        async with self._step("flush"):
+            for hook in self._flush_hooks:
+                await hook()
+            if DB.is_connected:
+                await DB.conn.commit()
+            if self.fsm_snapshot is not None:
+                saved = save_fsm(dispatcher.storage, self.fsm_snapshot)
+                logger.info("Saved %d conversations", saved)
+            await dispatcher.storage.close()
+
+        async with self._step("close"):
+            await DB.close()
+            await bot.session.close()
+            await health.stop()
+
+        logger.info("Shutdown took %.3f s", time.monotonic() - started_at)
+
+
+lifecycle = Lifecycle()
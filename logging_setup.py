@@ -0,0 +1,130 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+# fields of the update being handled, set by middlewares.LogContextMiddleware
+log_context: contextvars.ContextVar[Optional[dict[str, Any]]] = contextvars.ContextVar(
+    "log_context", default=None
+)
+
+CONTEXT_FIELDS = ("update_id", "handler", "duration")
+
+DEFAULT_LEVELS = {
+    # replaced by the structured "Update handled" record of LogContextMiddleware
+    "aiogram.event": "WARNING",
+    # one record per SQL statement
+    "aiosqlite": "INFO",
+}
+
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copies the update context onto records when they are emitted,
+    still on the thread (and task) that logged them.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = log_context.get()
+        if context:
+            for field in CONTEXT_FIELDS:
+                if field in context and not hasattr(record, field):
+                    setattr(record, field, context[field])
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only ``rate`` of the DEBUG records, higher levels always pass.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        # context fields and anything passed with extra=
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class LoopSafeQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that only merges the message arguments on the emitting
+    thread; formatting and I/O happen in the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class QueueListener(logging.handlers.QueueListener):
+    def stop(self) -> None:
+        # stopped explicitly and again at exit
+        if self._thread is not None:
+            super().stop()
+
+
+def setup_logging(
+    level: str = "INFO",
+    levels: Optional[dict[str, str]] = None,
+    json_format: bool = True,
+    debug_sample_rate: float = 1.0,
+    stream=None,
+) -> QueueListener:
+    """
+    Route all logging through a queue to a listener thread writing to
+    ``stream`` (stderr by default) as JSON lines or plain text.
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(
+        JsonFormatter()
+        if json_format
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    )
+
+    handler = LoopSafeQueueHandler(queue.SimpleQueue())
+    handler.addFilter(SamplingFilter(debug_sample_rate))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name, logger_level in {**DEFAULT_LEVELS, **(levels or {})}.items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    listener = QueueListener(handler.queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,71 @@
+import threading
+from collections import defaultdict, deque
+from typing import Any
+
+
+class Metrics:
+    """
+    In-process registry of counters, gauges and timing samples.
+    Timings keep a bounded window of recent samples, so percentiles
+    describe current behaviour rather than the whole uptime.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._timings: dict[str, deque] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            samples = self._timings.get(name)
+            if samples is None:
+                samples = self._timings[name] = deque(maxlen=self.window)
+            samples.append(value)
+
+    @staticmethod
+    def _percentile(ordered: list[float], q: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self, name: str) -> dict[str, float]:
+        with self._lock:
+            ordered = sorted(self._timings.get(name, ()))
+        if not ordered:
+            return {"count": 0}
+        return {
+            "count": len(ordered),
+            "p50": self._percentile(ordered, 0.50),
+            "p95": self._percentile(ordered, 0.95),
+            "p99": self._percentile(ordered, 0.99),
+            "max": ordered[-1],
+        }
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            names = list(self._timings)
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "timings": {name: self.summary(name) for name in names},
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+METRICS = Metrics()
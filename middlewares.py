@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update
+from pydantic import BaseModel
+
+from logging_setup import log_context
+from metrics import METRICS
+
+update_logger = logging.getLogger("updates")
+
+
+class ThrottleLimit(BaseModel):
+    """
+    Token bucket parameters of a handler group: ``rate`` tokens per second
+    up to ``burst`` per user, optionally shared ``global_rate``/``global_burst``.
+    """
+
+    rate: float
+    burst: int
+    global_rate: Optional[float] = None
+    global_burst: Optional[int] = None
+
+
+# handlers opt in with flags={"throttle": <group>}
+DEFAULT_LIMITS = {
+    "single": ThrottleLimit(rate=0.2, burst=5, global_rate=20, global_burst=50),
+    "batch": ThrottleLimit(rate=1 / 30, burst=2, global_rate=1, global_burst=5),
+    "rating": ThrottleLimit(rate=0.1, burst=3, global_rate=20, global_burst=50),
+    "stats": ThrottleLimit(rate=0.2, burst=5, global_rate=10, global_burst=20),
+}
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated_at", "notified")
+
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = now
+        self.notified = False
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def consume(self, now: float) -> float:
+        """
+        Take a token. Returns 0 on success, otherwise the seconds until
+        the next token is available.
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def is_full(self, now: float) -> bool:
+        # a full bucket behaves exactly like a new one, so it can be dropped
+        return self.tokens + (now - self.updated_at) * self.rate >= self.capacity
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Inner middleware rate limiting handlers flagged with ``throttle``.
+
+    Every group has a token bucket per user and optionally one shared by all
+    users. A throttled user gets one polite reply until a request passes
+    again, further requests are dropped silently (callbacks are still
+    answered, so the client stops waiting). Idle buckets are evicted by a
+    periodic sweep.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[dict[str, ThrottleLimit]] = None,
+        sweep_interval: float = 60.0,
+    ):
+        self.limits = DEFAULT_LIMITS if limits is None else limits
+        self.sweep_interval = sweep_interval
+        self._buckets: dict[tuple[str, Optional[int]], TokenBucket] = {}
+        self._swept_at = time.monotonic()
+
+    def configure(self, limits: dict[str, ThrottleLimit]) -> None:
+        self.limits = limits
+        self._buckets.clear()
+
+    def _bucket(
+        self, key: tuple[str, Optional[int]], rate: float, burst: int, now: float
+    ) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+        return bucket
+
+    def _sweep(self, now: float) -> None:
+        if now - self._swept_at < self.sweep_interval:
+            return
+        self._swept_at = now
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if not bucket.is_full(now)
+        }
+        METRICS.set_gauge("throttle.buckets", len(self._buckets))
+
+    @staticmethod
+    async def _reply(event: TelegramObject, wait: float, notify: bool) -> None:
+        # outbox imports TokenBucket from this module
+        from outbox import outbox
+
+        text = (
+            "Too many requests, please try again in "
+            f"{math.ceil(wait)} s. Thank you for your patience 🙏"
+        )
+        if isinstance(event, CallbackQuery):
+            # answerCallbackQuery only stops the button spinner, it is not a
+            # chat message and does not count against the chat send limits
+            await event.answer(text if notify else None, show_alert=notify)
+        elif isinstance(event, Message) and notify:
+            await outbox.answer(event, text)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        group = get_flag(data, "throttle")
+        limit = self.limits.get(group) if group else None
+        user = data.get("event_from_user")
+        if limit is None or user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        self._sweep(now)
+
+        user_bucket = self._bucket((group, user.id), limit.rate, limit.burst, now)
+        wait = user_bucket.consume(now)
+        if not wait and limit.global_rate:
+            global_bucket = self._bucket(
+                (group, None), limit.global_rate, limit.global_burst or 1, now
+            )
+            wait = global_bucket.consume(now)
+            if wait:
+                user_bucket.refund()
+
+        if wait:
+            METRICS.inc(f"throttle.{group}.rejected")
+            await self._reply(event, wait, notify=not user_bucket.notified)
+            user_bucket.notified = True
+            return None
+
+        user_bucket.notified = False
+        return await handler(event, data)
+
+
+throttling = ThrottlingMiddleware()
+
+
+class Debouncer:
+    """
+    Lets only the latest of rapid events of a key through, e.g. the inline
+    queries a user sends on every keystroke.
+    """
+
+    def __init__(self, delay: float = 0.3):
+        self.delay = delay
+        self._latest: dict[Any, object] = {}
+
+    def configure(self, delay: float) -> None:
+        self.delay = delay
+
+    async def settle(self, key: Any) -> bool:
+        """
+        Wait ``delay`` seconds. Returns False if a newer event of the key
+        arrived in the meantime.
+        """
+        if self.delay <= 0:
+            return True
+        token = self._latest[key] = object()
+        await asyncio.sleep(self.delay)
+        if self._latest.get(key) is not token:
+            METRICS.inc("debounce.dropped")
+            return False
+        del self._latest[key]
+        return True
+
+
+debouncer = Debouncer()
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """
+    Puts the update id and the handler name into the log context of the
+    update, so every record logged while handling it carries them, and logs
+    one "Update handled" record with the duration per update.
+    """
+
+    def setup(self, dp: Dispatcher) -> None:
+        dp.update.outer_middleware(self)
+        for name, observer in dp.observers.items():
+            if name not in ("update", "error"):
+                observer.middleware(self)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            context = log_context.get()
+            if context is not None:
+                context["handler"] = data["handler"].callback.__name__
+            return await handler(event, data)
+
+        context = {"update_id": event.update_id}
+        token = log_context.set(context)
+        started_at = time.perf_counter()
+        handled = False
+        try:
+            result = await handler(event, data)
+            handled = result is not UNHANDLED
+            return result
+        finally:
+            context["duration"] = round(time.perf_counter() - started_at, 6)
+            update_logger.info("Update handled", extra={"handled": handled})
+            log_context.reset(token)
@@ -0,0 +1,402 @@
+import asyncio
+import html
+import logging
+from collections import deque
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InputFile, Message
+
+from metrics import METRICS
+from middlewares import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+class PooledAiohttpSession(AiohttpSession):
+    """
+    AiohttpSession with a sized keep-alive connection pool, so bursts of
+    sends reuse open connections to the Bot API instead of reconnecting.
+    """
+
+    def __init__(
+        self,
+        connections: int = 100,
+        keepalive_timeout: float = 30.0,
+        api_url: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        if api_url:
+            kwargs["api"] = TelegramAPIServer.from_base(api_url)
+        super().__init__(**kwargs)
+        self._connector_init.update(
+            limit=connections, keepalive_timeout=keepalive_timeout
+        )
+
+
+class _Outgoing:
+    __slots__ = ("text", "kwargs", "coalesce", "method", "futures", "attempts")
+
+    def __init__(
+        self,
+        text: Optional[str],
+        kwargs: dict[str, Any],
+        coalesce: bool,
+        method: str = "send_message",
+    ):
+        self.text = text
+        self.kwargs = kwargs
+        self.coalesce = coalesce
+        self.method = method
+        self.futures: list[asyncio.Future] = []
+        self.attempts = 0
+
+    def merge(self, other: "_Outgoing") -> bool:
+        """
+        Append a following text message to this one if Telegram would render
+        both the same way: no keyboard on this one, compatible parse modes
+        (plain text is escaped into HTML) and within the length limit.
+        """
+        if not (self.coalesce and other.coalesce):
+            return False
+        if self.kwargs.get("reply_markup") is not None:
+            return False
+        if self._options() != other._options():
+            return False
+
+        modes = {self.kwargs.get("parse_mode"), other.kwargs.get("parse_mode")}
+        first, second = self.text, other.text
+        if modes == {None, ParseMode.HTML}:
+            if self.kwargs.get("parse_mode") is None:
+                first = html.escape(first)
+            else:
+                second = html.escape(second)
+        elif len(modes) != 1:
+            return False
+
+        text = f"{first}\n\n{second}"
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return False
+
+        self.text = text
+        self.kwargs = {**self.kwargs, **other.kwargs}
+        if ParseMode.HTML in modes:
+            self.kwargs["parse_mode"] = ParseMode.HTML
+        self.futures.extend(other.futures)
+        METRICS.inc("outbox.coalesced")
+        return True
+
+    def _options(self) -> dict[str, Any]:
+        return {
+            key: value
+            for key, value in self.kwargs.items()
+            if key not in ("parse_mode", "reply_markup")
+        }
+
+
+class _Chat:
+    __slots__ = ("queue", "bucket", "in_flight", "paused_until")
+
+    def __init__(self, bucket: TokenBucket):
+        self.queue: deque[_Outgoing] = deque()
+        self.bucket = bucket
+        self.in_flight = False
+        self.paused_until = 0.0
+
+
+class Outbox:
+    """
+    Outgoing messages and documents, rate limited per chat and globally.
+
+    Handlers enqueue with ``answer`` and return without waiting. Messages of
+    a chat are sent one at a time in order, different chats are sent
+    concurrently. Texts that queue up for the same chat are coalesced into
+    one message where the formatting allows it. On flood control
+    (retry_after) the chat is paused and the message is sent again. Before
+    ``start`` (and in tests) messages are sent directly.
+    """
+
+    def __init__(
+        self,
+        per_chat_rate: float = 1.0,
+        per_chat_burst: int = 3,
+        global_rate: float = 30.0,
+        global_burst: int = 30,
+        max_pending: int = 10000,
+        max_attempts: int = 5,
+    ):
+        self.configure(
+            per_chat_rate=per_chat_rate,
+            per_chat_burst=per_chat_burst,
+            global_rate=global_rate,
+            global_burst=global_burst,
+            max_pending=max_pending,
+        )
+        self.max_attempts = max_attempts
+        self._chats: dict[int, _Chat] = {}
+        # chats with queued messages in round-robin order
+        self._queued: dict[int, None] = {}
+        self._swept_at = 0.0
+        self._pending = 0
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._deliveries: set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._global: Optional[TokenBucket] = None
+
+    def configure(
+        self,
+        *,
+        per_chat_rate: float,
+        per_chat_burst: int,
+        global_rate: float,
+        global_burst: int,
+        max_pending: int,
+    ) -> None:
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.max_pending = max_pending
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self, bot: Bot) -> None:
+        if self.is_running:
+            return
+        loop = asyncio.get_running_loop()
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        self._global = TokenBucket(self.global_rate, self.global_burst, loop.time())
+        self._task = asyncio.create_task(self._run(), name="outbox")
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """
+        Send what is queued for up to ``timeout`` seconds, then stop.
+        """
+        if not self.is_running:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (self._pending or self._deliveries) and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if self._pending:
+            logger.warning("Outbox stopped with %d unsent messages", self._pending)
+
+        self._task.cancel()
+        for task in self._deliveries:
+            task.cancel()
+        await asyncio.gather(self._task, *self._deliveries, return_exceptions=True)
+        self._task = None
+        self._deliveries.clear()
+        self._chats.clear()
+        self._queued.clear()
+        self._pending = 0
+
+    async def answer(self, message: Message, *args: Any, **kwargs: Any) -> None:
+        """
+        Drop-in for ``message.answer``: enqueue the text and return.
+        Waits for delivery only when too many messages are pending.
+        """
+        if not self.is_running:
+            await message.answer(*args, **kwargs)
+            return
+
+        if args:
+            kwargs["text"] = args[0]
+        future = self.send(message.chat.id, **kwargs)
+        if self._pending > self.max_pending:
+            await asyncio.wait([future])
+
+    async def answer_document(
+        self, message: Message, document: InputFile, **kwargs: Any
+    ) -> None:
+        """
+        Drop-in for ``message.answer_document``: the document is sent after
+        the texts queued before it. Waits for the upload, the file has to
+        stay open until then.
+        """
+        if not self.is_running:
+            await message.answer_document(document, **kwargs)
+            return
+        await self.send_document(message.chat.id, document, **kwargs)
+
+    async def reply_document(
+        self, message: Message, document: InputFile, **kwargs: Any
+    ) -> None:
+        """
+        Drop-in for ``message.reply_document``, see answer_document.
+        """
+        if not self.is_running:
+            await message.reply_document(document, **kwargs)
+            return
+        await self.send_document(
+            message.chat.id,
+            document,
+            reply_to_message_id=message.message_id,
+            **kwargs,
+        )
+
+    def send(
+        self, chat_id: int, text: str, coalesce: bool = True, **kwargs: Any
+    ) -> asyncio.Future:
+        """
+        Enqueue a text message, the future resolves once it is delivered.
+        """
+        return self._enqueue(chat_id, _Outgoing(text, kwargs, coalesce))
+
+    def send_document(
+        self, chat_id: int, document: InputFile, **kwargs: Any
+    ) -> asyncio.Future:
+        """
+        Enqueue a document, the future resolves once it is uploaded.
+        """
+        return self._enqueue(
+            chat_id,
+            _Outgoing(
+                None, {"document": document, **kwargs}, False, method="send_document"
+            ),
+        )
+
+    def _enqueue(self, chat_id: int, outgoing: _Outgoing) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst, loop.time())
+            chat = self._chats[chat_id] = _Chat(bucket)
+
+        future = loop.create_future()
+        # nobody has to await it, failures are logged by the outbox
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        outgoing.futures.append(future)
+
+        chat.queue.append(outgoing)
+        self._queued[chat_id] = None
+        self._pending += 1
+        METRICS.set_gauge("outbox.pending", self._pending)
+        self._wakeup.set()
+        return future
+
+    def _next(self, now: float) -> tuple[Optional[int], float]:
+        """
+        Pick a chat that may send now. Returns its id (or None) and how long
+        to sleep otherwise.
+        """
+        sleep = None
+        for chat_id in self._queued:
+            chat = self._chats[chat_id]
+            if chat.in_flight:
+                continue
+            wait = chat.paused_until - now
+            if wait <= 0:
+                wait = chat.bucket.consume(now)
+            if wait <= 0:
+                return chat_id, 0.0
+            sleep = wait if sleep is None else min(sleep, wait)
+        return None, sleep
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            wait = self._global.consume(now)
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+
+            chat_id, sleep = self._next(now)
+            if chat_id is None:
+                self._global.refund()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), sleep)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            chat = self._chats[chat_id]
+            outgoing = chat.queue.popleft()
+            while chat.queue and outgoing.merge(chat.queue[0]):
+                chat.queue.popleft()
+            # to the back of the rotation, or out of it when empty
+            del self._queued[chat_id]
+            if chat.queue:
+                self._queued[chat_id] = None
+
+            chat.in_flight = True
+            task = asyncio.create_task(self._deliver(chat_id, chat, outgoing))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+            self._sweep(now)
+
+    def _sweep(self, now: float) -> None:
+        # idle chats with full buckets behave like new ones and are forgotten
+        if now - self._swept_at < 60:
+            return
+        self._swept_at = now
+        self._chats = {
+            chat_id: chat
+            for chat_id, chat in self._chats.items()
+            if chat.queue or chat.in_flight or not chat.bucket.is_full(now)
+        }
+
+    async def _deliver(self, chat_id: int, chat: _Chat, outgoing: _Outgoing) -> None:
+        loop = asyncio.get_running_loop()
+        outgoing.attempts += 1
+        kwargs = outgoing.kwargs
+        if outgoing.text is not None:
+            kwargs = {"text": outgoing.text, **kwargs}
+        try:
+            result = await getattr(self._bot, outgoing.method)(
+                chat_id=chat_id, **kwargs
+            )
+        except TelegramRetryAfter as e:
+            METRICS.inc("outbox.retry_after")
+            if outgoing.attempts < self.max_attempts:
+                chat.paused_until = loop.time() + e.retry_after
+                chat.queue.appendleft(outgoing)
+                self._queued[chat_id] = None
+                return
+            self._finish(outgoing, exception=e)
+        except Exception as e:
+            logger.warning("Failed to send a message to chat %s: %s", chat_id, e)
+            METRICS.inc("outbox.failed")
+            self._finish(outgoing, exception=e)
+        else:
+            METRICS.inc("outbox.sent")
+            self._finish(outgoing, result=result)
+        finally:
+            chat.in_flight = False
+            self._wakeup.set()
+
+    def _finish(
+        self,
+        outgoing: _Outgoing,
+        result: Any = None,
+        exception: Optional[BaseException] = None,
+    ) -> None:
+        self._pending -= len(outgoing.futures)
+        METRICS.set_gauge("outbox.pending", self._pending)
+        for future in outgoing.futures:
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+
+outbox = Outbox()
@@ -1,12 +1,19 @@
+import hashlib
 import pickle
 
+import numpy as np
 import pandas as pd
 
 from sklearn.preprocessing import PolynomialFeatures
 
+import explain
+
+MODEL_FILES = ["na_imputer.pkl", "normalizer.pkl", "ohe.pkl", "ridge_regressor.pkl"]
+
 
 class CarPricePredictorPreprocessor:
     def __init__(self, models_folder):
+        self.model_version = self.compute_version(models_folder)
         self.na_imputer = self.load_pickle(models_folder, filename="na_imputer.pkl")
         self.normalizer = self.load_pickle(models_folder, filename="normalizer.pkl")
         self.ohe = self.load_pickle(models_folder, filename="ohe.pkl")
@@ -14,13 +21,49 @@ class CarPricePredictorPreprocessor:
             models_folder, filename="ridge_regressor.pkl"
         )
 
+        ridge = self.ridge_regressor.best_estimator_
+        self.contribution_names, groups = explain.group_matrix(
+            list(ridge.feature_names_in_), list(self.ohe.feature_names_in_)
+        )
+        # coefficients summed per input feature by one matrix product
+        self.contribution_weights = ridge.coef_[:, np.newaxis] * groups
+
+    @staticmethod
+    def compute_version(folder) -> str:
+        """
+        Short content hash of the model files, changes whenever any of them does
+        """
+        digest = hashlib.sha256()
+        for filename in MODEL_FILES:
+            digest.update((folder / filename).read_bytes())
+        return digest.hexdigest()[:12]
+
     @staticmethod
     def load_pickle(folder, filename):
         contents = pickle.load(open((folder / filename), "rb"))
         return contents
 
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Predict prices for raw rows without modifying the input frame
+        """
+        return self.ridge_regressor.predict(self.preprocess_data(df.copy()))
+
+    def predict_with_contributions(
+        self, df: pd.DataFrame
+    ) -> tuple[np.ndarray, pd.DataFrame]:
+        """
+        Predict prices and the contribution of every input feature to them
+        from the same transformed matrix
+        """
+        features = self.preprocess_data(df.copy())
+        prices = self.ridge_regressor.predict(features)
+        contributions = features.to_numpy(dtype=np.float64) @ self.contribution_weights
+        return prices, pd.DataFrame(contributions, columns=self.contribution_names)
+
     def preprocess_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        df.drop(labels=["torque"], axis=1, inplace=True)
+        # torque is optional in uploaded batches and not used by the model
+        df.drop(labels=["torque"], axis=1, inplace=True, errors="ignore")
 
         for i in ["mileage", "engine", "max_power"]:
             df[i] = df[i].str.extract(r"(\d+[.,\d]+)").replace("", None).astype("float")
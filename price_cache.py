@@ -0,0 +1,54 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from metrics import METRICS
+
+
+class PriceCache:
+    """
+    In-memory cache of predicted prices keyed by the parsed car spec.
+
+    Entries expire ``ttl`` seconds after they were stored, at most
+    ``max_size`` entries are kept and the least recently used are evicted
+    first. A cache with ttl == 0 or max_size == 0 is disabled.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_size: int = 10000):
+        self._entries: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+        self.configure(ttl, max_size)
+
+    def configure(self, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    @staticmethod
+    def key(fields: dict[str, Any], *parts: Hashable) -> tuple:
+        return (*parts, *sorted(fields.items()))
+
+    def get(self, key: Hashable) -> Optional[float]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            METRICS.inc("price_cache.miss")
+            return None
+        self._entries.move_to_end(key)
+        METRICS.inc("price_cache.hit")
+        return entry[1]
+
+    def put(self, key: Hashable, price: float) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, price)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+price_cache = PriceCache()
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+from typing import BinaryIO, Optional
+
+from metrics import METRICS
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class ResultCache:
+    """
+    On-disk cache of batch results keyed by the content hash of the upload.
+
+    Every entry is a single file named by its key. Reads refresh the file
+    modification time, so evicting the oldest files first gives LRU order.
+    A cache without a directory or with max_bytes == 0 is disabled.
+    get, put and evict do blocking file IO, call them off the event loop.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 0):
+        self._lock = threading.Lock()
+        self.configure(directory, max_bytes)
+
+    def configure(self, directory: Optional[str], max_bytes: int) -> None:
+        self.directory = pathlib.Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None and self.max_bytes > 0
+
+    @staticmethod
+    def key(source: BinaryIO, *parts: str) -> str:
+        """
+        Hash the file contents together with the extra key parts
+        (Telegram file_unique_id, model version, output format).
+        The file position is restored afterwards.
+        """
+        digest = hashlib.sha256()
+        position = source.tell()
+        source.seek(0)
+        while block := source.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+        source.seek(position)
+
+        for part in parts:
+            digest.update(b"\0" + str(part).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[BinaryIO]:
+        """
+        The cached result opened for reading, the caller closes it.
+        An open file stays readable when put or evict unlink it meanwhile.
+        """
+        if not self.enabled:
+            return None
+
+        path = self.directory / key
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            METRICS.inc("result_cache.misses")
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        METRICS.inc("result_cache.hits")
+        return file
+
+    def put(self, key: str, source: BinaryIO) -> None:
+        if not self.enabled:
+            return
+
+        source.seek(0)
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=".tmp-", delete=False
+        ) as tmp:
+            shutil.copyfileobj(source, tmp)
+        os.replace(tmp.name, self.directory / key)
+        self.evict()
+
+    def evict(self) -> None:
+        with self._lock:
+            entries = []
+            for path in self.directory.iterdir():
+                if path.name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                METRICS.inc("result_cache.evictions")
+
+            METRICS.set_gauge("result_cache.bytes", total)
+
+
+result_cache = ResultCache()
@@ -0,0 +1,242 @@
+import asyncio
+import contextlib
+import functools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional
+
+from metrics import METRICS
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+
+POLICIES = ("strict", "weighted")
+
+
+class _Job:
+    __slots__ = ("func", "args", "future", "enqueued_at")
+
+    def __init__(self, func: Callable, args: tuple, future: asyncio.Future):
+        self.func = func
+        self.args = args
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class PredictionScheduler:
+    """
+    Runs prediction work on a small thread pool in front of the event loop.
+
+    Interactive jobs (single item predictions), batch chunks and background
+    jobs (table exports) wait in separate queues. Queued interactive jobs
+    always go first. Batch is capped at ``batch_cpu_share`` of worker time
+    by idling after each chunk, interactive jobs arriving during that idle
+    period run immediately.
+
+    ``background_policy`` orders batch and background work: with ``strict``
+    background jobs wait until no batch file is being scored (see
+    ``batch_job``), with ``weighted`` they may overtake batch chunks once
+    batch has used ``batch_cpu_share`` of the recent worker time of the two,
+    and run while batch idles.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        background_policy: str = "strict",
+        batch_cpu_share: float = 0.8,
+        chunk_size: int = 1000,
+        decay: float = 0.9,
+    ):
+        self.configure(
+            workers=workers,
+            background_policy=background_policy,
+            batch_cpu_share=batch_cpu_share,
+            chunk_size=chunk_size,
+        )
+        self.decay = decay
+        self._queues: dict[str, deque] = {
+            INTERACTIVE: deque(),
+            BATCH: deque(),
+            BACKGROUND: deque(),
+        }
+        self._busy = {INTERACTIVE: 0.0, BATCH: 0.0, BACKGROUND: 0.0}
+        self._batch_resume_at = 0.0
+        self._batch_jobs = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def configure(
+        self,
+        *,
+        workers: int,
+        background_policy: str,
+        batch_cpu_share: float,
+        chunk_size: int,
+    ) -> None:
+        if background_policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy {background_policy!r}")
+        if not 0 < batch_cpu_share <= 1:
+            raise ValueError("batch_cpu_share must be in (0, 1]")
+        if workers < 1 or chunk_size < 1:
+            raise ValueError("workers and chunk_size must be positive")
+        self.workers = workers
+        self.background_policy = background_policy
+        self.batch_cpu_share = batch_cpu_share
+        self.chunk_size = chunk_size
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.is_running and self._loop is loop:
+            return
+        if self._executor is not None:
+            # left over from an event loop that is gone, its jobs can't complete
+            self._executor.shutdown(wait=False)
+            for queue in self._queues.values():
+                queue.clear()
+
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="predict"
+        )
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"predict-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._loop is asyncio.get_running_loop():
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def run_interactive(self, func: Callable, *args: Any) -> Any:
+        return await self._submit(INTERACTIVE, func, args)
+
+    async def run_batch(self, func: Callable, *args: Any) -> Any:
+        return await self._submit(BATCH, func, args)
+
+    async def run_background(self, func: Callable, *args: Any) -> Any:
+        return await self._submit(BACKGROUND, func, args)
+
+    @contextlib.contextmanager
+    def batch_job(self) -> Iterator[None]:
+        """
+        Marks a batch file as being scored between its chunks, when the
+        batch queue is empty, for the strict background policy.
+        """
+        self._batch_jobs += 1
+        try:
+            yield
+        finally:
+            self._batch_jobs -= 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _submit(self, kind: str, func: Callable, args: tuple) -> Any:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queues[kind].append(_Job(func, args, future))
+        METRICS.set_gauge(f"scheduler.{kind}.depth", len(self._queues[kind]))
+        self._wakeup.set()
+        return await future
+
+    def _next_kind(self) -> Optional[str]:
+        if self._queues[INTERACTIVE]:
+            return INTERACTIVE
+        batch = bool(self._queues[BATCH]) and time.monotonic() >= self._batch_resume_at
+        background = bool(self._queues[BACKGROUND])
+
+        weighted = self.background_policy == "weighted"
+
+        if batch and background and weighted:
+            total = self._busy[BATCH] + self._busy[BACKGROUND]
+            if total and self._busy[BATCH] / total >= self.batch_cpu_share:
+                return BACKGROUND
+        if batch:
+            return BATCH
+        if background and (weighted or not (self._queues[BATCH] or self._batch_jobs)):
+            return BACKGROUND
+        return None
+
+    async def _idle(self) -> None:
+        timeout = None
+        if self._queues[BATCH]:
+            timeout = max(0.0, self._batch_resume_at - time.monotonic())
+
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            kind = self._next_kind()
+            if kind is None:
+                await self._idle()
+                continue
+
+            job = self._queues[kind].popleft()
+            METRICS.set_gauge(f"scheduler.{kind}.depth", len(self._queues[kind]))
+            if job.future.done():
+                continue
+            METRICS.observe(
+                f"scheduler.{kind}.wait", time.monotonic() - job.enqueued_at
+            )
+
+            started_at = time.monotonic()
+            try:
+                result = await loop.run_in_executor(
+                    self._executor, functools.partial(job.func, *job.args)
+                )
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            elapsed = time.monotonic() - started_at
+
+            METRICS.observe(f"scheduler.{kind}.run", elapsed)
+            for key in self._busy:
+                self._busy[key] *= self.decay
+            self._busy[kind] += elapsed
+
+            if kind == BATCH and self.batch_cpu_share < 1:
+                pause = elapsed * (1 - self.batch_cpu_share) / self.batch_cpu_share
+                self._batch_resume_at = time.monotonic() + pause
+
+    def depth(self, kind: str) -> int:
+        return len(self._queues[kind])
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Per-queue depth plus wait and run time percentiles (seconds).
+        """
+        return {
+            kind: {
+                "depth": len(queue),
+                "wait": METRICS.summary(f"scheduler.{kind}.wait"),
+                "run": METRICS.summary(f"scheduler.{kind}.run"),
+            }
+            for kind, queue in self._queues.items()
+        }
+
+
+scheduler = PredictionScheduler()
@@ -0,0 +1,289 @@
+"""
+Slim serving artifact for CarPricePredictorPreprocessor.
+
+Only what inference needs is exported: imputer medians, scaler mean/scale,
+one-hot categories and the ridge coefficients. Numeric weights live in one
+``weights.npy`` that is memory-mapped read-only, so every process serving
+the same artifact shares a single copy through the page cache, and no
+process has to import scikit-learn or unpickle the GridSearchCV.
+
+The one-hot block is never materialised: every categorical value is turned
+into the index of its coefficient and the coefficients are gathered, and
+``precision="float32"`` runs that scoring in single precision.
+
+    python -m serving export models models/serving
+    python -m serving report models/serving catalog.csv
+"""
+
+import argparse
+import json
+import sys
+import pathlib
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import explain
+
+WEIGHTS_FILE = "weights.npy"
+META_FILE = "meta.json"
+
+NUMBER_PATTERN = r"(\d+[.,\d]+)"
+
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+
+def export_artifact(preprocessor, destination: pathlib.Path) -> None:
+    """
+    Write the serving artifact of a loaded CarPricePredictorPreprocessor.
+    """
+    ridge = preprocessor.ridge_regressor.best_estimator_
+    ohe = preprocessor.ohe
+
+    if not all(ohe.drop_idx_ == 0) or ohe.handle_unknown != "ignore":
+        raise ValueError("Only drop='first' one-hot encoders are supported")
+
+    arrays = {
+        "imputer_statistics": preprocessor.na_imputer.statistics_,
+        "scaler_mean": preprocessor.normalizer.mean_,
+        "scaler_scale": preprocessor.normalizer.scale_,
+        "coef": ridge.coef_,
+        "intercept": np.atleast_1d(ridge.intercept_),
+    }
+    offsets, start = {}, 0
+    for name, array in arrays.items():
+        offsets[name] = [start, len(array)]
+        start += len(array)
+
+    meta = {
+        "model_version": preprocessor.model_version,
+        "offsets": offsets,
+        "imputer_features": list(preprocessor.na_imputer.feature_names_in_),
+        "scaler_features": list(preprocessor.normalizer.feature_names_in_),
+        "categorical_features": list(ohe.feature_names_in_),
+        "categories": [list(map(str, categories)) for categories in ohe.categories_],
+        "feature_names": list(ridge.feature_names_in_),
+    }
+
+    destination.mkdir(parents=True, exist_ok=True)
+    np.save(
+        destination / WEIGHTS_FILE,
+        np.concatenate(
+            [np.asarray(array, dtype=np.float64) for array in arrays.values()]
+        ),
+    )
+    (destination / META_FILE).write_text(json.dumps(meta, indent=2))
+
+
+class ServingModel:
+    """
+    Inference-only replacement for CarPricePredictorPreprocessor
+    backed by a memory-mapped serving artifact.
+    """
+
+    def __init__(self, weights: np.ndarray, meta: dict, precision: str = "float64"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}")
+        self.precision = precision
+        self.model_version = meta["model_version"]
+        self.feature_names = meta["feature_names"]
+        self.imputer_features = meta["imputer_features"]
+        self.scaler_features = meta["scaler_features"]
+        self.categorical_features = meta["categorical_features"]
+        self.categories = [pd.Index(categories) for categories in meta["categories"]]
+
+        for name, (start, length) in meta["offsets"].items():
+            # views into the read-only mapping, nothing is copied
+            setattr(self, name, weights[start : start + length])
+
+        # column of every non-dropped category in the final feature vector
+        self.category_offsets = []
+        column = len(self.scaler_features)
+        for categories in self.categories:
+            self.category_offsets.append(column)
+            column += len(categories) - 1
+
+        # scoring weights in the compute dtype: numeric coefficients, and the
+        # categorical ones followed by a zero that dropped and unknown
+        # categories (index -1) pick up; float64 keeps views into the mapping
+        dtype = PRECISIONS[precision]
+        numeric_count = len(self.scaler_features)
+        self.numeric_coef = self.coef[:numeric_count].astype(dtype, copy=False)
+        self.category_coef = np.append(self.coef[numeric_count:], 0).astype(dtype)
+        self.intercept_value = dtype(self.intercept[0])
+
+        # numeric coefficients summed per input feature (the year terms
+        # together), categorical contributions are the gathered coefficients
+        numeric_names, groups = explain.group_matrix(self.scaler_features, [])
+        self.numeric_contribution_weights = (
+            self.numeric_coef[:, np.newaxis] * groups
+        ).astype(dtype)
+        self.contribution_names = numeric_names + [
+            explain.LABELS.get(feature, feature)
+            for feature in self.categorical_features
+        ]
+
+    @classmethod
+    def load(cls, folder: pathlib.Path, precision: str = "float64") -> "ServingModel":
+        weights = np.load(folder / WEIGHTS_FILE, mmap_mode="r")
+        meta = json.loads((folder / META_FILE).read_text())
+        return cls(weights, meta, precision)
+
+    def _numeric(self, df: pd.DataFrame) -> np.ndarray:
+        real = pd.DataFrame(index=df.index)
+        for column in self.imputer_features:
+            values = df[column]
+            if column in ("mileage", "engine", "max_power"):
+                values = (
+                    values.astype("string")
+                    .str.extract(NUMBER_PATTERN, expand=False)
+                    .replace("", None)
+                )
+            real[column] = pd.to_numeric(values).astype("float64")
+
+        values = real.to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(values)
+        values[missing] = np.take(self.imputer_statistics, np.nonzero(missing)[1])
+
+        real = pd.DataFrame(values, columns=self.imputer_features)
+        real[["engine", "seats"]] = np.trunc(real[["engine", "seats"]])
+        year = np.trunc(real.pop("year").to_numpy())
+        real["0"], real["1"], real["2"] = year, year**2, year**3
+
+        numeric = real[self.scaler_features].to_numpy(dtype=np.float64)
+        return (numeric - self.scaler_mean) / self.scaler_scale
+
+    def _category_columns(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Final feature column of every categorical value, -1 for dropped
+        (first) and unknown categories.
+        """
+        cat = df.loc[:, ["fuel", "seller_type", "transmission", "owner"]].fillna("")
+        cat["Brand"] = df["name"].fillna("").astype(str).str.split(" ").str[0]
+
+        columns = np.empty((len(df), len(self.categories)), dtype=np.int64)
+        for i, (feature, categories) in enumerate(
+            zip(self.categorical_features, self.categories)
+        ):
+            codes = categories.get_indexer(cat[feature].astype(str))
+            columns[:, i] = np.where(
+                codes > 0, self.category_offsets[i] + codes - 1, -1
+            )
+        return columns
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        numeric = self._numeric(df)
+        category_columns = self._category_columns(df)
+
+        matrix = np.zeros((len(df), len(self.feature_names)), dtype=np.float64)
+        matrix[:, : numeric.shape[1]] = numeric
+        rows, features = np.nonzero(category_columns >= 0)
+        matrix[rows, category_columns[rows, features]] = 1.0
+        return matrix
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Score without building the one-hot block: the numeric part is a
+        dense dot product, each categorical value adds its coefficient.
+        Imputing and scaling stay in float64 (year**3 minus its mean would
+        lose about three digits in float32), predictions are returned as
+        float64 whatever the compute precision.
+        """
+        prices, _ = self._score(df, contributions=False)
+        return prices
+
+    def predict_with_contributions(
+        self, df: pd.DataFrame
+    ) -> tuple[np.ndarray, pd.DataFrame]:
+        """
+        Predict prices and the contribution of every input feature to them
+        in the same pass.
+        """
+        prices, contributions = self._score(df, contributions=True)
+        return prices, pd.DataFrame(contributions, columns=self.contribution_names)
+
+    def _score(
+        self, df: pd.DataFrame, contributions: bool
+    ) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        dtype = PRECISIONS[self.precision]
+        numeric = self._numeric(df).astype(dtype, copy=False)
+
+        category_columns = self._category_columns(df)
+        indices = np.where(
+            category_columns >= 0, category_columns - len(self.scaler_features), -1
+        )
+        category = self.category_coef[indices]
+
+        prices = numeric @ self.numeric_coef
+        prices += category.sum(axis=1, dtype=dtype)
+        prices += self.intercept_value
+        prices = prices.astype(np.float64, copy=False)
+        if not contributions:
+            return prices, None
+        parts = np.hstack([numeric @ self.numeric_contribution_weights, category])
+        return prices, parts.astype(np.float64, copy=False)
+
+
+def precision_report(folder: pathlib.Path, df: pd.DataFrame) -> dict:
+    """
+    Compare float32 scoring of an artifact against its float64 reference.
+
+    Besides the observed errors the report gives the a priori bound of the
+    float32 dot product, gamma_n * sum(|w_i * x_i|) with n terms plus the
+    roundings of the inputs, as the worst relative error over the rows.
+    """
+    reference = ServingModel.load(folder, "float64")
+    reduced = ServingModel.load(folder, "float32")
+
+    expected = reference.predict(df)
+    actual = reduced.predict(df)
+    abs_error = np.abs(actual - expected)
+    rel_error = abs_error / np.maximum(np.abs(expected), np.finfo(np.float64).tiny)
+
+    numeric_count = len(reference.scaler_features)
+    terms = np.abs(reference.transform(df) * reference.coef).sum(axis=1)
+    terms += abs(reference.intercept[0])
+    n = numeric_count + len(reference.categories) + 1 + 3
+    unit_roundoff = np.finfo(np.float32).eps / 2
+    bound = terms * (n * unit_roundoff / (1 - n * unit_roundoff))
+
+    return {
+        "rows": len(df),
+        "max_abs_error": float(abs_error.max(initial=0)),
+        "max_rel_error": float(rel_error.max(initial=0)),
+        "p99_rel_error": float(np.quantile(rel_error, 0.99)) if len(df) else 0.0,
+        "max_abs_bound": float(bound.max(initial=0)),
+        "within_bound": bool((abs_error <= bound).all()),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m serving")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="export the serving artifact")
+    export.add_argument("models", type=pathlib.Path)
+    export.add_argument("destination", type=pathlib.Path)
+    report = commands.add_parser(
+        "report", help="float32 vs float64 error report on a batch file"
+    )
+    report.add_argument("artifact", type=pathlib.Path)
+    report.add_argument("input", type=pathlib.Path)
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        import batch_io
+
+        with open(args.input, "rb") as source:
+            df = batch_io.read_batch(source, args.input.name)
+        json.dump(precision_report(args.artifact, df), sys.stdout, indent=2)
+        print()
+        return
+
+    from preprocessing import CarPricePredictorPreprocessor
+
+    export_artifact(CarPricePredictorPreprocessor(args.models), args.destination)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS
+from scheduler import INTERACTIVE, scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    """
+    Scores a sample of live predictions with a candidate model, so a
+    retrained model can be compared on real traffic before it is promoted.
+
+    ``submit`` is called after the user has been answered and only starts
+    a task: the candidate runs on a thread of its own, never on the workers
+    of the scheduler. A sample is skipped while interactive predictions are
+    queued there, checked again between preprocessing and the regressor of
+    a CarPricePredictorPreprocessor candidate. A ``sample_rate`` share of predictions is scored, at
+    most ``max_pending`` at a time, the rest are dropped. Price differences
+    (candidate minus primary), relative differences and candidate latency go
+    to the bounded timing windows of METRICS as ``shadow.*``.
+    """
+
+    def __init__(self, sample_rate: float = 0.1, max_pending: int = 100):
+        self.candidate: Optional[Any] = None
+        self.configure(None, sample_rate=sample_rate, max_pending=max_pending)
+        self._tasks: set[asyncio.Task] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def configure(
+        self, candidate: Optional[Any], *, sample_rate: float, max_pending: int
+    ) -> None:
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be in [0, 1]")
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+
+    @property
+    def enabled(self) -> bool:
+        return self.candidate is not None and self.sample_rate > 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, df: pd.DataFrame, prices: Any) -> None:
+        """
+        Schedule scoring of rows the primary model priced, never waits.
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        if len(self._tasks) >= self.max_pending:
+            METRICS.inc("shadow.dropped")
+            return
+        task = asyncio.create_task(self._evaluate(df, np.asarray(prices, dtype=float)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _preprocess(self, df: pd.DataFrame) -> tuple[Any, float]:
+        started_at = time.perf_counter()
+        if hasattr(self.candidate, "preprocess_data"):
+            df = self.candidate.preprocess_data(df.copy())
+        return df, time.perf_counter() - started_at
+
+    def _predict(self, features: Any) -> tuple[np.ndarray, float]:
+        started_at = time.perf_counter()
+        if hasattr(self.candidate, "preprocess_data"):
+            prices = self.candidate.ridge_regressor.predict(features)
+        else:
+            prices = self.candidate.predict(features)
+        return np.asarray(prices, dtype=float), time.perf_counter() - started_at
+
+    async def _evaluate(self, df: pd.DataFrame, primary: np.ndarray) -> None:
+        if scheduler.depth(INTERACTIVE):
+            METRICS.inc("shadow.skipped")
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="shadow"
+            )
+        loop = asyncio.get_running_loop()
+        try:
+            features, preprocessing = await loop.run_in_executor(
+                self._executor, self._preprocess, df
+            )
+            # predictions queued while preprocessing get the CPU first
+            if scheduler.depth(INTERACTIVE):
+                METRICS.inc("shadow.skipped")
+                return
+            candidate, scoring = await loop.run_in_executor(
+                self._executor, self._predict, features
+            )
+        except Exception:
+            METRICS.inc("shadow.errors")
+            logger.exception("Shadow model failed")
+            return
+
+        METRICS.inc("shadow.scored", len(primary))
+        METRICS.observe("shadow.latency", preprocessing + scoring)
+        for diff, base in zip((candidate - primary).tolist(), primary.tolist()):
+            METRICS.observe("shadow.diff", diff)
+            METRICS.observe("shadow.rel_diff", abs(diff) / max(abs(base), 1.0))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._executor is not None:
+            # a candidate already running finishes on its own thread
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Candidate version and the recent differences and latency percentiles.
+        """
+        return {
+            "candidate": getattr(self.candidate, "model_version", None),
+            "scored": METRICS.snapshot()["counters"].get("shadow.scored", 0),
+            "diff": METRICS.summary("shadow.diff"),
+            "rel_diff": METRICS.summary("shadow.rel_diff"),
+            "latency": METRICS.summary("shadow.latency"),
+        }
+
+
+shadow = ShadowEvaluator()
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import sys
+from datetime import date
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+from aiogram.filters import CommandObject
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import analytics
+import database
+import handlers
+from database import DB, init_db
+
+TODAY = date(2024, 3, 20)  # a Wednesday
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "db_path", tmp_path / "rating.db")
+    monkeypatch.setattr(DB, "conn", None)
+    await init_db()
+    yield DB
+    await DB.close()
+
+
+async def rate(client_id: int, stars: int, ts: str) -> None:
+    await DB.execute("INSERT INTO rating VALUES (?, ?, ?)", (client_id, stars, ts))
+
+
+@pytest.mark.asyncio
+async def test_rollups_follow_inserts(db):
+    await rate(1, 5, "2024-03-20 10:00:00")
+    await rate(2, 3, "2024-03-20 11:00:00")
+    await rate(3, 5, "2024-03-17 09:00:00")
+
+    daily = await DB.read("SELECT * FROM rating_daily ORDER BY day, stars")
+    assert daily == [
+        ("2024-03-17", 5, 1),
+        ("2024-03-20", 3, 1),
+        ("2024-03-20", 5, 1),
+    ]
+    weekly = await DB.read("SELECT * FROM rating_weekly ORDER BY week, stars")
+    # Sunday belongs to the week starting on the Monday before it
+    assert weekly == [("2024-03-11", 5, 1), ("2024-03-18", 3, 1), ("2024-03-18", 5, 1)]
+
+
+@pytest.mark.asyncio
+async def test_existing_ratings_are_rolled_up_once(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE rating(client_id INTEGER primary key unique , rating INTEGER, ts DATETIME)"
+    )
+    connection.execute("INSERT INTO rating VALUES (1, 4, '2024-03-19 10:00:00')")
+    connection.commit()
+    connection.close()
+    monkeypatch.setattr(database, "db_path", path)
+    monkeypatch.setattr(DB, "conn", None)
+
+    try:
+        await init_db()
+        await init_db()
+        assert await DB.read("SELECT * FROM rating_daily") == [("2024-03-19", 4, 1)]
+        plan = await DB.read(
+            "EXPLAIN QUERY PLAN SELECT max(ts) FROM rating", fetch="all"
+        )
+        assert "rating_ts" in str(plan)
+    finally:
+        await DB.close()
+
+
+@pytest.mark.asyncio
+async def test_rating_trends(db):
+    await rate(1, 5, "2024-03-20 10:00:00")
+    await rate(2, 4, "2024-03-19 10:00:00")
+    await rate(3, 1, "2024-03-14 10:00:00")  # the period before
+    await rate(4, 1, "2024-01-01 10:00:00")  # outside both periods
+
+    trends = await analytics.rating_trends(3, today=TODAY)
+
+    assert [window.start for window in trends.daily] == [
+        "2024-03-18",
+        "2024-03-19",
+        "2024-03-20",
+    ]
+    assert trends.daily[0].count == 0 and trends.daily[0].average is None
+    assert trends.current.stars == (0, 0, 0, 1, 1)
+    assert trends.current.average == 4.5
+    assert trends.previous.count == 0
+    assert [window.start for window in trends.weekly] == ["2024-03-18"]
+
+    trends = await analytics.rating_trends(7, today=TODAY)
+    assert trends.previous.stars == (0, 0, 0, 0, 0)
+    assert trends.current.stars == (1, 0, 0, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_trends_command_is_for_admins(db, monkeypatch):
+    monkeypatch.setattr(handlers, "admin_ids", frozenset({42}))
+    message = AsyncMock()
+    message.from_user.id = 7
+    assert not await handlers.AdminFilter()(message)
+
+    message.from_user.id = 42
+    assert await handlers.AdminFilter()(message)
+    await rate(1, 5, f"{date.today()} 10:00:00")
+
+    await handlers.trends(message, CommandObject(command="trends", args="2"))
+
+    text = message.answer.call_args.args[0]
+    assert text.startswith("📈 <b>Ratings of the last 2 days</b>")
+    assert "Reviews: <b>1</b> (previous 2 days: 0)" in text
+    assert f"{date.today().isoformat()[5:]:<10}    1  5.00   0   0   0   0   1" in text
+
+    await handlers.trends(message, CommandObject(command="trends", args="week"))
+    assert message.answer.call_args.args[0].startswith("Usage: /trends [days]")
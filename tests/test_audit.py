@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+import pytest_asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database
+from audit import AuditLog
+from database import DB
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "db_path", tmp_path / "audit.db")
+    monkeypatch.setattr(DB, "conn", None)
+    await DB.connect()
+    yield DB
+    await DB.close()
+
+
+def record(audit: AuditLog, price: float) -> None:
+    audit.record(
+        "single",
+        {"name": "Toyota", "year": 2015},
+        "v1",
+        0.01,
+        price=price,
+        client_id=7,
+    )
+
+
+@pytest.mark.asyncio
+async def test_records_are_written_in_batches(db):
+    audit = AuditLog(flush_interval=60, batch_size=3)
+    record(audit, 1.0)
+    assert audit.pending == 0
+
+    await audit.start()
+    for price in range(3):
+        record(audit, price)
+    await asyncio.sleep(0.1)
+    # a full batch is written right away, the rest waits for the interval
+    assert audit.pending == 0
+    for price in range(3, 5):
+        record(audit, price)
+    await asyncio.sleep(0.1)
+    assert audit.pending == 2
+
+    await audit.stop()
+    assert audit.pending == 0
+    rows = await db.execute(
+        "SELECT kind, client_id, model_version, features, price FROM audit",
+        fetch="all",
+    )
+    assert [row[4] for row in rows] == [0, 1, 2, 3, 4]
+    assert rows[0][:3] == ("single", 7, "v1")
+    assert json.loads(rows[0][3]) == {"name": "Toyota", "year": 2015}
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_the_records(db, monkeypatch):
+    audit = AuditLog(flush_interval=60)
+    await audit.start()
+    record(audit, 1.0)
+    record(audit, 2.0)
+
+    executemany = DB.executemany
+    calls = []
+
+    async def locked_once(query, values):
+        calls.append(len(values))
+        if len(calls) == 1:
+            raise database.aiosqlite.OperationalError("database is locked")
+        await executemany(query, values)
+
+    monkeypatch.setattr(DB, "executemany", locked_once)
+    with pytest.raises(database.aiosqlite.OperationalError):
+        await audit.flush()
+    assert audit.pending == 2
+
+    record(audit, 3.0)
+    assert await audit.flush() == 3
+    await audit.stop()
+
+    rows = await db.execute("SELECT price FROM audit", fetch="all")
+    assert [price for (price,) in rows] == [1.0, 2.0, 3.0]
+    assert calls == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_drops_oldest_records(db):
+    audit = AuditLog(flush_interval=60, max_buffer=2)
+    await audit.start()
+    for price in range(4):
+        record(audit, price)
+    await audit.stop()
+
+    rows = await db.execute("SELECT price FROM audit", fetch="all")
+    assert rows == [(2,), (3,)]
+
+
+@pytest.mark.asyncio
+async def test_compact_applies_retention(db):
+    audit = AuditLog(retention_days=30, max_rows=3)
+    await audit.start()
+    await audit.stop()
+    await db.executemany(
+        "INSERT INTO audit (ts, kind, price) VALUES (?, 'single', ?)",
+        [("2000-01-01 00:00:00", 0)] + [("2999-01-01 00:00:00", i) for i in range(5)],
+    )
+
+    assert await audit.compact() == 3
+    rows = await db.execute("SELECT price FROM audit", fetch="all")
+    assert rows == [(2,), (3,), (4,)]
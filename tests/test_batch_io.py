@@ -0,0 +1,156 @@
+import gzip
+import io
+import os
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+import zstandard
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import batch_io
+import handlers
+
+
+CSV = (
+    b"name,year,km_driven,fuel,seller_type,transmission,owner,mileage,engine,max_power,torque,seats\n"
+    b"Maruti Swift Dzire VDI,2014,145500,Diesel,Individual,Manual,First Owner,23.4 kmpl,1248 CC,74 bhp,190Nm@ 2000rpm,5.0\n"
+    b"Skoda Rapid 1.5 TDI Ambition,,120000,Diesel,Individual,Manual,Second Owner,21.14 kmpl,1498 CC,103.52 bhp,,5.0\n"
+)
+
+
+def test_read_csv_applies_schema():
+    df = batch_io.read_batch(io.BytesIO(CSV), "cars.csv")
+    assert len(df) == 2
+    assert str(df["year"].dtype) == "Int64"
+    assert df["year"].isna().tolist() == [False, True]
+    assert df["mileage"].tolist() == ["23.4 kmpl", "21.14 kmpl"]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [gzip.compress(CSV), zstandard.ZstdCompressor().compress(CSV)],
+    ids=["gzip", "zstd"],
+)
+def test_read_compressed_csv(data):
+    df = batch_io.read_batch(io.BytesIO(data), "cars.bin")
+    assert df["name"].tolist()[0] == "Maruti Swift Dzire VDI"
+
+
+def test_read_parquet():
+    source = pd.read_csv(io.BytesIO(CSV))
+    buffer = io.BytesIO()
+    source.to_parquet(buffer)
+    buffer.seek(0)
+
+    df = batch_io.read_batch(buffer)
+    assert str(df["km_driven"].dtype) == "Int64"
+    assert df["engine"].tolist() == ["1248 CC", "1498 CC"]
+
+
+def test_read_rejects_missing_columns():
+    with pytest.raises(ValueError, match="Missing columns: .*year"):
+        batch_io.read_batch(io.BytesIO(b"name,fuel\nAudi,Diesel\n"))
+
+
+@pytest.mark.parametrize(
+    "data, filename",
+    [
+        (gzip.compress(CSV)[:40], "cars.csv.gz"),
+        (zstandard.ZstdCompressor().compress(CSV)[:-10] + b"junk", "cars.csv.zst"),
+        (b"PAR1 not really parquet", "cars.parquet"),
+    ],
+    ids=["gzip", "zstd", "parquet"],
+)
+def test_read_rejects_corrupt_files(data, filename):
+    with pytest.raises(ValueError, match="damaged or not in a supported format"):
+        batch_io.read_batch(io.BytesIO(data), filename)
+
+
+def test_torque_column_is_optional():
+    df = batch_io.read_batch(io.BytesIO(CSV)).drop(columns="torque")
+    batch_io.check_columns(df)
+    result = io.BytesIO()
+    writer = batch_io.BatchWriter(result, "csv")
+
+    assert handlers.score_next_chunk(iter([df]), writer)
+    writer.close()
+
+    assert pd.read_csv(io.BytesIO(result.getvalue()))["predicted_price"].notna().all()
+
+
+def test_parse_output_format():
+    assert batch_io.parse_output_format(None) == "csv"
+    assert batch_io.parse_output_format(" Parquet ") == "parquet"
+    assert batch_io.parse_output_format(".csv.gz") == "csv.gz"
+    assert batch_io.parse_output_format("xlsx") == "csv"
+    assert batch_io.parse_output_format("explain parquet") == "parquet"
+
+
+def test_parse_explain():
+    assert not batch_io.parse_explain(None)
+    assert not batch_io.parse_explain("parquet")
+    assert batch_io.parse_explain("csv.gz Explain")
+
+
+@pytest.mark.parametrize("output_format", ["csv", "csv.gz", "parquet"])
+def test_write_round_trip(output_format):
+    df = batch_io.read_batch(io.BytesIO(CSV)).assign(predicted_price=[1.5, 2.5])
+    buffer = io.BytesIO()
+    writer = batch_io.BatchWriter(buffer, output_format)
+    writer.write(df)
+    writer.close()
+
+    assert writer.filename == batch_io.OUTPUT_FORMATS[output_format]
+    restored = batch_io.read_batch(io.BytesIO(buffer.getvalue()), writer.filename)
+    assert restored["predicted_price"].tolist() == [1.5, 2.5]
+    assert "input_data" not in restored.columns
+
+
+def test_iter_batch_streams_parquet_in_chunks():
+    source = pd.read_csv(io.BytesIO(CSV))
+    buffer = io.BytesIO()
+    pd.concat([source] * 5, ignore_index=True).to_parquet(buffer)
+    buffer.seek(0)
+
+    chunks = list(batch_io.iter_batch(buffer, chunk_rows=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+
+
+def test_iter_batch_enforces_max_rows():
+    with pytest.raises(batch_io.BatchLimitError):
+        list(batch_io.iter_batch(io.BytesIO(CSV), max_rows=1))
+
+
+@pytest.mark.parametrize("output_format", ["csv", "csv.gz", "parquet"])
+def test_batch_writer_appends_chunks_to_spilled_file(output_format):
+    df = batch_io.read_batch(io.BytesIO(CSV)).assign(predicted_price=[1.5, 2.5])
+
+    with tempfile.SpooledTemporaryFile(max_size=16) as destination:
+        writer = batch_io.BatchWriter(destination, output_format)
+        writer.write(df.iloc[:1])
+        writer.write(df.iloc[1:])
+        writer.close()
+
+        assert destination._rolled
+        destination.seek(0)
+        restored = batch_io.read_batch(destination, writer.filename)
+
+    assert writer.rows == 2
+    assert restored["name"].tolist() == df["name"].tolist()
+
+
+def test_batch_writer_abort_after_close_keeps_the_result():
+    df = batch_io.read_batch(io.BytesIO(CSV)).assign(predicted_price=[1.5, 2.5])
+    buffer = io.BytesIO()
+    writer = batch_io.BatchWriter(buffer, "csv.gz")
+    writer.write(df)
+    writer.close()
+    size = len(buffer.getvalue())
+
+    writer.abort()
+
+    assert len(buffer.getvalue()) == size
+    assert len(batch_io.read_batch(io.BytesIO(buffer.getvalue()), "r.csv.gz")) == 2
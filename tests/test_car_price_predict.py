@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import car_price_predict
+
+
+HEADER = "name,year,km_driven,fuel,seller_type,transmission,owner,mileage,engine,max_power,torque,seats\n"
+ROWS = (
+    "Maruti Swift Dzire VDI,2014,145500,Diesel,Individual,Manual,First Owner,23.4 kmpl,1248 CC,74 bhp,190Nm@ 2000rpm,5.0\n"
+    "Skoda Rapid 1.5 TDI Ambition,2014,120000,Diesel,Individual,Manual,Second Owner,21.14 kmpl,1498 CC,103.52 bhp,250Nm@ 1500-2500rpm,5.0\n"
+    "Hyundai i20 Sportz Diesel,2010,127000,Diesel,Individual,Manual,First Owner,23.0 kmpl,1396 CC,90 bhp,22.4 kgm at 1750-2750rpm,5.0\n"
+)
+
+
+@pytest.mark.parametrize(
+    "filename, output_format",
+    [("out.csv", "csv"), ("out.csv.gz", "csv.gz"), ("out.parquet", "parquet")],
+)
+def test_output_format_for(tmp_path, filename, output_format):
+    assert car_price_predict.output_format_for(tmp_path / filename) == output_format
+
+
+def test_run_keeps_input_order(tmp_path):
+    source = tmp_path / "cars.csv"
+    source.write_text(HEADER + ROWS * 5)
+    output = tmp_path / "prices.parquet"
+
+    args = car_price_predict.parse_args(
+        [str(source), str(output), "--workers", "2", "--chunk-size", "2"]
+    )
+    assert car_price_predict.run(args) == 15
+
+    result = pd.read_parquet(output)
+    expected = car_price_predict._preprocessor.predict(pd.read_csv(source))
+    assert result["name"].tolist() == pd.read_csv(source)["name"].tolist()
+    assert result["predicted_price"].tolist() == pytest.approx(expected.tolist())
+
+
+def test_main_reports_bad_input_in_one_line(tmp_path):
+    source = tmp_path / "cars.csv"
+    source.write_text("name,year\nAudi,2014\n")
+
+    with pytest.raises(SystemExit) as exit_info:
+        car_price_predict.main([str(source), str(tmp_path / "prices.csv")])
+
+    # sys.exit with a message prints it to stderr and exits with status 1
+    message = exit_info.value.code
+    assert message.startswith(f"{source}: Missing columns: km_driven")
+    assert "\n" not in message
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import circuit as circuit_module
+import handlers
+from circuit import CircuitBreaker, CircuitOpenError, RecentPrices
+from metrics import METRICS
+from scheduler import scheduler
+
+ITEM = handlers.Item(
+    name="Toyota Innova",
+    year=2015,
+    km_driven=60000,
+    fuel="Diesel",
+    seller_type="Individual",
+    transmission="Manual",
+    owner="First Owner",
+    mileage="17.5",
+    engine="1248",
+    max_power="74",
+    seats=5,
+).model_dump()
+
+
+def fail():
+    raise RuntimeError("boom")
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_on_failures_and_probes(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(circuit_module.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, open_duration=10)
+
+    try:
+        assert await breaker.run(int, "1") == 1
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await breaker.run(fail)
+        assert breaker.state == circuit_module.OPEN
+        assert METRICS.snapshot()["gauges"]["circuit.state"] == 2
+
+        with pytest.raises(CircuitOpenError):
+            await breaker.run(int, "1")
+
+        # after open_duration one probe decides
+        now[0] = 11
+        with pytest.raises(RuntimeError):
+            await breaker.run(fail)
+        assert breaker.state == circuit_module.OPEN
+
+        now[0] = 22
+        assert await breaker.run(int, "2") == 2
+        assert breaker.state == circuit_module.CLOSED
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_timeout_bounds_the_wait_and_skips_queued_jobs():
+    breaker = CircuitBreaker(timeout=0.05, min_calls=1, window=1)
+    ran = []
+
+    try:
+        started_at = time.monotonic()
+        slow = asyncio.create_task(breaker.run(time.sleep, 0.2))
+        queued = asyncio.create_task(breaker.run(ran.append, 1))
+        results = await asyncio.gather(slow, queued, return_exceptions=True)
+        assert time.monotonic() - started_at < 0.15
+        assert all(isinstance(result, TimeoutError) for result in results)
+        assert breaker.state == circuit_module.OPEN
+        await asyncio.sleep(0.2)
+    finally:
+        await scheduler.stop()
+    assert ran == []
+
+
+def test_nearest_recent_price():
+    prices = RecentPrices(max_size=2)
+    assert prices.nearest(ITEM) is None
+
+    prices.add({**ITEM, "year": 2014}, 600000.0)
+    prices.add({**ITEM, "fuel": "Petrol"}, 500000.0)
+    prices.add({**ITEM, "km_driven": 70000}, 700000.0)
+
+    # the oldest entry was evicted, petrol cars are not similar
+    assert prices.nearest(ITEM) == ({**ITEM, "km_driven": 70000}, 700000.0)
+    assert prices.nearest({**ITEM, "year": 2010}) is None
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_answers_with_nearest_price(monkeypatch):
+    breaker = CircuitBreaker()
+    breaker._set_state(circuit_module.OPEN)
+    monkeypatch.setattr(handlers, "circuit", breaker)
+    monkeypatch.setattr(handlers, "recent_prices", RecentPrices())
+    handlers.recent_prices.add({**ITEM, "km_driven": 50000}, 700000.0)
+    message = AsyncMock()
+
+    await handlers.send_prediction(message, ITEM, AsyncMock())
+
+    (call,) = message.answer.call_args_list
+    assert call.args[0].endswith(
+        "A similar car (2015, 50000 km, first owner) was recently priced at "
+        "<b>700 000.0</b> RUB."
+    )
+
+
+@pytest.mark.asyncio
+async def test_prediction_error_is_not_shown_to_the_user(monkeypatch):
+    def broken(item):
+        raise ValueError("could not convert string to float: 'secret'")
+
+    monkeypatch.setattr(handlers, "predict_price_explained", broken)
+    monkeypatch.setattr(handlers, "circuit", CircuitBreaker())
+    message = AsyncMock()
+
+    try:
+        await handlers.send_prediction(message, ITEM, AsyncMock())
+    finally:
+        await scheduler.stop()
+
+    texts = [call.args[0] for call in message.answer.call_args_list]
+    assert texts == [
+        "Could not predict the price of this car 😔",
+        "Consider restart bot using /start command",
+    ]
@@ -24,6 +24,18 @@ async def test_db_connect():
     assert DB.is_connected
 
 
+@pytest.mark.asyncio
+async def test_reconnect_closes_previous_connection():
+    previous = AsyncMock()
+    DB.conn = previous
+
+    await DB.connect()
+
+    previous.close.assert_awaited_once()
+    assert DB.conn is not previous
+    await DB.close()
+
+
 @pytest.mark.asyncio
 async def test_execute_without_fetch(db):
     query = "INSERT INTO rating VALUES (?, ?, ?)"
@@ -0,0 +1,54 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import batch_io
+import explain
+import handlers
+from health import WARM_UP_CSV
+
+
+def test_group_matrix_groups_year_terms_and_categories():
+    labels, matrix = explain.group_matrix(
+        ["km_driven", "0", "1", "2", "fuel_Diesel", "fuel_LPG", "Brand_BMW"],
+        ["fuel", "Brand"],
+    )
+
+    assert labels == ["km driven", "year", "fuel", "brand"]
+    np.testing.assert_array_equal(matrix.sum(axis=0), [1, 3, 2, 1])
+    np.testing.assert_array_equal(matrix.sum(axis=1), np.ones(7))
+
+
+def test_top_contributions_by_magnitude():
+    contributions = pd.DataFrame(
+        [[1000.0, -250000.0, 120000.4], [5.0, 0.0, -7.0]],
+        columns=["year", "brand", "fuel"],
+    )
+
+    top = explain.top_contributions(contributions, k=2)
+
+    assert top == [
+        [("brand", -250000.0), ("fuel", 120000.4)],
+        [("fuel", -7.0), ("year", 5.0)],
+    ]
+    assert explain.describe(top[0]) == "brand -250 000; fuel +120 000"
+
+
+def test_batch_explanations_column():
+    chunks = batch_io.iter_batch(io.BytesIO(WARM_UP_CSV))
+    result = io.BytesIO()
+    writer = batch_io.BatchWriter(result, "csv")
+
+    assert handlers.score_next_chunk(chunks, writer, True)
+    writer.close()
+
+    df = pd.read_csv(io.BytesIO(result.getvalue()))
+    assert (
+        df["top_features"][0] == "fuel +142 495; max power -81 518; seller type -59 598"
+    )
+    assert df["predicted_price"].notna().all()
@@ -0,0 +1,95 @@
+import gzip
+import io
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pandas as pd
+import pytest
+import pytest_asyncio
+from aiogram.filters import CommandObject
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database
+import handlers
+from database import DB, init_db
+from export import TableExport
+from history import PredictionHistory
+from scheduler import scheduler
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "db_path", tmp_path / "rating.db")
+    monkeypatch.setattr(DB, "conn", None)
+    await init_db()
+    await DB.executemany(
+        "INSERT INTO rating VALUES (?, ?, ?)",
+        [(i, i % 5 + 1, f"2024-03-20 10:00:{i:02}") for i in range(7)],
+    )
+    yield DB
+    await DB.close()
+    await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_stream_fetches_pages(db):
+    pages = [len(rows) async for rows in DB.stream("SELECT * FROM rating", page_size=3)]
+    assert pages == [3, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_export_csv_while_ratings_are_written(db):
+    destination = io.BytesIO()
+    export = TableExport(page_size=2)
+
+    async for rows in DB.stream("SELECT * FROM rating", page_size=2):
+        # the read snapshot does not block the writer
+        await DB.execute("INSERT INTO rating VALUES (100, 5, '2024-03-21 10:00:00')")
+        break
+    rows = await export.export("rating", destination, "csv.gz")
+
+    df = pd.read_csv(io.BytesIO(gzip.decompress(destination.getvalue())))
+    assert rows == len(df) == 8
+    assert list(df.columns) == ["client_id", "rating", "ts"]
+    assert df["rating"].tolist()[:3] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_export_parquet_keeps_types(db):
+    history = PredictionHistory()
+    await history.add(1, {"name": "Toyota"}, 500000.0)
+    destination = io.BytesIO()
+
+    assert await TableExport().tables() == ["rating", "history"]
+    assert await TableExport().export("history", destination, "parquet") == 1
+
+    df = pd.read_parquet(io.BytesIO(destination.getvalue()))
+    assert df["features"].tolist() == ['{"name":"Toyota"}']
+    assert df["price"].tolist() == [500000.0]
+
+
+@pytest.mark.asyncio
+async def test_export_command(db, tmp_path, monkeypatch):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    monkeypatch.setattr(handlers.batch_io.limits, "tmp_dir", str(exports))
+    message = AsyncMock()
+
+    await handlers.export_tables(
+        message, CommandObject(command="export", args="ratings")
+    )
+    assert message.answer.call_args.args[0] == (
+        "Usage: /export [rating history] [csv.gz|parquet]"
+    )
+
+    await handlers.export_tables(
+        message, CommandObject(command="export", args="parquet")
+    )
+    rating, history = message.answer_document.call_args_list
+    assert rating.args[0].filename == "rating.parquet"
+    assert rating.kwargs["caption"] == "rating: 7 rows"
+    assert history.kwargs["caption"] == "history: 0 rows"
+    # the files are removed after the upload
+    assert list(exports.iterdir()) == []
@@ -376,6 +376,7 @@ async def test_batch_prediction_1():
     )
 
     bot.download.return_value = BytesIO(buffer)
+    message.document.file_size = len(buffer)
     mock_preprocessor = MagicMock()
     mock_preprocessor.preprocess_data.return_value = "mock_df"
     mock_preprocessor.ridge_regressor.predict.return_value = [1]
@@ -385,7 +386,8 @@ async def test_batch_prediction_1():
     ):
         await handlers.batch_prediction_1(message, state, bot)
 
-    bot.download.assert_called_once_with(message.document)
+    bot.download.assert_called_once()
+    assert bot.download.call_args[0][0] == message.document
 
     call_args = message.reply_document.call_args
     output_file_object = call_args[0][0]
@@ -393,6 +395,119 @@ async def test_batch_prediction_1():
     assert output_file_object.filename == "result.csv"
 
 
+@pytest.mark.asyncio
+async def test_batch_prediction_1_parquet_output():
+    bot = AsyncMock()
+    message = AsyncMock()
+    state = AsyncMock()
+
+    buffer = (
+        b"name,year,km_driven,fuel,seller_type,transmission,owner,mileage,engine,max_power,torque,seats\n"
+        b"Maruti Swift Dzire VDI,2014,145500,Diesel,Individual,Manual,First Owner,23.4 kmpl,1248 CC,74 bhp,190Nm@ 2000rpm,5.0\n"
+    )
+
+    bot.download.return_value = BytesIO(buffer)
+    message.document.file_size = len(buffer)
+    message.caption = "parquet"
+
+    await handlers.batch_prediction_1(message, state, bot)
+
+    output_file_object = message.reply_document.call_args[0][0]
+    assert output_file_object.filename == "result.parquet"
+
+
+@pytest.mark.asyncio
+async def test_batch_prediction_1_unreadable_file():
+    bot = AsyncMock()
+    message = AsyncMock()
+    state = AsyncMock()
+
+    bot.download.return_value = BytesIO(b"name,fuel\nAudi,Diesel\n")
+    message.document.file_size = 20
+
+    await handlers.batch_prediction_1(message, state, bot)
+
+    assert message.answer.call_args[0][0].startswith("Could not read the file")
+    message.reply_document.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_batch_prediction_1_row_limit_releases_writer():
+    bot = AsyncMock()
+    message = AsyncMock()
+    state = AsyncMock()
+    writers = []
+
+    class RecordingWriter(handlers.batch_io.BatchWriter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            writers.append(self)
+
+    buffer = (
+        b"name,year,km_driven,fuel,seller_type,transmission,owner,mileage,engine,max_power,torque,seats\n"
+        b"Maruti Swift Dzire VDI,2014,145500,Diesel,Individual,Manual,First Owner,23.4 kmpl,1248 CC,74 bhp,190Nm@ 2000rpm,5.0\n"
+        b"Skoda Rapid 1.5 TDI Ambition,2014,120000,Diesel,Individual,Manual,Second Owner,21.14 kmpl,1498 CC,103.52 bhp,250Nm@ 1500-2500rpm,5.0\n"
+    )
+    bot.download.return_value = BytesIO(buffer)
+    message.document.file_size = len(buffer)
+    message.caption = "parquet"
+
+    with patch.object(handlers.batch_io, "BatchWriter", RecordingWriter), patch.object(
+        handlers.batch_io.limits, "max_rows", 1
+    ), patch.object(handlers.scheduler, "chunk_size", 1):
+        await handlers.batch_prediction_1(message, state, bot)
+
+    assert "more than 1 rows" in message.answer.call_args[0][0]
+    message.reply_document.assert_not_called()
+    # the first chunk had opened the Parquet writer, it is closed again
+    (writer,) = writers
+    assert writer.rows == 1
+    assert not writer._parquet.is_open
+
+
+@pytest.mark.asyncio
+async def test_batch_prediction_1_too_large():
+    bot = AsyncMock()
+    message = AsyncMock()
+    state = AsyncMock()
+
+    message.document.file_size = handlers.batch_io.limits.max_file_size + 1
+
+    await handlers.batch_prediction_1(message, state, bot)
+
+    assert message.answer.call_args[0][0].startswith("The file is too large")
+    bot.download.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_batch_prediction_1_cached(tmp_path):
+    bot = AsyncMock()
+    message = AsyncMock()
+    state = AsyncMock()
+
+    buffer = (
+        b"name,year,km_driven,fuel,seller_type,transmission,owner,mileage,engine,max_power,torque,seats\n"
+        b"Maruti Swift Dzire VDI,2014,145500,Diesel,Individual,Manual,First Owner,23.4 kmpl,1248 CC,74 bhp,190Nm@ 2000rpm,5.0\n"
+    )
+    message.document.file_size = len(buffer)
+    message.document.file_unique_id = "unique-id"
+
+    with patch.object(handlers.result_cache, "directory", tmp_path), patch.object(
+        handlers.result_cache, "max_bytes", 1024 * 1024
+    ):
+        bot.download.return_value = BytesIO(buffer)
+        await handlers.batch_prediction_1(message, state, bot)
+        assert len(list(tmp_path.iterdir())) == 1
+
+        bot.download.return_value = BytesIO(buffer)
+        with patch("handlers.score_next_chunk") as score_next_chunk:
+            await handlers.batch_prediction_1(message, state, bot)
+        score_next_chunk.assert_not_called()
+
+    output_file_object = message.reply_document.call_args[0][0]
+    assert output_file_object.filename == "result.csv"
+
+
 class MockDB(AsyncMock):
     ids = []
 
@@ -0,0 +1,77 @@
+import json
+import os
+import socket
+import sys
+
+import aiohttp
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import handlers
+from health import HealthProbe, WarmUpError, warm_up
+from scheduler import scheduler
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_reports_timings():
+    try:
+        timings = await warm_up(batch_rows=10)
+    finally:
+        await scheduler.stop()
+
+    assert set(timings) == {"single", "batch", "total"}
+    assert all(duration > 0 for duration in timings.values())
+
+
+class BrokenModel:
+    def predict(self, df):
+        return np.full(len(df), np.nan)
+
+
+@pytest.mark.asyncio
+async def test_warm_up_rejects_insane_predictions(monkeypatch):
+    monkeypatch.setattr(handlers, "preprocessor", BrokenModel())
+    try:
+        with pytest.raises(WarmUpError, match="out of range"):
+            await warm_up(batch_rows=10)
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_readiness_endpoint_and_file(tmp_path):
+    probe = HealthProbe()
+    port = free_port()
+    ready_file = tmp_path / "ready.json"
+    probe.configure("127.0.0.1", port, str(ready_file))
+    await probe.start()
+
+    url = f"http://127.0.0.1:{port}"
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{url}/health") as response:
+                assert response.status == 200
+            async with session.get(f"{url}/ready") as response:
+                assert response.status == 503
+            assert not ready_file.exists()
+
+            probe.set_ready({"single": 0.1, "batch": 0.2, "total": 0.3})
+            async with session.get(f"{url}/ready") as response:
+                assert response.status == 200
+                assert (await response.json())["warm_up"]["batch"] == 0.2
+            assert json.loads(ready_file.read_text())["ready"]
+
+            async with session.get(f"{url}/metrics") as response:
+                assert (await response.json())["gauges"]["warm_up.total"] == 0.3
+    finally:
+        await probe.stop()
+
+    assert not ready_file.exists()
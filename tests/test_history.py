@@ -0,0 +1,112 @@
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database
+import handlers
+from database import DB, init_db
+from history import NEWER, PredictionHistory
+
+CAR = {
+    "name": "Toyota Innova",
+    "year": 2015,
+    "km_driven": 60000,
+    "fuel": "Diesel",
+    "transmission": "Manual",
+}
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "db_path", tmp_path / "history.db")
+    monkeypatch.setattr(DB, "conn", None)
+    await init_db()
+    yield DB
+    await DB.close()
+
+
+@pytest_asyncio.fixture
+async def history(db, monkeypatch):
+    history = PredictionHistory(max_entries=5, page_size=2)
+    monkeypatch.setattr(handlers, "history", history)
+    return history
+
+
+@pytest.mark.asyncio
+async def test_history_keeps_newest_entries_per_user(history):
+    for price in range(7):
+        await history.add(1, CAR, float(price))
+    await history.add(2, CAR, 100.0)
+
+    rows = await DB.read("SELECT client_id, price FROM history ORDER BY rowid")
+    assert rows == [(1, 2.0), (1, 3.0), (1, 4.0), (1, 5.0), (1, 6.0), (2, 100.0)]
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages(history):
+    for price in range(5):
+        await history.add(1, CAR, float(price))
+
+    first, more = await history.page(1)
+    assert [entry.price for entry in first] == [4.0, 3.0] and more
+    second, more = await history.page(1, first[-1].cursor)
+    assert [entry.price for entry in second] == [2.0, 1.0] and more
+    last, more = await history.page(1, second[-1].cursor)
+    assert [entry.price for entry in last] == [0.0] and not more
+
+    back, more = await history.page(1, last[0].cursor, NEWER)
+    assert back == second and more
+    assert last[0].features == CAR
+
+
+@pytest.mark.asyncio
+async def test_pages_are_read_from_the_pool(history, monkeypatch):
+    await history.add(1, CAR, 1.0)
+    assert len(DB._readers) == DB.read_connections
+    # the writer connection is not used for reading
+    monkeypatch.setattr(DB, "execute", None)
+
+    entries, more = await history.page(1)
+    assert len(entries) == 1 and not more
+
+
+@pytest.mark.asyncio
+async def test_history_menu_pages_through_predictions(history):
+    for price in range(3):
+        await history.add(1, CAR, 100000.0 * (price + 1))
+    message = AsyncMock()
+    message.chat.id = 1
+
+    await handlers.my_predictions(message)
+
+    text = message.answer.call_args.args[0]
+    assert text.count("Toyota Innova 2015, 60000 km, Diesel, Manual") == 2
+    assert "<b>300 000.0</b> RUB" in text
+    keyboard = message.answer.call_args.kwargs["reply_markup"]
+    (older,) = keyboard.inline_keyboard[0]
+    assert older.text == "Older ▶"
+
+    callback = AsyncMock()
+    callback.data = older.callback_data
+    callback.message.chat.id = 1
+    await handlers.history_page(callback)
+
+    text = callback.message.edit_text.call_args.args[0]
+    assert "<b>100 000.0</b> RUB" in text and "200 000.0" not in text
+    keyboard = callback.message.edit_text.call_args.kwargs["reply_markup"]
+    assert [button.text for button in keyboard.inline_keyboard[0]] == ["◀ Newer"]
+
+
+@pytest.mark.asyncio
+async def test_empty_history(history):
+    message = AsyncMock()
+    message.chat.id = 1
+
+    await handlers.my_predictions(message)
+
+    assert message.answer.call_args.args[0].startswith("You have no predictions yet")
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import Message
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import handlers
+import price_cache as price_cache_module
+from middlewares import Debouncer, debouncer
+from price_cache import PriceCache, price_cache
+from scheduler import scheduler
+
+SPEC = "Toyota 2015 60000 Diesel Individual Manual First Owner 17.5 1248 74 5"
+
+
+def make_query(text: str) -> AsyncMock:
+    inline_query = AsyncMock()
+    inline_query.query = text
+    inline_query.from_user.id = 1
+    return inline_query
+
+
+def test_price_cache_expires_and_evicts(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(price_cache_module.time, "monotonic", lambda: now[0])
+    cache = PriceCache(ttl=10, max_size=2)
+
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    assert cache.get("a") == 1.0
+    cache.put("c", 3.0)
+    # "b" was used least recently
+    assert cache.get("b") is None
+    assert cache.get("a") == 1.0
+
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_debouncer_lets_the_latest_event_through():
+    debounce = Debouncer(delay=0.05)
+
+    first = asyncio.create_task(debounce.settle(1))
+    await asyncio.sleep(0.01)
+    results = await asyncio.gather(first, debounce.settle(1), debounce.settle(2))
+
+    assert results == [False, True, True]
+
+
+@pytest.mark.asyncio
+async def test_inline_query_predicts_once_per_spec(monkeypatch):
+    monkeypatch.setattr(debouncer, "delay", 0)
+    price_cache.configure(ttl=60, max_size=10)
+
+    try:
+        inline_query = make_query(SPEC)
+        await handlers.inline_price(inline_query)
+    finally:
+        await scheduler.stop()
+
+    (article,) = inline_query.answer.call_args.args[0]
+    assert article.title == "705 899.16 RUB"
+    assert inline_query.answer.call_args.kwargs["cache_time"] == 60
+
+    # the same spec typed differently is answered from the cache
+    monkeypatch.setattr(handlers, "predict_price", None)
+    inline_query = make_query(SPEC.lower().replace("17.5", "17,5"))
+    await handlers.inline_price(inline_query)
+    (article,) = inline_query.answer.call_args.args[0]
+    assert article.title == "705 899.16 RUB"
+
+
+@pytest.mark.asyncio
+async def test_partial_inline_query_is_not_predicted(monkeypatch):
+    monkeypatch.setattr(debouncer, "delay", 0)
+    monkeypatch.setattr(handlers, "predict_price", None)
+    inline_query = make_query("Toyota 2015 600")
+
+    await handlers.inline_price(inline_query)
+
+    assert inline_query.answer.call_args.args[0] == []
+    button = inline_query.answer.call_args.kwargs["button"]
+    assert button.text == "Keep typing: fuel is missing"
+
+
+@pytest.mark.asyncio
+async def test_inline_button_opens_the_quick_entry_help():
+    message = AsyncMock(spec=Message)
+    message.text = "/start quick"
+    message.answer = AsyncMock()
+    state = AsyncMock()
+
+    # the filter chain of router.message, as in test_menu
+    for handler in handlers.router.message.handlers:
+        passed, data = await handler.check(message, raw_state=None, state=state)
+        if passed:
+            await handler.call(message, **data)
+            break
+
+    assert message.answer.call_args.args[0] == handlers.QUICK_ENTRY_HELP
+    assert (
+        message.answer.call_args.kwargs["reply_markup"] is handlers.MAIN_MENU_KEYBOARD
+    )
+    state.clear.assert_awaited_once()
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database import DB
+from lifecycle import Lifecycle, restore_fsm, save_fsm
+
+
+@pytest.mark.asyncio
+async def test_fsm_snapshot_round_trip(tmp_path):
+    key = StorageKey(bot_id=1, chat_id=2, user_id=3)
+    storage = MemoryStorage()
+    await storage.set_state(key, "EntryCar:year")
+    await storage.set_data(key, {"name": "Toyota"})
+    await storage.get_state(StorageKey(bot_id=1, chat_id=5, user_id=5))
+
+    path = tmp_path / "fsm.json"
+    assert save_fsm(storage, path) == 1
+
+    restored = MemoryStorage()
+    assert restore_fsm(restored, path) == 1
+    assert await restored.get_state(key) == "EntryCar:year"
+    assert await restored.get_data(key) == {"name": "Toyota"}
+    assert not path.exists()
+
+
+@pytest.mark.asyncio
+async def test_shutdown_drains_in_flight_updates_and_flushes(monkeypatch, tmp_path):
+    monkeypatch.setattr(DB, "conn", None)
+    lifecycle = Lifecycle(drain_timeout=5)
+    lifecycle.configure(drain_timeout=5, fsm_snapshot=str(tmp_path / "fsm.json"))
+    lifecycle.last_update_id = 41
+    flushed = AsyncMock()
+    lifecycle.on_flush(flushed)
+
+    dp = Dispatcher(storage=MemoryStorage())
+    finished = []
+
+    async def handle_update():
+        await asyncio.sleep(0.1)
+        finished.append(True)
+
+    dp._handle_update_tasks.add(asyncio.create_task(handle_update()))
+    bot = AsyncMock()
+
+    await lifecycle.shutdown(dp, bot)
+
+    assert finished == [True]
+    bot.get_updates.assert_awaited_once_with(offset=42, limit=1, timeout=0)
+    flushed.assert_awaited_once()
+    bot.session.close.assert_awaited_once()
+    assert (tmp_path / "fsm.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_shutdown_cancels_updates_after_deadline(monkeypatch):
+    monkeypatch.setattr(DB, "conn", None)
+    lifecycle = Lifecycle(drain_timeout=0.1)
+    dp = Dispatcher(storage=MemoryStorage())
+
+    task = asyncio.create_task(asyncio.sleep(60))
+    dp._handle_update_tasks.add(task)
+
+    await lifecycle.shutdown(dp, AsyncMock())
+
+    assert task.cancelled()
@@ -0,0 +1,29 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+)
+
+import loadtest
+
+ARGS = ["--users", "6", "--concurrency", "3", "--batch-every", "3"]
+ARGS += ["--batch-rows", "10", "--lag-interval", "0.001"]
+
+
+def test_loadtest_drives_all_flows_offline():
+    report = asyncio.run(loadtest.run(loadtest.parse_args(ARGS)))
+
+    assert report["updates"] == 4 * 14 + 2 * 3
+    assert report["handlers"]["final_correct"]["count"] == 4
+    assert report["handlers"]["send_thanks"]["count"] == 4
+    assert report["handlers"]["batch_prediction_1"]["count"] == 2
+    assert report["api_calls"]["SendDocument"] == 2
+    assert report["loop_lag"]["count"] > 0
+
+
+def test_loadtest_fails_gate(capsys):
+    assert loadtest.main(ARGS + ["--json", "--max-p99", "0"]) == 1
+    assert "update p99 exceeds" in capsys.readouterr().err
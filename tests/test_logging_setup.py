@@ -0,0 +1,88 @@
+import io
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Chat, Message, Update
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from logging_setup import log_context, setup_logging
+from middlewares import LogContextMiddleware
+
+
+@pytest.fixture
+def stream():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    stream = io.StringIO()
+    yield stream
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    for name in ("aiogram.event", "aiosqlite", "noisy"):
+        logging.getLogger(name).setLevel(logging.NOTSET)
+
+
+def records(stream: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_records_carry_context(stream):
+    listener = setup_logging(stream=stream)
+    token = log_context.set({"update_id": 7, "handler": "final_correct"})
+    try:
+        logging.getLogger("handlers").info("price %s", 42, extra={"chat_id": 1})
+    finally:
+        log_context.reset(token)
+    listener.stop()
+
+    (record,) = records(stream)
+    assert record["message"] == "price 42"
+    assert record["logger"] == "handlers"
+    assert record["update_id"] == 7
+    assert record["handler"] == "final_correct"
+    assert record["chat_id"] == 1
+
+
+def test_levels_and_debug_sampling(stream):
+    listener = setup_logging(
+        level="DEBUG", levels={"noisy": "ERROR"}, debug_sample_rate=0, stream=stream
+    )
+    logging.getLogger("app").debug("dropped by sampling")
+    logging.getLogger("app").info("kept")
+    logging.getLogger("noisy").warning("below the logger level")
+    logging.getLogger("aiosqlite").debug("default level")
+    listener.stop()
+
+    assert [record["message"] for record in records(stream)] == ["kept"]
+
+
+@pytest.mark.asyncio
+async def test_update_record_has_id_handler_and_duration(stream):
+    listener = setup_logging(stream=stream)
+    router = Router()
+
+    @router.message()
+    async def echo(message: Message):
+        logging.getLogger("handlers").info("inside")
+
+    dp = Dispatcher()
+    LogContextMiddleware().setup(dp)
+    dp.include_router(router)
+
+    message = Message(
+        message_id=1, date=datetime.now(), chat=Chat(id=1, type="private"), text="hi"
+    )
+    await dp.feed_update(Bot("42:TEST"), Update(update_id=99, message=message))
+    listener.stop()
+
+    inside, handled = records(stream)
+    assert inside["update_id"] == 99 and inside["handler"] == "echo"
+    assert handled["message"] == "Update handled"
+    assert handled["update_id"] == 99 and handled["handler"] == "echo"
+    assert handled["handled"] is True
+    assert handled["duration"] >= 0
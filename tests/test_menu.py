@@ -0,0 +1,94 @@
+import os
+import sys
+from typing import Optional
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import Message
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import handlers
+
+
+def make_message(text: str) -> AsyncMock:
+    message = AsyncMock(spec=Message)
+    message.text = text
+    message.answer = AsyncMock()
+    return message
+
+
+async def dispatch(message: Message, raw_state: Optional[str]) -> None:
+    # the filter chain of router.message without middlewares of a dispatcher
+    for handler in handlers.router.message.handlers:
+        kwargs = {"raw_state": raw_state, "bot": AsyncMock()}
+        passed, data = await handler.check(message, **kwargs)
+        if passed:
+            await handler.call(message, **data)
+            return
+    raise AssertionError("unhandled")
+
+
+@pytest.mark.parametrize(
+    "text, keys",
+    [
+        ("Single item prediction 🚗", ("single item prediction", "single")),
+        ("  batch PREDICTION 🛻🚚 ", ("batch prediction", "batch")),
+        ("Info ℹ️", ("info ℹ", "info")),
+        ("/start@CarPriceBot deep-link", ("/start@carpricebot deep-link", "/start")),
+        ("🆘", ("", "")),
+    ],
+)
+def test_menu_keys(text, keys):
+    assert handlers.menu_keys(text) == keys
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "text, callback",
+    [
+        ("Single item prediction 🚗", handlers.single_item_prediction),
+        ("single item prediction", handlers.single_item_prediction),
+        ("Batch prediction 🛻🚚", handlers.batch_prediction),
+        ("Rating 📊", handlers.rating),
+        ("My predictions 🗂", handlers.my_predictions),
+        ("/history", handlers.my_predictions),
+        ("Help 🆘", handlers.help_message),
+        ("Info ℹ️", handlers.info),
+        ("/start", handlers.cmd_start),
+        ("/help@CarPriceBot", handlers.cmd_help),
+    ],
+)
+async def test_menu_filter_finds_route(text, callback):
+    result = await handlers.MenuFilter()(make_message(text))
+    assert result["handler"].callback is callback
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("text", ["batch", "single item", "2019", "hello"])
+async def test_menu_filter_ignores_other_text(text):
+    assert await handlers.MenuFilter()(make_message(text)) is False
+
+
+def test_route_flags():
+    assert handlers.menu_routes["rating"].flags == {"throttle": "stats"}
+
+
+@pytest.mark.asyncio
+async def test_menu_button_wins_over_prediction_step():
+    message = make_message("Help 🆘")
+
+    await dispatch(message, handlers.EntryCar.year.state)
+
+    assert message.answer.call_args.args[0].startswith(
+        "🤖 **Car Price Prediction Bot Help**"
+    )
+
+
+@pytest.mark.asyncio
+async def test_unknown_text_falls_through():
+    message = make_message("hello")
+
+    await dispatch(message, None)
+
+    assert message.answer.call_args.args[0].startswith("Unknown command or message")
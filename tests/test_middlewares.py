@@ -0,0 +1,97 @@
+import os
+import sys
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import CallbackQuery, Message, User
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from middlewares import ThrottleLimit, ThrottlingMiddleware, TokenBucket
+from outbox import outbox
+
+
+def make_data(user_id: int, group: str = "batch") -> dict:
+    async def callback(event):
+        pass
+
+    return {
+        "handler": HandlerObject(callback=callback, flags={"throttle": group}),
+        "event_from_user": User(id=user_id, is_bot=False, first_name="user"),
+    }
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=0.5, capacity=2, now=0.0)
+    assert bucket.consume(0.0) == 0
+    assert bucket.consume(0.0) == 0
+    assert bucket.consume(0.0) == pytest.approx(2.0)
+    assert bucket.consume(1.0) == pytest.approx(1.0)
+    assert bucket.consume(2.0) == 0
+    assert not bucket.is_full(2.0)
+    assert bucket.is_full(6.0)
+
+
+@pytest.mark.asyncio
+async def test_throttles_per_user_and_replies_once():
+    middleware = ThrottlingMiddleware({"batch": ThrottleLimit(rate=0.001, burst=2)})
+    handler = AsyncMock()
+    message = AsyncMock(spec=Message)
+    message.answer = AsyncMock()
+
+    for _ in range(4):
+        await middleware(handler, message, make_data(1))
+    await middleware(handler, message, make_data(2))
+
+    assert handler.await_count == 3
+    message.answer.assert_awaited_once()
+    assert message.answer.call_args[0][0].startswith("Too many requests")
+
+
+@pytest.mark.asyncio
+async def test_throttled_message_replies_go_through_the_outbox():
+    middleware = ThrottlingMiddleware({"batch": ThrottleLimit(rate=0.001, burst=1)})
+    message = AsyncMock(spec=Message)
+
+    with patch.object(outbox, "answer", AsyncMock()) as answer:
+        for _ in range(2):
+            await middleware(AsyncMock(), message, make_data(1))
+
+    answer.assert_awaited_once()
+    assert answer.call_args[0][0] is message
+    assert answer.call_args[0][1].startswith("Too many requests")
+    message.answer.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_global_limit_is_shared_and_callbacks_are_answered():
+    middleware = ThrottlingMiddleware(
+        {"rating": ThrottleLimit(rate=1, burst=5, global_rate=0.001, global_burst=2)}
+    )
+    handler = AsyncMock()
+    callback = AsyncMock(spec=CallbackQuery)
+    callback.answer = AsyncMock()
+
+    for user_id in range(1, 5):
+        await middleware(handler, callback, make_data(user_id, "rating"))
+
+    assert handler.await_count == 2
+    assert callback.answer.await_count == 2
+    assert callback.answer.call_args.kwargs["show_alert"]
+
+
+@pytest.mark.asyncio
+async def test_unflagged_handlers_and_idle_buckets():
+    middleware = ThrottlingMiddleware(
+        {"batch": ThrottleLimit(rate=1e9, burst=1)}, sweep_interval=0
+    )
+    handler = AsyncMock()
+
+    await middleware(handler, AsyncMock(spec=Message), make_data(1, "other"))
+    await middleware(handler, AsyncMock(spec=Message), make_data(1))
+    await middleware(handler, AsyncMock(spec=Message), make_data(2))
+
+    assert handler.await_count == 3
+    # the first user's bucket refilled and was swept on the next call
+    assert list(middleware._buckets) == [("batch", 2)]
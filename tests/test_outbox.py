@@ -0,0 +1,211 @@
+import asyncio
+import os
+import socket
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.types import BufferedInputFile
+from aiogram.utils.keyboard import InlineKeyboardBuilder, InlineKeyboardButton
+from aiohttp import web
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from outbox import Outbox, PooledAiohttpSession
+
+TOKEN = "42:TEST"
+
+
+class FakeTelegramAPI:
+    """
+    Local Bot API server answering sendMessage and sendDocument, with flood
+    control for the chats listed in ``flood``.
+    """
+
+    def __init__(self):
+        self.sent: list[tuple[float, dict]] = []
+        self.flood: dict[int, int] = {}
+        self.peers: set[tuple] = set()
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        self.peers.add(request.transport.get_extra_info("peername"))
+        data = dict(await request.post())
+        chat_id = int(data["chat_id"])
+        if self.flood.get(chat_id):
+            self.flood[chat_id] -= 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                },
+                status=429,
+            )
+
+        self.sent.append((asyncio.get_running_loop().time(), data))
+        return web.json_response(
+            {
+                "ok": True,
+                "result": {
+                    "message_id": len(self.sent),
+                    "date": 0,
+                    "chat": {"id": chat_id, "type": "private"},
+                    "text": data.get("text", ""),
+                },
+            }
+        )
+
+    async def send_document(self, request: web.Request) -> web.Response:
+        data = dict(await request.post())
+        # the file is a field of its own, the document refers to it
+        document = data.pop(data.pop("document").removeprefix("attach://"))
+        data["text"] = f"[{document.filename}] {document.file.read().decode()}"
+        self.sent.append((asyncio.get_running_loop().time(), data))
+        return web.json_response(
+            {
+                "ok": True,
+                "result": {
+                    "message_id": len(self.sent),
+                    "date": 0,
+                    "chat": {"id": int(data["chat_id"]), "type": "private"},
+                },
+            }
+        )
+
+    def texts(self, chat_id: int) -> list[str]:
+        return [
+            data["text"] for _, data in self.sent if int(data["chat_id"]) == chat_id
+        ]
+
+
+@pytest_asyncio.fixture
+async def api():
+    fake = FakeTelegramAPI()
+    app = web.Application()
+    app.router.add_post(f"/bot{TOKEN}/sendMessage", fake.send_message)
+    app.router.add_post(f"/bot{TOKEN}/sendDocument", fake.send_document)
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    fake.url = f"http://127.0.0.1:{port}"
+    yield fake
+    await runner.cleanup()
+
+
+@pytest_asyncio.fixture
+async def bot(api):
+    bot = Bot(TOKEN, session=PooledAiohttpSession(api_url=api.url))
+    yield bot
+    await bot.session.close()
+
+
+def make_outbox(**kwargs) -> Outbox:
+    limits = dict(
+        per_chat_rate=100.0,
+        per_chat_burst=100,
+        global_rate=1000.0,
+        global_burst=1000,
+        max_pending=1000,
+    )
+    limits.update(kwargs)
+    return Outbox(**limits)
+
+
+@pytest.mark.asyncio
+async def test_answer_without_outbox_sends_directly():
+    message = AsyncMock()
+    await Outbox().answer(message, "text", parse_mode=ParseMode.HTML)
+    message.answer.assert_awaited_once_with("text", parse_mode=ParseMode.HTML)
+
+    await Outbox().reply_document(message, "document", caption="c")
+    message.reply_document.assert_awaited_once_with("document", caption="c")
+
+
+@pytest.mark.asyncio
+async def test_documents_keep_their_place_after_queued_texts(api, bot):
+    outbox = make_outbox()
+    outbox.start(bot)
+    message = AsyncMock()
+    message.chat.id = 1
+    message.message_id = 7
+
+    await outbox.answer(message, "Scoring")
+    await outbox.answer(message, "Almost done")
+    await outbox.reply_document(
+        message, BufferedInputFile(b"a,b", filename="result.csv"), caption="2 rows"
+    )
+    # the upload has finished when reply_document returns
+    assert api.texts(1)[-1] == "[result.csv] a,b"
+    await outbox.answer(message, "Thanks")
+    await outbox.stop()
+
+    message.reply_document.assert_not_called()
+    assert api.texts(1) == ["Scoring\n\nAlmost done", "[result.csv] a,b", "Thanks"]
+    document = api.sent[1][1]
+    assert document["caption"] == "2 rows"
+    assert document["reply_to_message_id"] == "7"
+
+
+@pytest.mark.asyncio
+async def test_coalesces_queued_texts_and_reuses_connection(api, bot):
+    outbox = make_outbox()
+    outbox.start(bot)
+    message = AsyncMock()
+    message.chat.id = 1
+
+    keyboard = InlineKeyboardBuilder()
+    keyboard.add(InlineKeyboardButton(text="⭐️", callback_data="1"))
+
+    await outbox.answer(message, "Predicted <b>1 000</b>", parse_mode=ParseMode.HTML)
+    await outbox.answer(message, "Rate <me>", reply_markup=keyboard.as_markup())
+    await outbox.answer(message, text="Next")
+    message.answer.assert_not_called()
+    await outbox.stop()
+
+    assert api.texts(1) == ["Predicted <b>1 000</b>\n\nRate &lt;me&gt;", "Next"]
+    assert api.sent[0][1]["parse_mode"] == "HTML"
+    assert "reply_markup" in api.sent[0][1]
+    assert len(api.peers) == 1
+
+
+@pytest.mark.asyncio
+async def test_per_chat_rate_and_order(api, bot):
+    outbox = make_outbox(per_chat_rate=20.0, per_chat_burst=1)
+    outbox.start(bot)
+
+    for i in range(4):
+        outbox.send(1, str(i), coalesce=False)
+    outbox.send(2, "other", coalesce=False)
+    await outbox.stop()
+
+    assert api.texts(1) == ["0", "1", "2", "3"]
+    times = [at for at, data in api.sent if data["chat_id"] == "1"]
+    assert all(b - a >= 0.04 for a, b in zip(times, times[1:]))
+    # the other chat doesn't wait behind the first one
+    assert api.texts(2) == ["other"]
+    assert api.sent.index(next(s for s in api.sent if s[1]["chat_id"] == "2")) < 3
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_chat_and_resends(api, bot):
+    api.flood[1] = 1
+    outbox = make_outbox()
+    outbox.start(bot)
+
+    started_at = asyncio.get_running_loop().time()
+    delivered = outbox.send(1, "hello")
+    outbox.send(2, "unaffected")
+    await delivered
+    await outbox.stop()
+
+    assert api.texts(1) == ["hello"]
+    assert api.sent[0][1]["text"] == "unaffected"
+    assert api.sent[-1][0] - started_at >= 1
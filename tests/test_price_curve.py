@@ -0,0 +1,105 @@
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import handlers
+from scheduler import scheduler
+
+ITEM = handlers.Item(
+    name="Toyota",
+    year=2015,
+    km_driven=60000,
+    fuel="Diesel",
+    seller_type="Individual",
+    transmission="Manual",
+    owner="First Owner",
+    mileage="17.5",
+    engine="1248",
+    max_power="74",
+    seats=5,
+).model_dump()
+
+
+def make_callback(data: str) -> AsyncMock:
+    callback = AsyncMock()
+    callback.data = data
+    callback.message.answer = AsyncMock()
+    return callback
+
+
+def test_price_curve_frame_varies_one_feature():
+    df = handlers.price_curve_frame(ITEM, "km_driven")
+
+    assert 60000 in df["km_driven"].tolist()
+    assert df["km_driven"].is_monotonic_increasing
+    assert (df.drop(columns="km_driven").nunique(dropna=False) == 1).all()
+
+
+def test_year_grid_has_no_future_years():
+    grid = handlers._year_grid(2099)
+    assert len(grid) == 11
+    assert grid[-1] <= handlers.datetime.now().year
+
+
+@pytest.mark.asyncio
+async def test_price_curve_scores_the_grid_in_one_pass(monkeypatch):
+    callback = make_callback("curve:year")
+    state = AsyncMock()
+    state.get_data.return_value = {"last_item": ITEM}
+    calls = []
+    predict_batch = handlers.predict_batch
+
+    def counting_predict_batch(df):
+        calls.append(len(df))
+        return predict_batch(df)
+
+    monkeypatch.setattr(handlers, "predict_batch", counting_predict_batch)
+    try:
+        await handlers.price_curve(callback, state)
+    finally:
+        await scheduler.stop()
+
+    assert calls == [11]
+    text = callback.message.answer.call_args.args[0]
+    assert text.startswith("📈 <b>Price by year</b>")
+    assert "2015      705 899 ◀" in text
+
+
+@pytest.mark.asyncio
+async def test_price_curve_is_audited(monkeypatch):
+    callback = make_callback("curve:km_driven")
+    callback.message.chat.id = 42
+    state = AsyncMock()
+    state.get_data.return_value = {"last_item": ITEM}
+    audit = MagicMock()
+    monkeypatch.setattr(handlers, "audit", audit)
+    try:
+        await handlers.price_curve(callback, state)
+    finally:
+        await scheduler.stop()
+
+    (call,) = audit.record.call_args_list
+    kind, features, model_version, latency = call.args
+    assert kind == "curve"
+    assert features == {**ITEM, "curve": "km_driven"}
+    assert model_version == handlers.get_preprocessor().model_version
+    assert latency > 0
+    rows = len(handlers.price_curve_frame(ITEM, "km_driven"))
+    assert call.kwargs == {"client_id": 42, "rows": rows}
+
+
+@pytest.mark.asyncio
+async def test_price_curve_needs_a_prediction():
+    callback = make_callback("curve:owner")
+    state = AsyncMock()
+    state.get_data.return_value = {}
+
+    await handlers.price_curve(callback, state)
+
+    callback.answer.assert_awaited_once()
+    assert callback.answer.call_args.kwargs["show_alert"]
+    callback.message.answer.assert_not_called()
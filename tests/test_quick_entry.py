@@ -0,0 +1,95 @@
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import handlers
+from scheduler import scheduler
+
+EXPECTED = {
+    "name": "Toyota",
+    "year": 2015,
+    "km_driven": 60000,
+    "fuel": "Diesel",
+    "seller_type": "Individual",
+    "transmission": "Manual",
+    "owner": "First Owner",
+    "mileage": "17.5",
+    "engine": "1248",
+    "max_power": "74",
+    "seats": 5,
+}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "name=Toyota, year=2015, km_driven=60000, fuel=Diesel, "
+        "seller_type=Individual, transmission=Manual, owner=First Owner, "
+        "mileage=17,5, engine=1248, max_power=74, seats=5",
+        "NAME = toyota innova\nyear=2015\nkm_driven=60000\nfuel=diesel\n"
+        "seller_type=individual\ntransmission=manual\nowner=first owner\n"
+        "mileage=17.5\nengine=1248\nmax_power=74\nseats=5",
+        "Toyota,2015,60000,Diesel,Individual,Manual,First Owner,17.5,1248,74,5",
+        'Toyota, 2015, 60000, Diesel, Individual, Manual, First Owner, "17,5", '
+        "1248, 74, 5",
+    ],
+)
+def test_parse_quick_entry(text):
+    assert handlers.is_quick_entry(text)
+    assert handlers.parse_quick_entry(text) == EXPECTED
+    handlers.Item(**EXPECTED)
+
+
+def test_parse_quick_entry_reports_all_errors():
+    with pytest.raises(ValueError) as e:
+        handlers.parse_quick_entry("name=Foo, year=3000, seats=5, colour=red")
+
+    errors = str(e.value).split("\n")
+    assert "unknown parameter colour" in errors
+    assert "name 'Foo' is incorrect" in errors
+    assert "year '3000' is incorrect" in errors
+    assert "mileage is missing" in errors
+    assert len(errors) == 11
+
+
+@pytest.mark.parametrize("text", ["7,9", "2019", "Single item prediction 🚗"])
+def test_step_answers_are_not_quick_entries(text):
+    assert not handlers.is_quick_entry(text)
+
+
+@pytest.mark.asyncio
+async def test_quick_entry_predicts_from_one_message():
+    message = AsyncMock()
+    message.text = (
+        "/quick Toyota,2015,60000,Diesel,Individual,Manual,First Owner,17.5,1248,74,5"
+    )
+    state = AsyncMock()
+    state.get_state.return_value = None
+
+    try:
+        await handlers.quick_entry(message, state)
+    finally:
+        await scheduler.stop()
+
+    text = message.answer.call_args_list[0].kwargs["text"]
+    assert text.startswith("Predicted price is <b>705 899.16</b> RUB\n\n")
+    assert "Main price factors, RUB:\nbrand +212 835\nfuel +142 495\n" in text
+    # no steps, only the car is kept for price curves
+    state.update_data.assert_awaited_once_with(
+        last_item=handlers.Item(**EXPECTED).model_dump()
+    )
+    state.clear.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_quick_entry_without_spec_shows_format():
+    message = AsyncMock()
+    message.text = "/quick"
+
+    await handlers.quick_entry(message, AsyncMock())
+
+    assert message.answer.call_args.args[0] == handlers.QUICK_ENTRY_HELP
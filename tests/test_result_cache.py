@@ -0,0 +1,64 @@
+import io
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from metrics import METRICS
+from result_cache import ResultCache
+
+
+def test_key_depends_on_content_and_parts():
+    source = io.BytesIO(b"name,year\nAudi,2014\n")
+    source.seek(5)
+
+    key = ResultCache.key(source, "file-1", "v1", "csv")
+    assert source.tell() == 5
+    assert key == ResultCache.key(io.BytesIO(source.getvalue()), "file-1", "v1", "csv")
+    assert key != ResultCache.key(source, "file-1", "v2", "csv")
+    assert key != ResultCache.key(io.BytesIO(b"other"), "file-1", "v1", "csv")
+
+
+def test_disabled_cache_is_a_no_op(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=0)
+    cache.put("key", io.BytesIO(b"result"))
+    assert cache.get("key") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_get_counts_hits_and_misses(tmp_path):
+    METRICS.reset()
+    cache = ResultCache(str(tmp_path), max_bytes=1024)
+
+    assert cache.get("key") is None
+    cache.put("key", io.BytesIO(b"result"))
+    with cache.get("key") as cached:
+        assert cached.read() == b"result"
+
+    counters = METRICS.snapshot()["counters"]
+    assert counters["result_cache.hits"] == 1
+    assert counters["result_cache.misses"] == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10)
+
+    cache.put("a", io.BytesIO(b"aaaa"))
+    cache.put("b", io.BytesIO(b"bbbb"))
+    os.utime(tmp_path / "a", (0, 0))
+    os.utime(tmp_path / "b", (1, 1))
+    cache.get("a").close()
+    cache.put("c", io.BytesIO(b"cccc"))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a", "c"]
+
+
+def test_get_survives_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=4)
+
+    cache.put("a", io.BytesIO(b"aaaa"))
+    with cache.get("a") as cached:
+        os.utime(tmp_path / "a", (0, 0))
+        cache.put("b", io.BytesIO(b"bbbb"))
+        assert not (tmp_path / "a").exists()
+        assert cached.read() == b"aaaa"
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+import pytest_asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scheduler import PredictionScheduler, INTERACTIVE, BATCH, BACKGROUND
+
+
+@pytest_asyncio.fixture
+async def scheduler():
+    scheduler = PredictionScheduler(workers=1, batch_cpu_share=1)
+    yield scheduler
+    await scheduler.stop()
+
+
+def test_configure_rejects_bad_values():
+    with pytest.raises(ValueError):
+        PredictionScheduler(background_policy="fifo")
+    with pytest.raises(ValueError):
+        PredictionScheduler(batch_cpu_share=0)
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result_and_raises(scheduler):
+    assert await scheduler.run_interactive(sum, [1, 2, 3]) == 6
+    with pytest.raises(ZeroDivisionError):
+        await scheduler.run_batch(lambda: 1 / 0)
+
+
+@pytest.mark.asyncio
+async def test_interactive_overtakes_queued_batch(scheduler):
+    order = []
+
+    def job(name):
+        time.sleep(0.01)
+        order.append(name)
+
+    batch = [asyncio.create_task(scheduler.run_batch(job, f"b{i}")) for i in range(3)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(scheduler.run_interactive(job, "i"))
+    await asyncio.gather(*batch, interactive)
+
+    # the first chunk is already running, the interactive job goes right after it
+    assert order == ["b0", "i", "b1", "b2"]
+
+
+@pytest.mark.asyncio
+async def test_background_policies():
+    scheduler = PredictionScheduler(batch_cpu_share=0.5)
+    scheduler._queues[BACKGROUND].append(object())
+
+    # between the chunks of a batch file its queue is empty
+    with scheduler.batch_job():
+        assert scheduler._next_kind() is None
+        scheduler.background_policy = "weighted"
+        assert scheduler._next_kind() == BACKGROUND
+    scheduler.background_policy = "strict"
+    assert scheduler._next_kind() == BACKGROUND
+
+    # chunks and background jobs queued, batch has used its share
+    scheduler._busy = {INTERACTIVE: 0.0, BATCH: 1.0, BACKGROUND: 0.0}
+    scheduler._queues[BATCH].append(object())
+    assert scheduler._next_kind() == BATCH
+    scheduler.background_policy = "weighted"
+    assert scheduler._next_kind() == BACKGROUND
+    scheduler._busy = {INTERACTIVE: 0.0, BATCH: 0.0, BACKGROUND: 1.0}
+    assert scheduler._next_kind() == BATCH
+
+    # whatever the policy and shares, a queued interactive job goes first
+    scheduler._queues[INTERACTIVE].append(object())
+    for policy in ("strict", "weighted"):
+        scheduler.background_policy = policy
+        assert scheduler._next_kind() == INTERACTIVE
+
+
+@pytest.mark.asyncio
+async def test_interactive_runs_before_queued_chunks():
+    scheduler = PredictionScheduler(background_policy="weighted", batch_cpu_share=1)
+    # interactive work has used most of the recent worker time
+    scheduler._busy[INTERACTIVE] = 10.0
+    order = []
+
+    def job(name):
+        time.sleep(0.01)
+        order.append(name)
+
+    try:
+        batch = [
+            asyncio.create_task(scheduler.run_batch(job, f"b{i}")) for i in range(4)
+        ]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(scheduler.run_interactive(job, "i"))
+        await asyncio.gather(*batch, interactive)
+    finally:
+        await scheduler.stop()
+
+    assert order == ["b0", "i", "b1", "b2", "b3"]
+
+
+@pytest.mark.asyncio
+async def test_background_runs_after_other_queues(scheduler):
+    order = []
+
+    def job(name):
+        time.sleep(0.01)
+        order.append(name)
+
+    first = asyncio.create_task(scheduler.run_batch(job, "b0"))
+    await asyncio.sleep(0)
+    background = asyncio.create_task(scheduler.run_background(job, "e"))
+    batch = asyncio.create_task(scheduler.run_batch(job, "b1"))
+    interactive = asyncio.create_task(scheduler.run_interactive(job, "i"))
+    await asyncio.gather(first, background, batch, interactive)
+
+    assert order == ["b0", "i", "b1", "e"]
+
+
+@pytest.mark.asyncio
+async def test_batch_share_pauses_batch_queue():
+    scheduler = PredictionScheduler(batch_cpu_share=0.5)
+    try:
+        await scheduler.run_batch(time.sleep, 0.02)
+        assert scheduler._batch_resume_at > time.monotonic()
+
+        scheduler._queues[BATCH].append(object())
+        assert scheduler._next_kind() is None
+        scheduler._queues[BATCH].clear()
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_stats_reports_wait_times(scheduler):
+    await scheduler.run_interactive(int, "1")
+    stats = scheduler.stats()
+    assert stats[INTERACTIVE]["wait"]["count"] >= 1
+    assert stats[BATCH]["depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_strict_policy_keeps_background_behind_a_batch_file(scheduler):
+    order = []
+
+    with scheduler.batch_job():
+        background = asyncio.create_task(scheduler.run_background(order.append, "e"))
+        for i in range(3):
+            await scheduler.run_batch(order.append, f"b{i}")
+            await asyncio.sleep(0.01)  # the batch queue is empty meanwhile
+    await background
+
+    assert order == ["b0", "b1", "b2", "e"]
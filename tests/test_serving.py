@@ -0,0 +1,166 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from preprocessing import CarPricePredictorPreprocessor
+from serving import ServingModel, export_artifact, precision_report
+
+models_folder = pathlib.Path(__file__).resolve().parent.parent / "models"
+
+ROWS = [
+    [
+        "Maruti Swift Dzire VDI",
+        2014,
+        145500,
+        "Diesel",
+        "Individual",
+        "Manual",
+        "First Owner",
+        "23.4 kmpl",
+        "1248 CC",
+        "74 bhp",
+        None,
+        5.0,
+    ],
+    [
+        "Skoda Rapid 1.5 TDI Ambition",
+        2014,
+        120000,
+        "Diesel",
+        "Individual",
+        "Manual",
+        "Second Owner",
+        "21.14 kmpl",
+        "1498 CC",
+        "103.52 bhp",
+        None,
+        5.0,
+    ],
+    [
+        "Tesla Model 3",
+        2020,
+        1000,
+        "Electric",
+        "Dealer",
+        "Automatic",
+        "Test Drive Car",
+        None,
+        None,
+        None,
+        None,
+        None,
+    ],
+]
+COLUMNS = [
+    "name",
+    "year",
+    "km_driven",
+    "fuel",
+    "seller_type",
+    "transmission",
+    "owner",
+    "mileage",
+    "engine",
+    "max_power",
+    "torque",
+    "seats",
+]
+
+
+@pytest.fixture(scope="module")
+def preprocessor():
+    return CarPricePredictorPreprocessor(models_folder)
+
+
+def test_export_matches_reference(tmp_path, preprocessor):
+    export_artifact(preprocessor, tmp_path)
+    model = ServingModel.load(tmp_path)
+    df = pd.DataFrame(ROWS, columns=COLUMNS)
+
+    assert model.model_version == preprocessor.model_version
+    np.testing.assert_array_equal(
+        model.transform(df), preprocessor.preprocess_data(df.copy()).to_numpy()
+    )
+    np.testing.assert_allclose(model.predict(df), preprocessor.predict(df), rtol=1e-9)
+
+
+def test_weights_are_read_only_mapping(tmp_path, preprocessor):
+    export_artifact(preprocessor, tmp_path)
+    model = ServingModel.load(tmp_path)
+
+    assert isinstance(model.coef.base, np.memmap)
+    with pytest.raises(ValueError):
+        model.coef[0] = 0
+
+
+def test_committed_artifact_is_up_to_date(preprocessor):
+    model = ServingModel.load(models_folder / "serving")
+    assert model.model_version == preprocessor.model_version
+
+
+def test_float32_scoring_is_within_reported_bound(tmp_path, preprocessor):
+    export_artifact(preprocessor, tmp_path)
+    df = pd.DataFrame(ROWS, columns=COLUMNS)
+
+    predictions = ServingModel.load(tmp_path, "float32").predict(df)
+    assert predictions.dtype == np.float64
+    np.testing.assert_allclose(predictions, preprocessor.predict(df), rtol=1e-4)
+
+    report = precision_report(tmp_path, df)
+    assert report["rows"] == len(df)
+    assert report["within_bound"]
+    assert report["max_abs_error"] <= report["max_abs_bound"]
+
+
+def test_unknown_precision_is_rejected():
+    with pytest.raises(ValueError, match="Unknown precision"):
+        ServingModel.load(models_folder / "serving", "float16")
+
+
+@pytest.mark.parametrize("precision", ["float64", "float32"])
+def test_contributions_add_up_to_the_price(preprocessor, precision):
+    model = ServingModel.load(models_folder / "serving", precision)
+    df = pd.DataFrame(ROWS, columns=COLUMNS)
+
+    reference_prices, reference = preprocessor.predict_with_contributions(df)
+    prices, contributions = model.predict_with_contributions(df)
+
+    np.testing.assert_array_equal(prices, model.predict(df))
+    np.testing.assert_array_equal(reference_prices, preprocessor.predict(df))
+    assert list(contributions.columns) == list(reference.columns)
+    np.testing.assert_allclose(
+        contributions.sum(axis=1) + model.intercept[0], prices, rtol=1e-6
+    )
+    np.testing.assert_allclose(
+        contributions.to_numpy(), reference.to_numpy(), rtol=1e-5, atol=1e-2
+    )
+
+
+def test_bot_serves_without_sklearn():
+    # the pickled models are unpickled with sklearn, the artifact is not
+    code = (
+        "import sys, bot, handlers, health\n"
+        "handlers.preprocessor = bot.load_model()\n"
+        "assert handlers.predict_price(health.WARM_UP_ITEM) > 0\n"
+        "assert 'sklearn' not in sys.modules, 'sklearn was imported'\n"
+    )
+    env = {
+        **os.environ,
+        "BOT_TOKEN": "1:a",
+        "SERVING_ARTIFACT": str(models_folder / "serving"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=models_folder.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
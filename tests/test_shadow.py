@@ -0,0 +1,185 @@
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import AsyncMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import handlers
+from metrics import METRICS
+from scheduler import scheduler
+from shadow import ShadowEvaluator
+
+
+class Candidate:
+    model_version = "candidate"
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        return np.full(len(df), 110.0)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    METRICS.reset()
+
+
+@pytest.mark.asyncio
+async def test_shadow_records_differences_and_latency():
+    shadow = ShadowEvaluator(sample_rate=1)
+    shadow.configure(Candidate(), sample_rate=1, max_pending=10)
+
+    try:
+        shadow.submit(pd.DataFrame([{}, {}]), [100.0, 120.0])
+        assert shadow.pending == 1
+        await asyncio.gather(*shadow._tasks)
+    finally:
+        await shadow.stop()
+
+    stats = shadow.stats()
+    assert stats["candidate"] == "candidate"
+    assert stats["scored"] == 2
+    assert stats["diff"]["count"] == 2
+    assert stats["diff"]["max"] == 10.0
+    assert stats["rel_diff"]["max"] == pytest.approx(0.1)
+    assert stats["latency"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_shadow_samples_and_bounds_pending():
+    shadow = ShadowEvaluator()
+    shadow.submit(pd.DataFrame([{}]), [1.0])
+    assert shadow.pending == 0
+
+    shadow.configure(Candidate(), sample_rate=0, max_pending=10)
+    shadow.submit(pd.DataFrame([{}]), [1.0])
+    assert shadow.pending == 0
+
+    shadow.configure(Candidate(), sample_rate=1, max_pending=1)
+    try:
+        shadow.submit(pd.DataFrame([{}]), [1.0])
+        shadow.submit(pd.DataFrame([{}]), [1.0])
+        assert shadow.pending == 1
+        assert METRICS.snapshot()["counters"]["shadow.dropped"] == 1
+    finally:
+        await shadow.stop()
+    assert shadow.pending == 0
+
+    with pytest.raises(ValueError):
+        shadow.configure(None, sample_rate=2, max_pending=1)
+
+
+@pytest.mark.asyncio
+async def test_shadow_scores_a_quick_entry_after_the_reply(monkeypatch):
+    candidate = ShadowEvaluator()
+    candidate.configure(Candidate(), sample_rate=1, max_pending=10)
+    monkeypatch.setattr(handlers, "shadow", candidate)
+    pending_at_reply = []
+
+    message = AsyncMock()
+    message.text = (
+        "/quick Toyota,2015,60000,Diesel,Individual,Manual,First Owner,17.5,1248,74,5"
+    )
+    message.answer.side_effect = lambda *args, **kwargs: pending_at_reply.append(
+        candidate.pending
+    )
+    state = AsyncMock()
+    state.get_state.return_value = None
+
+    try:
+        await handlers.quick_entry(message, state)
+        await asyncio.gather(*candidate._tasks)
+    finally:
+        await candidate.stop()
+        await scheduler.stop()
+
+    # the candidate was only submitted once the price had been sent
+    assert pending_at_reply == [0, 0]
+    assert METRICS.summary("shadow.diff")["max"] == pytest.approx(110.0 - 705899.16)
+
+
+class SlowCandidate(Candidate):
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        time.sleep(0.5)
+        return super().predict(df)
+
+
+@pytest.mark.asyncio
+async def test_slow_candidate_does_not_delay_predictions():
+    shadow = ShadowEvaluator()
+    shadow.configure(SlowCandidate(), sample_rate=1, max_pending=10)
+
+    try:
+        shadow.submit(pd.DataFrame([{}]), [100.0])
+        await asyncio.sleep(0.05)  # the candidate is running
+        started_at = time.monotonic()
+        assert await scheduler.run_interactive(lambda: 1.0) == 1.0
+        latency = time.monotonic() - started_at
+        await asyncio.gather(*shadow._tasks)
+    finally:
+        await shadow.stop()
+        await scheduler.stop()
+
+    assert latency < 0.2
+    assert METRICS.snapshot()["counters"]["shadow.scored"] == 1
+
+
+@pytest.mark.asyncio
+async def test_shadow_skips_while_predictions_are_queued(monkeypatch):
+    shadow = ShadowEvaluator()
+    shadow.configure(Candidate(), sample_rate=1, max_pending=10)
+    monkeypatch.setattr(scheduler, "depth", lambda kind: 1)
+
+    try:
+        shadow.submit(pd.DataFrame([{}]), [100.0])
+        await asyncio.gather(*shadow._tasks)
+    finally:
+        await shadow.stop()
+
+    counters = METRICS.snapshot()["counters"]
+    assert counters["shadow.skipped"] == 1
+    assert "shadow.scored" not in counters
+
+
+class Regressor:
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, features: pd.DataFrame) -> np.ndarray:
+        self.calls += 1
+        return np.full(len(features), 110.0)
+
+
+class PreprocessingCandidate:
+    model_version = "candidate"
+
+    def __init__(self):
+        self.ridge_regressor = Regressor()
+
+    def preprocess_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df
+
+
+@pytest.mark.asyncio
+async def test_shadow_rechecks_the_queue_after_preprocessing(monkeypatch):
+    shadow = ShadowEvaluator()
+    candidate = PreprocessingCandidate()
+    shadow.configure(candidate, sample_rate=1, max_pending=10)
+    depths = iter([0, 1, 0, 0])
+    monkeypatch.setattr(scheduler, "depth", lambda kind: next(depths))
+
+    try:
+        for _ in range(2):
+            shadow.submit(pd.DataFrame([{}]), [100.0])
+            await asyncio.gather(*shadow._tasks)
+    finally:
+        await shadow.stop()
+
+    counters = METRICS.snapshot()["counters"]
+    assert counters["shadow.skipped"] == 1
+    assert counters["shadow.scored"] == 1
+    assert candidate.ridge_regressor.calls == 1